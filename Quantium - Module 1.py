@@ -16,21 +16,29 @@ import numpy as np
 # In[363]:
 
 
-pur_bhvr = pd.read_csv("QVI_purchase_behaviour.csv")
+from quantium.ingest import load_purchase_behaviour, load_transactions
+
+# compact=True: categorical strings, downcast integers and float32 sales (quantium.schema)
+pur_bhvr = load_purchase_behaviour("QVI_purchase_behaviour.csv", compact=True)
 print(pur_bhvr.head())
 
 
 # In[364]:
 
 
-tran_data = pd.read_excel("QVI_transaction_data.xlsx")
+tran_data = load_transactions("QVI_transaction_data.xlsx", compact=True)
 print(tran_data.head())
 
 
 # In[365]:
 
 
-merged_data = pd.merge(pur_bhvr, tran_data, on="LYLTY_CARD_NBR", how="right")
+from quantium.cache import PipelineCache
+
+# Stage results are stored on disk keyed by their inputs; unchanged stages are loaded, not recomputed
+pipeline = PipelineCache()
+
+merged_data = pipeline.run("merged_data", pd.merge, pur_bhvr, tran_data, on="LYLTY_CARD_NBR", how="right")
 print(merged_data.head())
 
 
@@ -52,20 +60,15 @@ merged_data.info()
 # In[368]:
 
 
-from datetime import date, timedelta
-start = date(1899,12,30)
+from quantium.dates import normalise_dates
 
-new_date_format = []
-
-for date in merged_data["DATE"]:
-    delta = timedelta(date)
-    new_date_format.append(start + delta)
+# DATE holds Excel serial days (days after 1899-12-30)
+merged_data = normalise_dates(merged_data, ["DATE"])
 
 
 # In[369]:
 
 
-merged_data["DATE"] = pd.to_datetime(pd.Series(new_date_format))
 print(merged_data["DATE"].dtype)
 
 
@@ -77,26 +80,27 @@ print(merged_data["DATE"].dtype)
 merged_data["PROD_NAME"].unique()
 
 
+# In[ ]:
+
+
+from quantium.products import lookup_product, product_dimension
+
+# Parse each distinct product once; rows pick the attributes up by PROD_NBR
+products = product_dimension(merged_data)
+products.head()
+
+
 # In[371]:
 
 
-split_prods = merged_data["PROD_NAME"].str.replace(r'([0-9]+[gG])','').str.replace(r'[^\w]', ' ').str.split()
+from quantium.products import token_frequencies
 
 
 # In[372]:
 
 
-word_counts = {}
-
-def count_words(line):
-    for word in line:
-        if word not in word_counts:
-            word_counts[word] = 1
-        else:
-            word_counts[word] += 1
-            
-split_prods.apply(lambda line: count_words(line))
-print(pd.Series(word_counts).sort_values(ascending=False))
+word_counts = token_frequencies(merged_data, products)
+print(word_counts)
 
 
 # Removing Salsa products
@@ -104,7 +108,7 @@ print(pd.Series(word_counts).sort_values(ascending=False))
 # In[373]:
 
 
-merged_data = merged_data[~merged_data["PROD_NAME"].str.contains(r"[Ss]alsa")]
+merged_data = merged_data[~lookup_product(merged_data, products, "Is_Salsa")]
 
 
 # In[374]:
@@ -191,8 +195,7 @@ check_null_date["DATE"].value_counts().sort_values().head()
 # In[384]:
 
 
-merged_data["PROD_NAME"] = merged_data["PROD_NAME"].str.replace(r'[0-9]+(G)','g')
-pack_sizes = merged_data["PROD_NAME"].str.extract(r'([0-9]+[gG])')[0].str.replace("g","").astype("float")
+pack_sizes = lookup_product(merged_data, products, "Pack_Size")
 print(pack_sizes.describe())
 pack_sizes.plot.hist()
 
@@ -204,7 +207,8 @@ pack_sizes.plot.hist()
 # In[385]:
 
 
-merged_data["PROD_NAME"].str.split().str[0].value_counts().sort_index()
+first_words = lookup_product(merged_data, products, "First_Word")
+first_words.value_counts().sort_index()
 
 
 # As we look further than the first word in product name, we can see that some product brands are written in more than 1 way. Dorito and Doritos. Grain and GrnWves. Infuzions and Infzns. Natural and NCC. Red and RRD. Smith and Smiths. Snbts and Sunbites. WW and Woolworths.
@@ -212,56 +216,39 @@ merged_data["PROD_NAME"].str.split().str[0].value_counts().sort_index()
 # In[386]:
 
 
-merged_data["PROD_NAME"].str.split()[merged_data["PROD_NAME"].str.split().str[0] == "Grain"].value_counts()
+merged_data["PROD_NAME"][first_words == "Grain"].value_counts()
 
 
 # In[387]:
 
 
-merged_data["PROD_NAME"].str.split()[merged_data["PROD_NAME"].str.split().str[0] == "Natural"].value_counts()
+merged_data["PROD_NAME"][first_words == "Natural"].value_counts()
 
 
 # In[388]:
 
 
-merged_data["PROD_NAME"].str.split()[merged_data["PROD_NAME"].str.split().str[0] == "Red"].value_counts()
+merged_data["PROD_NAME"][first_words == "Red"].value_counts()
 
 
 # In[389]:
 
 
-merged_data["Cleaned_Brand_Names"] = merged_data["PROD_NAME"].str.split().str[0]
+from quantium.brands import clean_brand_names, load_brand_aliases
 
 
 # In[390]:
 
 
-def clean_brand_names(line):
-    brand = line["Cleaned_Brand_Names"]
-    if brand == "Dorito":
-        return "Doritos"
-    elif brand == "GrnWves" or brand == "Grain":
-        return "Grain Waves"
-    elif brand == "Infzns":
-        return "Infuzions"
-    elif brand == "Natural" or brand == "NCC":
-        return "Natural Chip Co"
-    elif brand == "Red":
-        return "RRD"
-    elif brand == "Smith":
-        return "Smiths"
-    elif brand == "Snbts":
-        return "Sunbites"
-    elif brand == "WW":
-        return "Woolworths"
-    else:
-        return brand
+# Alias -> canonical brand, maintained in quantium/brand_aliases.json
+brand_aliases = load_brand_aliases()
+brand_aliases
 
 
 # In[391]:
 
 
-merged_data["Cleaned_Brand_Names"] = merged_data.apply(lambda line: clean_brand_names(line), axis=1)
+merged_data["Cleaned_Brand_Names"] = pipeline.run("brand_names", clean_brand_names, merged_data["PROD_NAME"], brand_aliases)
 
 
 # In[392]:
@@ -285,7 +272,11 @@ merged_data.isnull().sum()
 # In[395]:
 
 
-grouped_sales = pd.DataFrame(merged_data.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"])["TOT_SALES"].agg(["sum", "mean"]))
+from quantium.segments import SEGMENT_KEYS, segment_summary
+
+# Every segment metric used below, from a single pass over merged_data
+segment_metrics = segment_summary(merged_data).set_index(SEGMENT_KEYS)
+grouped_sales = segment_metrics[["Total_Sales", "Avg_Sales_Per_Txn"]].rename(columns={"Total_Sales": "sum", "Avg_Sales_Per_Txn": "mean"})
 grouped_sales.sort_values(ascending=False, by="sum")
 
 
@@ -343,8 +334,6 @@ plt.legend(loc='center left', bbox_to_anchor=(1.0, 0.5))
 
 plt.title("Total Sales per Lifestage")
 
-plt.savefig("lifestage_sales.png", bbox_inches="tight")
-
 # Show graphic
 plt.show()
 
@@ -352,7 +341,7 @@ plt.show()
 # In[399]:
 
 
-stage_agg_prem = merged_data.groupby("LIFESTAGE")["PREMIUM_CUSTOMER"].agg(pd.Series.mode).sort_values()
+stage_agg_prem = merged_data.groupby("LIFESTAGE", observed=True)["PREMIUM_CUSTOMER"].agg(pd.Series.mode).sort_values()
 print("Top contributor per LIFESTAGE by PREMIUM category")
 print(stage_agg_prem)
 
@@ -365,7 +354,7 @@ print(stage_agg_prem)
 # In[400]:
 
 
-unique_cust = merged_data.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"])["LYLTY_CARD_NBR"].nunique().sort_values(ascending=False)
+unique_cust = segment_metrics["nCustomers"].sort_values(ascending=False)
 pd.DataFrame(unique_cust)
 
 
@@ -417,12 +406,22 @@ plt.legend(loc='center left', bbox_to_anchor=(1.0, 0.5))
 
 plt.title("Unique Customers per Lifestage")
 
-plt.savefig("lifestage_customers.png", bbox_inches="tight")
-
 # # Show graphic
 plt.show()
 
 
+# In[ ]:
+
+
+from quantium.report import lifestage_spec, render_report
+
+# lifestage_sales.png and lifestage_customers.png, rendered headless from segment_metrics
+render_report([
+    lifestage_spec(segment_metrics, "Total_Sales", "lifestage_sales.png", "TOTAL SALES", "Total Sales per Lifestage"),
+    lifestage_spec(segment_metrics, "nCustomers", "lifestage_customers.png", "UNIQUE CUSTOMERS", "Unique Customers per Lifestage"),
+], out_dir=".")
+
+
 # The high sales amount by segment "Young Singles/Couples - Mainstream" and "Retirees - Mainstream" are due to their large number of unique customers, but not for the "Older - Budget" segment. Next we'll explore if the "Older - Budget" segment has:
 # - High Frequency of Purchase and,
 # - Average Sales per Customer compared to the other segment.
@@ -430,8 +429,7 @@ plt.show()
 # In[403]:
 
 
-freq_per_cust = merged_data.groupby(["LYLTY_CARD_NBR", "LIFESTAGE", "PREMIUM_CUSTOMER"]).count()["DATE"]
-freq_per_cust.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"]).agg(["mean", "count"]).sort_values(ascending=False, by="mean")
+segment_metrics[["Txn_Per_Customer", "nCustomers"]].sort_values(ascending=False, by="Txn_Per_Customer")
 
 
 # The above table describes the "Average frequency of Purchase per segment" and "Unique customer per segment". The top three most frequent purchase is contributed by the "Older Families" lifestage segment. We can see now that the "Older - Budget" segment contributes to high sales partly because of the combination of:
@@ -475,20 +473,18 @@ pval < 0.0000001
 # In[407]:
 
 
-merged_data.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"])["Cleaned_Brand_Names"].agg(pd.Series.mode).sort_values()
+merged_data.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"], observed=True)["Cleaned_Brand_Names"].agg(pd.Series.mode).sort_values()
 
 
 # In[408]:
 
 
-for stage in merged_data["LIFESTAGE"].unique():
-    for prem in merged_data["PREMIUM_CUSTOMER"].unique():
-        print('==========',stage, '-', prem,'==========')
-        summary = merged_data[(merged_data["LIFESTAGE"] == stage) & (merged_data["PREMIUM_CUSTOMER"] == prem)]["Cleaned_Brand_Names"].value_counts().head(3)
-        print(summary)
-        plt.figure()
-        summary.plot.barh(figsize=(5,1))
-        plt.show()
+from quantium.segments import plot_top_n, top_n_per_segment
+
+top_brands = top_n_per_segment(merged_data, "Cleaned_Brand_Names", n=3)
+print(top_brands.to_string())
+plot_top_n(top_brands, "Cleaned_Brand_Names")
+plt.show()
 
 
 # Every segment had Kettle as the most purchased brand. Every segment except "YOUNG SINGLES/COUPLES Mainstream" had Smiths as their second most purchased brand. "YOUNG SINGLES/COUPLES Mainstream" had Doritos as their second most purchased brand.
@@ -496,30 +492,30 @@ for stage in merged_data["LIFESTAGE"].unique():
 # In[409]:
 
 
-from mlxtend.frequent_patterns import apriori
-from mlxtend.frequent_patterns import association_rules
+from quantium.affinity import segment_brand_rules
 
 
 # In[410]:
 
 
+from quantium.schema import segment_column
+
 temp = merged_data.reset_index().rename(columns = {"index": "transaction"})
-temp["Segment"] = temp["LIFESTAGE"] + ' - ' + temp['PREMIUM_CUSTOMER']
-segment_brand_encode = pd.concat([pd.get_dummies(temp["Segment"]), pd.get_dummies(temp["Cleaned_Brand_Names"])], axis=1)
+temp["Segment"] = segment_column(temp["LIFESTAGE"], temp["PREMIUM_CUSTOMER"])
 
 
 # In[411]:
 
 
-frequent_sets = apriori(segment_brand_encode, min_support=0.01, use_colnames=True)
-rules = association_rules(frequent_sets, metric="lift", min_threshold=1)
+# Segment -> brand rules straight from the segment x brand contingency table,
+# same support/confidence/lift as apriori on the one-hot matrix
+rules = segment_brand_rules(merged_data, min_support=0.01, min_lift=1)
 
 
 # In[412]:
 
 
-set_temp = temp["Segment"].unique()
-rules[rules["antecedents"].apply(lambda x: list(x)).apply(lambda x: x in set_temp)]
+rules
 
 
 # By looking at our a-priori analysis, we can conclude that Kettle is the brand of choice for most segment.
@@ -529,16 +525,12 @@ rules[rules["antecedents"].apply(lambda x: list(x)).apply(lambda x: x in set_tem
 # In[413]:
 
 
-merged_pack = pd.concat([merged_data, pack_sizes.rename("Pack_Size")], axis=1)
+merged_pack = merged_data.assign(Pack_Size=pack_sizes)
 
-for stage in merged_data["LIFESTAGE"].unique():
-    for prem in merged_data["PREMIUM_CUSTOMER"].unique():
-        print('==========',stage, '-', prem,'==========')
-        summary = merged_pack[(merged_pack["LIFESTAGE"] == stage) & (merged_pack["PREMIUM_CUSTOMER"] == prem)]["Pack_Size"].value_counts().head(3).sort_index()
-        print(summary)
-        plt.figure()
-        summary.plot.barh(figsize=(5,1))
-        plt.show()
+top_packs = top_n_per_segment(merged_pack, "Pack_Size", n=3)
+print(top_packs.to_string())
+plot_top_n(top_packs, "Pack_Size")
+plt.show()
 
 
 # All of the segments prefer the 175gr pack size chips, followed by the 150gr size.
@@ -548,13 +540,13 @@ for stage in merged_data["LIFESTAGE"].unique():
 # In[449]:
 
 
-(temp.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"])["PROD_QTY"].sum() / temp.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"])["LYLTY_CARD_NBR"].nunique()).sort_values(ascending=False)
+segment_metrics["Qty_Per_Customer"].sort_values(ascending=False)
 
 
 # In[464]:
 
 
-(temp.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"])["PROD_QTY"].sum() / temp.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"])["LYLTY_CARD_NBR"].nunique()).unstack().plot.bar(figsize=(15,4), rot=0)
+segment_metrics["Qty_Per_Customer"].unstack().plot.bar(figsize=(15,4), rot=0)
 plt.legend(loc="center left", bbox_to_anchor=(1.0, 0.5))
 plt.savefig("Average purchase quantity per segment.png", bbox_inches="tight")
 
@@ -563,14 +555,13 @@ plt.savefig("Average purchase quantity per segment.png", bbox_inches="tight")
 
 
 #Average chips price per transaction by segments
-temp["Unit_Price"] = temp["TOT_SALES"] / temp["PROD_QTY"]
-temp.groupby(["Segment"]).mean()["Unit_Price"].sort_values(ascending=False)
+segment_metrics["Avg_Unit_Price"].sort_values(ascending=False)
 
 
 # In[463]:
 
 
-temp.groupby(["LIFESTAGE", "PREMIUM_CUSTOMER"]).mean()["Unit_Price"].unstack().plot.bar(figsize=(15,4), rot=0)
+segment_metrics["Avg_Unit_Price"].unstack().plot.bar(figsize=(15,4), rot=0)
 plt.legend(loc="center left", bbox_to_anchor=(1,0.5))
 
 
@@ -607,6 +598,6 @@ plt.legend(loc="center left", bbox_to_anchor=(1,0.5))
 # In[125]:
 
 
-z = temp.groupby(["Segment", "Cleaned_Brand_Names"]).sum()["TOT_SALES"].sort_values(ascending=False).reset_index()
+z = temp.groupby(["Segment", "Cleaned_Brand_Names"], observed=True)["TOT_SALES"].sum().sort_values(ascending=False).reset_index()
 z[z["Segment"] == "YOUNG SINGLES/COUPLES - Mainstream"]
 
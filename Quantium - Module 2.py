@@ -23,7 +23,9 @@ import numpy as np
 # In[60]:
 
 
-qvi = pd.read_csv("QVI_data.csv")
+from quantium.ingest import load_qvi_data
+
+qvi = load_qvi_data("QVI_data.csv", compact=True)
 qvi.head()
 
 
@@ -46,8 +48,10 @@ qvi.info()
 # In[62]:
 
 
-qvi["DATE"] = pd.to_datetime(qvi["DATE"])
-qvi["YEARMONTH"] = qvi["DATE"].dt.strftime("%Y%m").astype("int")
+from quantium.dates import normalise_dates, yearmonth
+
+qvi = normalise_dates(qvi, ["DATE"])
+qvi["YEARMONTH"] = yearmonth(qvi["DATE"])
 
 
 # Compile each store's monthly:
@@ -60,35 +64,32 @@ qvi["YEARMONTH"] = qvi["DATE"].dt.strftime("%Y%m").astype("int")
 # In[63]:
 
 
-def monthly_store_metrics():
-    store_yrmo_group = qvi.groupby(["STORE_NBR", "YEARMONTH"])
-    total = store_yrmo_group["TOT_SALES"].sum()
-    num_cust = store_yrmo_group["LYLTY_CARD_NBR"].nunique()
-    trans_per_cust = store_yrmo_group.size() / num_cust
-    avg_chips_per_cust = store_yrmo_group["PROD_QTY"].sum() / num_cust
-    avg_chips_price = total / store_yrmo_group["PROD_QTY"].sum()
-    aggregates = [total, num_cust, trans_per_cust, avg_chips_per_cust, avg_chips_price]
-    metrics = pd.concat(aggregates, axis=1)
-    metrics.columns = ["TOT_SALES", "nCustomers", "nTxnPerCust", "nChipsPerTxn", "avgPricePerUnit"]
-    return metrics
+# All five metrics from one grouped pass. update_metrics_store folds new months
+# into a persisted copy without recomputing untouched store-months.
+from quantium.store_metrics import monthly_store_metrics
+from quantium.cache import PipelineCache
+
+# Stage results are stored on disk keyed by their inputs; unchanged stages are loaded, not recomputed
+pipeline = PipelineCache()
 
 
 # In[64]:
 
 
-qvi_monthly_metrics = monthly_store_metrics().reset_index()
+qvi_monthly_metrics = pipeline.run("store_metrics", monthly_store_metrics, qvi).reset_index()
 qvi_monthly_metrics.info()
 
 
 # In[65]:
 
 
+from quantium.eligibility import StoreMonthIndex
+
 #pre trial observation
 #filter only stores with full 12 months observation
-observ_counts = qvi_monthly_metrics["STORE_NBR"].value_counts()
-full_observ_index = observ_counts[observ_counts == 12].index
-full_observ = qvi_monthly_metrics[qvi_monthly_metrics["STORE_NBR"].isin(full_observ_index)]
-pretrial_full_observ = full_observ[full_observ["YEARMONTH"] < 201902]
+store_index = StoreMonthIndex(qvi_monthly_metrics, trial_start=201902, trial_end=201904)
+full_observ_index, full_observ, pretrial_full_observ = pipeline.run(
+    "observation_windows", StoreMonthIndex.observation_windows, store_index, max_missing=0)
 
 pretrial_full_observ.head(8)
 
@@ -96,75 +97,56 @@ pretrial_full_observ.head(8)
 # In[66]:
 
 
+from quantium.control import correlation_table
+
 def calcCorrTable(metricCol, storeComparison, inputTable=pretrial_full_observ):
-    """Calculate correlation for a measure, looping through each control store.
+    """Calculate correlation of each measure's pre-trial monthly series against every control store.
     Args:
-        metricCol (str): Name of column containing store's metric to perform correlation test on.
+        metricCol (list): Names of columns containing store's metrics to perform correlation test on.
         storeComparison (int): Trial store's number.
         inputTable (dataframe):  Metric table with potential comparison stores.
         
     Returns:
-        DataFrame: Monthly correlation table between Trial and each Control stores.
+        DataFrame: Correlation per metric and their mean (Corr_Score) between Trial and each Control stores.
     """
-    control_store_nbrs = inputTable[~inputTable["STORE_NBR"].isin([77, 86, 88])]["STORE_NBR"].unique()
-    corrs = pd.DataFrame(columns = ["YEARMONTH", "Trial_Str", "Ctrl_Str", "Corr_Score"])
-    trial_store = inputTable[inputTable["STORE_NBR"] == storeComparison][metricCol].reset_index()
-    for control in control_store_nbrs:
-        concat_df = pd.DataFrame(columns = ["YEARMONTH", "Trial_Str", "Ctrl_Str", "Corr_Score"])
-        control_store = inputTable[inputTable["STORE_NBR"] == control][metricCol].reset_index()
-        concat_df["Corr_Score"] = trial_store.corrwith(control_store, axis=1)
-        concat_df["Trial_Str"] = storeComparison
-        concat_df["Ctrl_Str"] = control
-        concat_df["YEARMONTH"] = list(inputTable[inputTable["STORE_NBR"] == storeComparison]["YEARMONTH"])
-        corrs = pd.concat([corrs, concat_df])
-    return corrs
+    return correlation_table(inputTable, metricCol, [storeComparison], exclude=[77, 86, 88])
 
 
 # In[67]:
 
 
-corr_table = pd.DataFrame()
-for trial_num in [77, 86, 88]:
-    corr_table = pd.concat([corr_table, calcCorrTable(["TOT_SALES", "nCustomers", "nTxnPerCust", "nChipsPerTxn", "avgPricePerUnit"], trial_num)])
-    
+# All trial stores scored against all candidates in one batched operation
+corr_table = pipeline.run("correlation_table", correlation_table, pretrial_full_observ,
+                          ["TOT_SALES", "nCustomers", "nTxnPerCust", "nChipsPerTxn", "avgPricePerUnit"], [77, 86, 88])
+
 corr_table.head(8)
 
 
 # In[68]:
 
 
+from quantium.control import distance_table
+
 def calculateMagnitudeDistance(metricCol, storeComparison, inputTable=pretrial_full_observ):
-    """Calculate standardised magnitude distance for a measure, looping through each control store.
+    """Calculate standardised magnitude distance for a measure against every control store.
     Args:
-        metricCol (str): Name of column containing store's metric to perform distance calculation on.
+        metricCol (list): Names of columns containing store's metrics to perform distance calculation on.
         storeComparison (int): Trial store's number.
         inputTable (dataframe):  Metric table with potential comparison stores.
         
     Returns:
         DataFrame: Monthly magnitude-distance table between Trial and each Control stores.
     """
-    control_store_nbrs = inputTable[~inputTable["STORE_NBR"].isin([77, 86, 88])]["STORE_NBR"].unique()
-    dists = pd.DataFrame()
-    trial_store = inputTable[inputTable["STORE_NBR"] == storeComparison][metricCol]
-    for control in control_store_nbrs:
-        concat_df  = abs(inputTable[inputTable["STORE_NBR"] == storeComparison].reset_index()[metricCol] - inputTable[inputTable["STORE_NBR"] == control].reset_index()[metricCol])
-        concat_df["YEARMONTH"] = list(inputTable[inputTable["STORE_NBR"] == storeComparison]["YEARMONTH"])
-        concat_df["Trial_Str"] = storeComparison
-        concat_df["Ctrl_Str"] = control
-        dists = pd.concat([dists, concat_df])
-    for col in metricCol:
-        dists[col] = 1 - ((dists[col] - dists[col].min()) / (dists[col].max() - dists[col].min()))
-    dists["magnitude"] = dists[metricCol].mean(axis=1)
-    return dists    
+    return distance_table(inputTable, metricCol, [storeComparison], exclude=[77, 86, 88])
 
 
 # In[123]:
 
 
-dist_table = pd.DataFrame()
-for trial_num in [77, 86, 88]:
-    dist_table = pd.concat([dist_table, calculateMagnitudeDistance(["TOT_SALES", "nCustomers", "nTxnPerCust", "nChipsPerTxn", "avgPricePerUnit"], trial_num)])
-    
+# Normalised per trial store, as when each trial was scored on its own
+dist_table = pipeline.run("distance_table", distance_table, pretrial_full_observ,
+                          ["TOT_SALES", "nCustomers", "nTxnPerCust", "nChipsPerTxn", "avgPricePerUnit"], [77, 86, 88])
+
 dist_table.head(8)
 dist_table
 
@@ -174,20 +156,18 @@ dist_table
 # In[70]:
 
 
-def combine_corr_dist(metricCol, storeComparison, inputTable=pretrial_full_observ):
-    corrs = calcCorrTable(metricCol, storeComparison, inputTable)
-    dists = calculateMagnitudeDistance(metricCol, storeComparison, inputTable)
-    dists = dists.drop(metricCol, axis=1)
-    combine = pd.merge(corrs, dists, on=["YEARMONTH", "Trial_Str", "Ctrl_Str"])
-    return combine
+from quantium.control import composite_scores
+
+# Correlation and mean magnitude per Trial/Control pair, scored straight from one pivot
+def combine_corr_dist(metricCol, storeComparisons, inputTable=pretrial_full_observ):
+    return pipeline.run("composite_scores", composite_scores, inputTable, metricCol, storeComparisons,
+                        corr_weight=corr_weight)
 
 
 # In[71]:
 
 
-compare_metrics_table1 = pd.DataFrame()
-for trial_num in [77, 86, 88]:
-    compare_metrics_table1 = pd.concat([compare_metrics_table1, combine_corr_dist(["TOT_SALES"], trial_num)])
+trial_stores = [77, 86, 88]
 
 
 # In[72]:
@@ -201,37 +181,47 @@ dist_weight = 1 - corr_weight
 
 
 #Top 5 highest Composite Score for each Trial Store based on TOT_SALES
-grouped_comparison_table1 = compare_metrics_table1.groupby(["Trial_Str", "Ctrl_Str"]).mean().reset_index()
-grouped_comparison_table1["CompScore"] = (corr_weight * grouped_comparison_table1["Corr_Score"]) + (dist_weight * grouped_comparison_table1["magnitude"])
-for trial_num in compare_metrics_table1["Trial_Str"].unique():
+grouped_comparison_table1 = combine_corr_dist(["TOT_SALES"], trial_stores)
+for trial_num in trial_stores:
     print(grouped_comparison_table1[grouped_comparison_table1["Trial_Str"] == trial_num].sort_values(ascending=False, by="CompScore").head(), '\n')
 
 
 # In[74]:
 
 
-compare_metrics_table2 = pd.DataFrame()
-for trial_num in [77, 86, 88]:
-    compare_metrics_table2 = pd.concat([compare_metrics_table2, combine_corr_dist(["nCustomers"], trial_num)])
+grouped_comparison_table2 = combine_corr_dist(["nCustomers"], trial_stores)
 
 
 # In[75]:
 
 
 #Top 5 highest Composite Score for each Trial Store based on nCustomers
-grouped_comparison_table2 = compare_metrics_table2.groupby(["Trial_Str", "Ctrl_Str"]).mean().reset_index()
-grouped_comparison_table2["CompScore"] = (corr_weight * grouped_comparison_table2["Corr_Score"]) + (dist_weight * grouped_comparison_table2["magnitude"])
-for trial_num in compare_metrics_table2["Trial_Str"].unique():
+for trial_num in trial_stores:
     print(grouped_comparison_table2[grouped_comparison_table2["Trial_Str"] == trial_num].sort_values(ascending=False, by="CompScore").head(), '\n')
 
 
 # In[121]:
 
 
-for trial_num in compare_metrics_table2["Trial_Str"].unique():
-    a = grouped_comparison_table1[grouped_comparison_table1["Trial_Str"] == trial_num].sort_values(ascending=False, by="CompScore").set_index(["Trial_Str", "Ctrl_Str"])["CompScore"]
-    b = grouped_comparison_table2[grouped_comparison_table2["Trial_Str"] == trial_num].sort_values(ascending=False, by="CompScore").set_index(["Trial_Str", "Ctrl_Str"])["CompScore"]
-    print((pd.concat([a,b], axis=1).sum(axis=1)/2).sort_values(ascending=False).head(3), '\n')
+from quantium.control import select_controls
+
+# Average of the TOT_SALES and nCustomers composite scores, trial stores scored in parallel
+control_scores, selected_controls = pipeline.run("control_selection", select_controls, pretrial_full_observ, [77, 86, 88],
+                                                  [["TOT_SALES"], ["nCustomers"]], corr_weight=corr_weight)
+for trial_num, scores in control_scores.groupby("Trial_Str", sort=False):
+    print(scores.head(3), '\n')
+print(selected_controls)
+
+
+# In[ ]:
+
+
+from quantium.similarity import StoreSimilarityIndex
+
+# Correlation-only shortlist: the 5 stores whose pre-trial TOT_SALES and nCustomers series correlate best
+# with each trial store, for checking the composite ranking above
+similarity_index = StoreSimilarityIndex(pretrial_full_observ, ["TOT_SALES", "nCustomers"])
+similarity_index.query(trial_stores, k=5)
 
 
 # Top 3 similarity based on TOT_SALES:
@@ -252,7 +242,7 @@ for trial_num in compare_metrics_table2["Trial_Str"].unique():
 # In[76]:
 
 
-trial_control_dic = {77:233, 86:155, 88:40}
+trial_control_dic = selected_controls
 for key, val in trial_control_dic.items():
     pretrial_full_observ[pretrial_full_observ["STORE_NBR"].isin([key, val])].groupby(
         ["YEARMONTH", "STORE_NBR"]).sum()["TOT_SALES"].unstack().plot.bar()
@@ -272,31 +262,19 @@ for key, val in trial_control_dic.items():
 # In[77]:
 
 
-#Ratio of Store 77 and its Control store.
-sales_ratio_77 = pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 77]["TOT_SALES"].sum() / pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 233]["TOT_SALES"].sum()
+from quantium.uplift import scaling_factors, uplift_table
 
-#Ratio of Store 86 and its Control store.
-sales_ratio_86 = pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 86]["TOT_SALES"].sum() / pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 155]["TOT_SALES"].sum()
-
-#Ratio of Store 77 and its Control store.
-sales_ratio_88 = pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 88]["TOT_SALES"].sum() / pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 40]["TOT_SALES"].sum()
+# Pre-trial scaling factor, scaled control series and percentage difference for every
+# trial/control pair and metric, aligned on (pair, YEARMONTH)
+uplift = pipeline.run("uplift", uplift_table, full_observ, trial_control_dic, ["TOT_SALES", "nCustomers"])
+scaling_factors(full_observ, trial_control_dic, ["TOT_SALES", "nCustomers"])
 
 
 # In[78]:
 
 
-trial_full_observ = full_observ[(full_observ["YEARMONTH"] >= 201902) & (full_observ["YEARMONTH"] <= 201904)]
-scaled_sales_control_stores = full_observ[full_observ["STORE_NBR"].isin([233, 155, 40])][["STORE_NBR", "YEARMONTH", "TOT_SALES"]]
-
-def scaler(row):
-    if row["STORE_NBR"] == 233:
-        return row["TOT_SALES"] * sales_ratio_77
-    elif row["STORE_NBR"] == 155:
-        return row["TOT_SALES"] * sales_ratio_86
-    elif row["STORE_NBR"] == 40:
-        return row["TOT_SALES"] * sales_ratio_88
-
-scaled_sales_control_stores["ScaledSales"] = scaled_sales_control_stores.apply(lambda row: scaler(row), axis=1)
+sales_uplift = uplift[uplift["metric"] == "TOT_SALES"]
+scaled_sales_control_stores = sales_uplift.rename(columns={"Ctrl_Str": "STORE_NBR", "control": "TOT_SALES", "scaled_control": "ScaledSales"})[["STORE_NBR", "YEARMONTH", "TOT_SALES", "ScaledSales"]]
 
 trial_scaled_sales_control_stores = scaled_sales_control_stores[(scaled_sales_control_stores["YEARMONTH"] >= 201902) & (scaled_sales_control_stores["YEARMONTH"] <= 201904)]
 pretrial_scaled_sales_control_stores = scaled_sales_control_stores[scaled_sales_control_stores["YEARMONTH"] < 201902]
@@ -309,7 +287,7 @@ percentage_diff = {}
 
 for trial, control in trial_control_dic.items():
     a = trial_scaled_sales_control_stores[trial_scaled_sales_control_stores["STORE_NBR"] == control]
-    b = trial_full_observ[trial_full_observ["STORE_NBR"] == trial][["STORE_NBR", "YEARMONTH", "TOT_SALES"]]
+    b = store_index.frame("trial", stores=[trial])[["STORE_NBR", "YEARMONTH", "TOT_SALES"]]
     percentage_diff[trial] = b["TOT_SALES"].sum() / a["ScaledSales"].sum()
     b[["YEARMONTH", "TOT_SALES"]].merge(a[["YEARMONTH", "ScaledSales"]],on="YEARMONTH").set_index("YEARMONTH").rename(columns={"ScaledSales":"Scaled_Control_Sales", "TOT_SALES":"Trial_Sales"}).plot.bar()
     plt.legend(loc='center left', bbox_to_anchor=(1.0, 0.5))
@@ -326,19 +304,8 @@ percentage_diff
 
 
 #Creating a compiled percentage_difference table
-temp1 = scaled_sales_control_stores.sort_values(by=["STORE_NBR", "YEARMONTH"], ascending=[False, True]).reset_index().drop(["TOT_SALES", "index"], axis=1)
-temp2 = full_observ[full_observ["STORE_NBR"].isin([77,86,88])][["STORE_NBR", "YEARMONTH", "TOT_SALES"]].reset_index().drop(["index", "YEARMONTH"], axis=1)
-scaledsales_vs_trial = pd.concat([temp1, temp2], axis=1)
-scaledsales_vs_trial.columns = ["c_STORE_NBR", "YEARMONTH", "c_ScaledSales", "t_STORE_NBR", "t_TOT_SALES"]
-scaledsales_vs_trial["Sales_Percentage_Diff"] = (scaledsales_vs_trial["t_TOT_SALES"] - scaledsales_vs_trial["c_ScaledSales"]) / (((scaledsales_vs_trial["t_TOT_SALES"] + scaledsales_vs_trial["c_ScaledSales"])/2))
-def label_period(cell):
-    if cell < 201902:
-        return "pre"
-    elif cell > 201904:
-        return "post"
-    else:
-        return "trial"
-scaledsales_vs_trial["trial_period"] = scaledsales_vs_trial["YEARMONTH"].apply(lambda cell: label_period(cell))
+scaledsales_vs_trial = sales_uplift.rename(columns={"Ctrl_Str": "c_STORE_NBR", "scaled_control": "c_ScaledSales", "Trial_Str": "t_STORE_NBR", "trial": "t_TOT_SALES", "pct_diff": "Sales_Percentage_Diff", "period": "trial_period"})
+scaledsales_vs_trial = scaledsales_vs_trial[["c_STORE_NBR", "YEARMONTH", "c_ScaledSales", "t_STORE_NBR", "t_TOT_SALES", "Sales_Percentage_Diff", "trial_period"]]
 scaledsales_vs_trial[scaledsales_vs_trial["trial_period"] == "trial"]
 
 
@@ -359,20 +326,13 @@ scaledsales_vs_trial[scaledsales_vs_trial["trial_period"] == "trial"]
 # In[82]:
 
 
-from scipy.stats import ttest_ind, t
+from quantium.assessment import assess_trials
+
+# Steps 1-3 for every trial/control pair, metric and trial month in one pass
+assessment = pipeline.run("assessment", assess_trials, uplift, alpha=0.05)
 
 # Step 1
-for num in [40, 155, 233]:
-    print("Store", num)
-    print(ttest_ind(pretrial_scaled_sales_control_stores[pretrial_scaled_sales_control_stores["STORE_NBR"] == num]["ScaledSales"],
-                   trial_scaled_sales_control_stores[trial_scaled_sales_control_stores["STORE_NBR"] == num]["ScaledSales"],
-                   equal_var=False), '\n')
-    #print(len(pretrial_scaled_sales_control_stores[pretrial_scaled_sales_control_stores["STORE_NBR"] == num]["ScaledSales"]), len(trial_scaled_sales_control_stores[trial_scaled_sales_control_stores["STORE_NBR"] == num]["ScaledSales"]))
-    
-alpha = 0.05
-print("Critical t-value for 95% confidence interval:")
-print(t.ppf((alpha/2, 1-alpha/2), df=min([len(pretrial_scaled_sales_control_stores[pretrial_scaled_sales_control_stores["STORE_NBR"] == num]),
-                       len(trial_scaled_sales_control_stores[trial_scaled_sales_control_stores["STORE_NBR"] == num])])-1))
+assessment[(assessment["metric"] == "TOT_SALES") & (assessment["test"] == "control_pre_vs_trial")]
 
 
 # In[83]:
@@ -388,16 +348,7 @@ b = trial_scaled_sales_control_stores[trial_scaled_sales_control_stores["STORE_N
 
 
 # Step 2
-for trial, cont in trial_control_dic.items():
-    print("Trial store:", trial, ", Control store:", cont)
-    print(ttest_ind(pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == trial]["TOT_SALES"],
-                   pretrial_scaled_sales_control_stores[pretrial_scaled_sales_control_stores["STORE_NBR"] == cont]["ScaledSales"],
-                   equal_var=True), '\n')
-    #print(len(pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == trial]["TOT_SALES"]),len(pretrial_scaled_sales_control_stores[pretrial_scaled_sales_control_stores["STORE_NBR"] == cont]["ScaledSales"]))
-
-alpha = 0.05
-print("Critical t-value for 95% confidence interval:")
-print(t.ppf((alpha/2, 1-alpha/2), df=len(pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == trial])-1))
+assessment[(assessment["metric"] == "TOT_SALES") & (assessment["test"] == "pre_trial_similarity")]
 
 
 # Null hypothesis is true. There isn't any statistically significant difference between Trial store's sales and Control store's scaled-sales performance during pre-trial.
@@ -406,20 +357,7 @@ print(t.ppf((alpha/2, 1-alpha/2), df=len(pretrial_full_observ[pretrial_full_obse
 
 
 # Step 3
-for trial, cont in trial_control_dic.items():
-    print("Trial store:", trial, ", Control store:", cont)
-    temp_pre = scaledsales_vs_trial[(scaledsales_vs_trial["c_STORE_NBR"] == cont) & (scaledsales_vs_trial["trial_period"]=="pre")]
-    std = temp_pre["Sales_Percentage_Diff"].std()
-    mean = temp_pre["Sales_Percentage_Diff"].mean()
-    #print(std, mean)
-    for t_month in scaledsales_vs_trial[scaledsales_vs_trial["trial_period"] == "trial"]["YEARMONTH"].unique():
-        pdif = scaledsales_vs_trial[(scaledsales_vs_trial["YEARMONTH"] == t_month) & (scaledsales_vs_trial["t_STORE_NBR"] == trial)]["Sales_Percentage_Diff"]
-        print(t_month,":",(float(pdif)-mean)/std)
-    print('\n')
-    
-print("Critical t-value for 95% confidence interval:")
-conf_intv_95 = t.ppf(0.95, df=len(temp_pre)-1)
-print(conf_intv_95)
+assessment[(assessment["metric"] == "TOT_SALES") & (assessment["test"] == "trial_month")]
 
 
 # There are 3 months' increase in performance that are statistically significant (Above the 95% confidence interval t-score):
@@ -431,7 +369,7 @@ print(conf_intv_95)
 
 for trial, control in trial_control_dic.items():
     a = trial_scaled_sales_control_stores[trial_scaled_sales_control_stores["STORE_NBR"] == control].rename(columns={"TOT_SALES": "control_TOT_SALES"})
-    b = trial_full_observ[trial_full_observ["STORE_NBR"] == trial][["STORE_NBR", "YEARMONTH", "TOT_SALES"]].rename(columns={"TOT_SALES": "trial_TOT_SALES"})
+    b = store_index.frame("trial", stores=[trial])[["STORE_NBR", "YEARMONTH", "TOT_SALES"]].rename(columns={"TOT_SALES": "trial_TOT_SALES"})
     comb = b[["YEARMONTH", "trial_TOT_SALES"]].merge(a[["YEARMONTH", "control_TOT_SALES"]],on="YEARMONTH").set_index("YEARMONTH")
     comb.plot.bar()
     cont_sc_sales = trial_scaled_sales_control_stores[trial_scaled_sales_control_stores["STORE_NBR"] == control]["TOT_SALES"]
@@ -442,7 +380,6 @@ for trial, control in trial_control_dic.items():
     plt.axhline(y=thresh5,linewidth=1, color='r', label="5% threshold")
     plt.legend(loc='center left', bbox_to_anchor=(1.0, 0.5))
     plt.title("Trial Store "+str(trial)+" and Control Store "+str(control)+" - Total Sales")
-    plt.savefig("TS {} and CS {} - TOT_SALES.png".format(trial,control), bbox_inches="tight")
 
 
 # We can see that Trial store 77 sales for March and April exceeds 95% threshold of control store. Same goes to store 86 sales for March.
@@ -452,31 +389,14 @@ for trial, control in trial_control_dic.items():
 # In[87]:
 
 
-#Ratio of Store 77 and its Control store.
-ncust_ratio_77 = pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 77]["nCustomers"].sum() / pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 233]["nCustomers"].sum()
-
-#Ratio of Store 86 and its Control store.
-ncust_ratio_86 = pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 86]["nCustomers"].sum() / pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 155]["nCustomers"].sum()
-
-#Ratio of Store 77 and its Control store.
-ncust_ratio_88 = pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 88]["nCustomers"].sum() / pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == 40]["nCustomers"].sum()
+ncust_uplift = uplift[uplift["metric"] == "nCustomers"]
 
 
 # In[88]:
 
 
 #trial_full_observ = full_observ[(full_observ["YEARMONTH"] >= 201902) & (full_observ["YEARMONTH"] <= 201904)]
-scaled_ncust_control_stores = full_observ[full_observ["STORE_NBR"].isin([233, 155, 40])][["STORE_NBR", "YEARMONTH", "nCustomers"]]
-
-def scaler_c(row):
-    if row["STORE_NBR"] == 233:
-        return row["nCustomers"] * ncust_ratio_77
-    elif row["STORE_NBR"] == 155:
-        return row["nCustomers"] * ncust_ratio_86
-    elif row["STORE_NBR"] == 40:
-        return row["nCustomers"] * ncust_ratio_88
-
-scaled_ncust_control_stores["ScaledNcust"] = scaled_ncust_control_stores.apply(lambda row: scaler_c(row), axis=1)
+scaled_ncust_control_stores = ncust_uplift.rename(columns={"Ctrl_Str": "STORE_NBR", "control": "nCustomers", "scaled_control": "ScaledNcust"})[["STORE_NBR", "YEARMONTH", "nCustomers", "ScaledNcust"]]
 
 trial_scaled_ncust_control_stores = scaled_ncust_control_stores[(scaled_ncust_control_stores["YEARMONTH"] >= 201902) & (scaled_ncust_control_stores["YEARMONTH"] <= 201904)]
 pretrial_scaled_ncust_control_stores = scaled_ncust_control_stores[scaled_ncust_control_stores["YEARMONTH"] < 201902]
@@ -489,7 +409,7 @@ ncust_percentage_diff = {}
 
 for trial, control in trial_control_dic.items():
     a = trial_scaled_ncust_control_stores[trial_scaled_ncust_control_stores["STORE_NBR"] == control]
-    b = trial_full_observ[trial_full_observ["STORE_NBR"] == trial][["STORE_NBR", "YEARMONTH", "nCustomers"]]
+    b = store_index.frame("trial", stores=[trial])[["STORE_NBR", "YEARMONTH", "nCustomers"]]
     ncust_percentage_diff[trial] = b["nCustomers"].sum() / a["ScaledNcust"].sum()
     b[["YEARMONTH", "nCustomers"]].merge(a[["YEARMONTH", "ScaledNcust"]],on="YEARMONTH").set_index("YEARMONTH").rename(columns={"ScaledSales":"Scaled_Control_nCust", "TOT_SALES":"Trial_nCust"}).plot.bar()
     plt.legend(loc='center left', bbox_to_anchor=(1.0, 0.5))
@@ -506,13 +426,8 @@ ncust_percentage_diff
 
 
 #Creating a compiled ncust_percentage_difference table
-temp1 = scaled_ncust_control_stores.sort_values(by=["STORE_NBR", "YEARMONTH"], ascending=[False, True]).reset_index().drop(["nCustomers", "index"], axis=1)
-temp2 = full_observ[full_observ["STORE_NBR"].isin([77,86,88])][["STORE_NBR", "YEARMONTH", "nCustomers"]].reset_index().drop(["index", "YEARMONTH"], axis=1)
-scaledncust_vs_trial = pd.concat([temp1, temp2], axis=1)
-scaledncust_vs_trial.columns = ["c_STORE_NBR", "YEARMONTH", "c_ScaledNcust", "t_STORE_NBR", "t_nCustomers"]
-scaledncust_vs_trial["nCust_Percentage_Diff"] = (scaledncust_vs_trial["t_nCustomers"] - scaledncust_vs_trial["c_ScaledNcust"]) / (((scaledncust_vs_trial["t_nCustomers"] + scaledncust_vs_trial["c_ScaledNcust"])/2))
-
-scaledncust_vs_trial["trial_period"] = scaledncust_vs_trial["YEARMONTH"].apply(lambda cell: label_period(cell))
+scaledncust_vs_trial = ncust_uplift.rename(columns={"Ctrl_Str": "c_STORE_NBR", "scaled_control": "c_ScaledNcust", "Trial_Str": "t_STORE_NBR", "trial": "t_nCustomers", "pct_diff": "nCust_Percentage_Diff", "period": "trial_period"})
+scaledncust_vs_trial = scaledncust_vs_trial[["c_STORE_NBR", "YEARMONTH", "c_ScaledNcust", "t_STORE_NBR", "t_nCustomers", "nCust_Percentage_Diff", "trial_period"]]
 scaledncust_vs_trial[scaledncust_vs_trial["trial_period"] == "trial"]
 
 
@@ -525,51 +440,21 @@ scaledncust_vs_trial[scaledncust_vs_trial["trial_period"] == "trial"]
 
 
 # Step 1
-for num in [40, 155, 233]:
-    print("Store", num)
-    print(ttest_ind(pretrial_scaled_ncust_control_stores[pretrial_scaled_ncust_control_stores["STORE_NBR"] == num]["ScaledNcust"],
-                   trial_scaled_ncust_control_stores[trial_scaled_ncust_control_stores["STORE_NBR"] == num]["ScaledNcust"],
-                   equal_var=False), '\n')
-    
-alpha = 0.05
-print("Critical t-value for 95% confidence interval:")
-print(t.ppf((alpha/2, 1-alpha/2), df=min([len(pretrial_scaled_ncust_control_stores[pretrial_scaled_ncust_control_stores["STORE_NBR"] == num]),
-                       len(trial_scaled_ncust_control_stores[trial_scaled_ncust_control_stores["STORE_NBR"] == num])])-1))
+assessment[(assessment["metric"] == "nCustomers") & (assessment["test"] == "control_pre_vs_trial")]
 
 
 # In[93]:
 
 
 # Step 2
-for trial, cont in trial_control_dic.items():
-    print("Trial store:", trial, ", Control store:", cont)
-    print(ttest_ind(pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == trial]["nCustomers"],
-                   pretrial_scaled_ncust_control_stores[pretrial_scaled_ncust_control_stores["STORE_NBR"] == cont]["ScaledNcust"],
-                   equal_var=True), '\n')
-
-alpha = 0.05
-print("Critical t-value for 95% confidence interval:")
-print(t.ppf((alpha/2, 1-alpha/2), df=len(pretrial_full_observ[pretrial_full_observ["STORE_NBR"] == trial])-1))
+assessment[(assessment["metric"] == "nCustomers") & (assessment["test"] == "pre_trial_similarity")]
 
 
 # In[94]:
 
 
 # Step 3
-for trial, cont in trial_control_dic.items():
-    print("Trial store:", trial, ", Control store:", cont)
-    temp_pre = scaledncust_vs_trial[(scaledncust_vs_trial["c_STORE_NBR"] == cont) & (scaledncust_vs_trial["trial_period"]=="pre")]
-    std = temp_pre["nCust_Percentage_Diff"].std()
-    mean = temp_pre["nCust_Percentage_Diff"].mean()
-    #print(std, mean)
-    for t_month in scaledncust_vs_trial[scaledncust_vs_trial["trial_period"] == "trial"]["YEARMONTH"].unique():
-        pdif = scaledncust_vs_trial[(scaledncust_vs_trial["YEARMONTH"] == t_month) & (scaledncust_vs_trial["t_STORE_NBR"] == trial)]["nCust_Percentage_Diff"]
-        print(t_month,":",(float(pdif)-mean)/std)
-    print('\n')
-    
-print("Critical t-value for 95% confidence interval:")
-conf_intv_95 = t.ppf(0.95, df=len(temp_pre)-1)
-print(conf_intv_95)
+assessment[(assessment["metric"] == "nCustomers") & (assessment["test"] == "trial_month")]
 
 
 # There are 5 months' increase in performance that are statistically significant (Above the 95% confidence interval t-score):
@@ -581,7 +466,7 @@ print(conf_intv_95)
 
 for trial, control in trial_control_dic.items():
     a = trial_scaled_ncust_control_stores[trial_scaled_ncust_control_stores["STORE_NBR"] == control].rename(columns={"nCustomers": "control_nCustomers"})
-    b = trial_full_observ[trial_full_observ["STORE_NBR"] == trial][["STORE_NBR", "YEARMONTH", "nCustomers"]].rename(columns={"nCustomers": "trial_nCustomers"})
+    b = store_index.frame("trial", stores=[trial])[["STORE_NBR", "YEARMONTH", "nCustomers"]].rename(columns={"nCustomers": "trial_nCustomers"})
     comb = b[["YEARMONTH", "trial_nCustomers"]].merge(a[["YEARMONTH", "control_nCustomers"]],on="YEARMONTH").set_index("YEARMONTH")
     comb.plot.bar()
     cont_sc_ncust = trial_scaled_ncust_control_stores[trial_scaled_ncust_control_stores["STORE_NBR"] == control]["nCustomers"]
@@ -592,12 +477,54 @@ for trial, control in trial_control_dic.items():
     plt.axhline(y=thresh5,linewidth=1, color='r', label="5% threshold")
     plt.legend(loc='center left', bbox_to_anchor=(1.0, 0.5))
     plt.title("Trial Store "+str(trial)+" and Control Store "+str(control)+" - Number of Customers")
-    plt.savefig("TS {} and CS {} - nCustomers.png".format(trial,control), bbox_inches="tight")
+
+
+# In[ ]:
+
+
+from quantium.report import render_report, trial_control_specs
+
+# Chart pack for every pair, rendered headless in parallel; charts whose inputs did not change are skipped
+chart_specs = trial_control_specs(uplift, "TOT_SALES") + trial_control_specs(uplift, "nCustomers")
+render_report(chart_specs, out_dir=".")
 
 
 # We can see that Trial store 77 sales for Feb, March, and April exceeds 95% threshold of control store.
 # Same goes to store 86 sales for all 3 trial months.
 
+# ## Resampling check of the trial uplift
+# 
+# The t-tests above assume normally distributed percentage differences. The resampling tests below check the same conclusions without that assumption.
+
+# In[ ]:
+
+
+from quantium.inference import placebo_test, resample_uplift
+
+# Resampling check of the t-tests: bootstrap interval and permutation p-value of the mean trial-period uplift,
+# and the trial store's rank among placebo effects of every other eligible store
+resampled = resample_uplift(uplift, n_resamples=9999, seed=0)
+placebos = placebo_test(full_observ, trial_control_dic, ["TOT_SALES", "nCustomers"])
+resampled.merge(placebos[["Trial_Str", "Ctrl_Str", "metric", "n_placebos", "placebo_p_value"]],
+                on=["Trial_Str", "Ctrl_Str", "metric"])
+
+
+# ## Synthetic control
+# 
+# Instead of one control store per trial store, each trial store's pre-trial months are reproduced by a weighted mix of every eligible store, and the same weights give the counterfactual for the trial months.
+
+# In[ ]:
+
+
+from quantium.synthetic import fit_synthetic_controls, synthetic_counterfactual
+
+# Synthetic control: convex weights over every eligible store, fitted to each trial store's pre-trial months,
+# with a small ridge so similar stores share the weight
+synthetic_weights = fit_synthetic_controls(full_observ, trial_stores, ["TOT_SALES", "nCustomers"], ridge=0.01)
+synthetic = synthetic_counterfactual(full_observ, synthetic_weights)
+synthetic[synthetic["period"] == "trial"]
+
+
 # - Trial store 77: Control store 233
 # - Trial store 86: Control store 155
 # - Trial store 88: Control store 40
@@ -0,0 +1 @@
+"""Benchmarks of the quantium pipeline stages on synthetic QVI data."""
@@ -0,0 +1,171 @@
+"""Seeded synthetic QVI tables at any size.
+
+The generated tables have the columns and types of the QVI sources:
+transactions (DATE as Excel serial days, STORE_NBR, LYLTY_CARD_NBR, TXN_ID,
+PROD_NBR, PROD_NAME, PROD_QTY, TOT_SALES) and customers (LYLTY_CARD_NBR,
+LIFESTAGE, PREMIUM_CUSTOMER). Product names follow the QVI pattern of a brand
+word (including its alias spellings), flavour words and a pack size in grams,
+and include salsa products and a few PROD_QTY = 200 outliers, so every
+cleaning step has something to do.
+
+Transactions come in baskets of one to four rows sharing a TXN_ID, customer,
+store and date. Every customer segment (LIFESTAGE x PREMIUM_CUSTOMER) has two
+favourite brands it buys far more often, and every brand has a companion brand
+that often joins it in a basket, so the segment/brand and basket association
+rules have real patterns to find.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Real QVI volumes: one "1x" data set
+BASE_SIZES = {"n_transactions": 264836, "n_customers": 72637, "n_stores": 272, "n_products": 114}
+
+LIFESTAGES = ["YOUNG SINGLES/COUPLES", "YOUNG FAMILIES", "OLDER SINGLES/COUPLES", "MIDAGE SINGLES/COUPLES",
+              "NEW FAMILIES", "OLDER FAMILIES", "RETIREES"]
+PREMIUM = ["Budget", "Mainstream", "Premium"]
+BRAND_WORDS = ["Smiths", "Smith", "Kettle", "Doritos", "Dorito", "Pringles", "Infuzions", "Infzns", "Thins", "RRD", "Red",
+               "Twisties", "Tostitos", "Cobs", "Grain", "GrnWves", "Natural", "NCC", "Tyrrells", "Cheezels", "CCs",
+               "WW", "Woolworths", "Sunbites", "Snbts", "Cheetos", "Burger", "French"]
+FLAVOUR_WORDS = ["Original", "Salt", "Vinegar", "Chicken", "Cheese", "Sour", "Cream", "Chives", "Sweet", "Chilli", "Lime",
+                 "BBQ", "Honey", "Jalapeno", "Onion", "Crinkle", "Cut", "Chips", "Corn", "Tangy", "Mild", "Supreme"]
+PACK_SIZES = [70, 90, 110, 125, 134, 150, 160, 165, 170, 175, 180, 190, 200, 210, 220, 250, 270, 300, 330, 380]
+SALSA_SHARE = 0.08
+BASKET_SIZES = [1, 2, 3, 4]
+BASKET_SIZE_P = [0.45, 0.3, 0.15, 0.1]
+FAVOURITE_BRANDS = 2
+FAVOURITE_WEIGHT = 15.0
+COMPANION_SHARE = 0.3
+FIRST_DAY = 43282  # 2018-07-01 as Excel serial days
+N_DAYS = 365
+CHRISTMAS = 43459  # 2018-12-25, a day without sales as in the real data
+
+
+def scaled_sizes(scale, base=None):
+    """Table sizes for a scale factor.
+
+    Transactions and customers grow linearly with ``scale``; stores and products grow
+    with its square root, so both the number of entities and the volume per entity grow.
+    Args:
+        scale (float): Multiple of the base sizes.
+        base (dict): Base sizes; None uses ``BASE_SIZES`` (the real QVI volumes).
+
+    Returns:
+        dict: n_transactions, n_customers, n_stores and n_products.
+    """
+    base = BASE_SIZES if base is None else base
+    root = np.sqrt(scale)
+    return {
+        "n_transactions": int(round(base["n_transactions"] * scale)),
+        "n_customers": int(round(base["n_customers"] * scale)),
+        "n_stores": max(int(round(base["n_stores"] * root)), 1),
+        "n_products": max(int(round(base["n_products"] * root)), 1),
+    }
+
+
+def product_table(n_products, rng):
+    """PROD_NBR, PROD_NAME and unit price of ``n_products`` synthetic products."""
+    brands = rng.choice(BRAND_WORDS, n_products)
+    sizes = rng.choice(PACK_SIZES, n_products)
+    salsa = rng.random(n_products) < SALSA_SHARE
+    names = []
+    for brand, size, is_salsa in zip(brands, sizes, salsa):
+        words = " ".join(rng.choice(FLAVOUR_WORDS, rng.integers(1, 4)))
+        if is_salsa:
+            words = "Salsa " + words
+        unit = "G" if rng.random() < 0.05 else "g"
+        names.append("{} {} {}{}".format(brand, words, size, unit))
+    return pd.DataFrame({
+        "PROD_NBR": np.arange(1, n_products + 1),
+        "PROD_NAME": names,
+        "price": rng.uniform(1.5, 6.5, n_products).round(1),
+    })
+
+
+def _basket_ids(n_rows, rng):
+    """Basket number of every row, baskets holding ``BASKET_SIZES`` rows."""
+    n_draw = int(n_rows / np.dot(BASKET_SIZES, BASKET_SIZE_P) * 1.05) + 16
+    baskets = np.repeat(np.arange(n_draw), rng.choice(BASKET_SIZES, n_draw, p=BASKET_SIZE_P))[:n_rows]
+    missing = n_rows - len(baskets)
+    # Rare short draw: the remaining rows become single-row baskets
+    return np.concatenate([baskets, np.arange(n_draw, n_draw + missing)]) if missing > 0 else baskets
+
+
+def generate_qvi(n_transactions, n_customers, n_stores, n_products, seed=0):
+    """Generate transaction and customer tables with the QVI schemas.
+    Args:
+        n_transactions (int): Transaction rows.
+        n_customers (int): Loyalty cards.
+        n_stores (int): Stores; each customer shops at one home store.
+        n_products (int): Distinct products.
+        seed (int): Seed of the random generator; equal seeds give equal tables.
+
+    Returns:
+        tuple: (transactions DataFrame, customers DataFrame).
+    """
+    rng = np.random.default_rng(seed)
+    stores = np.arange(1, n_stores + 1)
+    home = rng.choice(stores, n_customers)
+    # Card numbers are the home store followed by a running number, like the real ones
+    per_store = pd.Series(home).groupby(home).cumcount().values
+    width = max(1000, 10 ** len(str(per_store.max() if n_customers else 0)))
+    cards = home.astype(np.int64) * width + per_store
+    lifestage = rng.integers(0, len(LIFESTAGES), n_customers)
+    premium = rng.choice(len(PREMIUM), n_customers, p=[0.35, 0.39, 0.26])
+    customers = pd.DataFrame({
+        "LYLTY_CARD_NBR": cards,
+        "LIFESTAGE": np.asarray(LIFESTAGES)[lifestage],
+        "PREMIUM_CUSTOMER": np.asarray(PREMIUM)[premium],
+    }).sort_values("LYLTY_CARD_NBR", ignore_index=True)
+
+    # Baskets: one customer, day and store per TXN_ID
+    basket = _basket_ids(n_transactions, rng)
+    n_baskets = basket[-1] + 1 if n_transactions else 0
+    basket_customer = rng.integers(0, n_customers, n_baskets)
+    basket_day = FIRST_DAY + rng.integers(0, N_DAYS - 1, n_baskets)
+    basket_day[basket_day >= CHRISTMAS] += 1
+    customer = basket_customer[basket]
+
+    # Skewed product popularity, boosted for each segment's favourite brands
+    products = product_table(n_products, rng)
+    popularity = rng.pareto(1.5, n_products) + 1
+    brand_words = products["PROD_NAME"].str.split().str[0].values
+    segment = (lifestage * len(PREMIUM) + premium)[customer]
+    order = np.argsort(segment, kind="stable")
+    bounds = np.searchsorted(segment[order], np.arange(len(LIFESTAGES) * len(PREMIUM) + 1))
+    product = np.empty(n_transactions, dtype=np.int64)
+    for k in range(len(bounds) - 1):
+        rows = order[bounds[k]:bounds[k + 1]]
+        favourites = rng.choice(np.unique(brand_words), min(FAVOURITE_BRANDS, len(set(brand_words))), replace=False)
+        weights = popularity * np.where(np.isin(brand_words, favourites), FAVOURITE_WEIGHT, 1.0)
+        product[rows] = rng.choice(n_products, len(rows), p=weights / weights.sum())
+
+    # Later rows of a basket often hold the most popular product of the first row's companion brand
+    if n_transactions:
+        brands, brand_codes = np.unique(brand_words, return_inverse=True)
+        companion = rng.permutation(len(brands))
+        best = pd.Series(popularity).groupby(brand_codes).idxmax().reindex(range(len(brands))).values
+        first_row = np.flatnonzero(np.r_[True, basket[1:] != basket[:-1]])
+        first_product = product[first_row][basket]
+        joins = (np.arange(n_transactions) != first_row[basket]) & (rng.random(n_transactions) < COMPANION_SHARE)
+        product[joins] = best[companion[brand_codes[first_product[joins]]]]
+
+    quantity = rng.choice([1, 2, 3, 4, 5], n_transactions, p=[0.1, 0.84, 0.03, 0.02, 0.01])
+    quantity[rng.choice(n_transactions, min(2, n_transactions), replace=False)] = 200
+
+    transactions = pd.DataFrame({
+        "DATE": basket_day[basket],
+        "STORE_NBR": home[customer],
+        "LYLTY_CARD_NBR": cards[customer],
+        "TXN_ID": basket + 1,
+        "PROD_NBR": products["PROD_NBR"].values[product],
+        "PROD_NAME": products["PROD_NAME"].values[product],
+        "PROD_QTY": quantity,
+        "TOT_SALES": (quantity * products["price"].values[product]).round(1),
+    })
+    return transactions, customers
+
+
+def generate_scaled(scale, seed=0, base=None):
+    """``generate_qvi`` at ``scaled_sizes(scale, base)``."""
+    return generate_qvi(seed=seed, **scaled_sizes(scale, base))
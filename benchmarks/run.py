@@ -0,0 +1,315 @@
+"""Time and memory-profile every pipeline stage on synthetic data at several scales.
+
+For each scale factor a seeded data set is generated with ``benchmarks.datagen``
+and the pipeline runs stage by stage, each stage taking the previous stages'
+outputs:
+
+    ingest_cold -> ingest_warm -> clean -> brands -> segments -> segment_rules
+    -> basket_rules -> store_metrics -> eligibility -> correlation -> distance
+    -> controls -> assessment
+
+Wall time is the best of ``--repeat`` runs. Peak memory is measured in a
+separate run under ``tracemalloc`` (which slows the stage down), as the peak
+of Python and NumPy allocations above what was allocated when the stage
+started. Results are written as JSON to ``benchmarks/results`` together with
+the commit and library versions, and ``--compare`` prints the ratio of every
+number to an earlier result file, so regressions show up as numbers.
+
+    python -m benchmarks.run --scales 1 10 100
+    python -m benchmarks.run --scales 1 --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datagen import BASE_SIZES, generate_qvi, scaled_sizes
+from quantium.affinity import basket_pair_rules, segment_brand_rules
+from quantium.assessment import assess_trials
+from quantium.brands import clean_brand_names
+from quantium.clean import clean_transactions
+from quantium.control import correlation_table, distance_table, select_controls
+from quantium.dates import yearmonth
+from quantium.eligibility import StoreMonthIndex
+from quantium.ingest import load_purchase_behaviour, load_transactions
+from quantium.segments import segment_summary, top_n_per_segment
+from quantium.store_metrics import monthly_store_metrics
+from quantium.uplift import uplift_table
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+STAGES = ["ingest_cold", "ingest_warm", "clean", "brands", "segments", "segment_rules", "basket_rules",
+          "store_metrics", "eligibility", "correlation", "distance", "controls", "assessment"]
+METRICS = ["TOT_SALES", "nCustomers"]
+TRIAL_STORES = [77, 86, 88]
+
+
+def stage_ingest_cold(state):
+    shutil.rmtree(state["cache_dir"], ignore_errors=True)
+    state["transactions"] = load_transactions(state["transactions_path"], cache_dir=state["cache_dir"], compact=True)
+    state["customers"] = load_purchase_behaviour(state["customers_path"], cache_dir=state["cache_dir"], compact=True)
+    return len(state["transactions"])
+
+
+def stage_ingest_warm(state):
+    state["transactions"] = load_transactions(state["transactions_path"], cache_dir=state["cache_dir"], compact=True)
+    state["customers"] = load_purchase_behaviour(state["customers_path"], cache_dir=state["cache_dir"], compact=True)
+    return len(state["transactions"])
+
+
+def stage_clean(state):
+    clean = clean_transactions(state["transactions"], state["customers"])
+    state["clean"] = clean.assign(YEARMONTH=yearmonth(clean["DATE"]))
+    return len(clean)
+
+
+def stage_brands(state):
+    return len(clean_brand_names(state["transactions"]["PROD_NAME"]))
+
+
+def stage_segments(state):
+    top_n_per_segment(state["clean"], "Cleaned_Brand_Names", n=3)
+    return len(segment_summary(state["clean"]))
+
+
+def _found_rules(rules, stage):
+    # Without rules the stage would only time the empty-result path
+    if rules.empty:
+        raise RuntimeError("{} found no rules in the generated data".format(stage))
+    return len(rules)
+
+
+def stage_segment_rules(state):
+    return _found_rules(segment_brand_rules(state["clean"]), "segment_rules")
+
+
+def stage_basket_rules(state):
+    return _found_rules(basket_pair_rules(state["clean"]), "basket_rules")
+
+
+def stage_store_metrics(state):
+    state["store_metrics"] = monthly_store_metrics(state["clean"]).reset_index()
+    return len(state["store_metrics"])
+
+
+def stage_eligibility(state):
+    index = StoreMonthIndex(state["store_metrics"])
+    eligible = index.eligible_stores()
+    # The QVI trial stores when the data set has them, else the first eligible stores
+    trials = [store for store in TRIAL_STORES if store in set(eligible)] or list(eligible[:3])
+    state.update(index=index, eligible=eligible, trials=trials, pretrial=index.frame("pre", stores=eligible))
+    return len(eligible)
+
+
+def stage_correlation(state):
+    return len(correlation_table(state["pretrial"], METRICS, state["trials"]))
+
+
+def stage_distance(state):
+    return len(distance_table(state["pretrial"], METRICS, state["trials"]))
+
+
+def stage_controls(state):
+    scores, state["controls"] = select_controls(state["pretrial"], state["trials"], [[metric] for metric in METRICS],
+                                                n_jobs=1)
+    return len(scores)
+
+
+def stage_assessment(state):
+    table = state["index"].frame(stores=state["eligible"])
+    return len(assess_trials(uplift_table(table, state["controls"], METRICS)))
+
+
+STAGE_FUNCTIONS = {name: globals()["stage_" + name] for name in STAGES}
+
+
+def _time_stage(func, state, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        rows = func(state)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def _peak_memory(func, state):
+    """Peak bytes allocated by one run of ``func`` on top of what was allocated before it."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        func(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak - base
+
+
+def _write_inputs(transactions, customers, work_dir):
+    """Write the generated tables as the CSV files the loaders read."""
+    paths = {"transactions_path": os.path.join(work_dir, "transactions.csv"),
+             "customers_path": os.path.join(work_dir, "customers.csv")}
+    transactions.to_csv(paths["transactions_path"], index=False)
+    customers.to_csv(paths["customers_path"], index=False)
+    return paths
+
+
+def benchmark_scale(scale, stages=STAGES, base=None, seed=0, repeat=1, memory=True, work_dir=None, log=None):
+    """Generate one data set and benchmark the requested stages on it.
+    Args:
+        scale (float): Multiple of the base data set size.
+        stages (list): Stage names, run in ``STAGES`` order. Stages they depend on always run.
+        base (dict): Base sizes for ``scaled_sizes``. None uses the real QVI volumes.
+        seed (int): Seed of the data generator.
+        repeat (int): Timed runs per stage; the fastest counts.
+        memory (bool): Also measure each stage's peak memory in an extra traced run.
+        work_dir (str): Directory for the generated CSV files and the columnar cache.
+            None uses a temporary directory, removed afterwards.
+        log (callable): Called with a progress line per stage.
+
+    Returns:
+        list: One dict per stage with scale, stage, seconds, peak_mb, rows and the data set sizes.
+    """
+    sizes = scaled_sizes(scale, base)
+    temporary = work_dir is None
+    work_dir = tempfile.mkdtemp(prefix="qvi_bench_") if temporary else work_dir
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        transactions, customers = generate_qvi(seed=seed, **sizes)
+        state = _write_inputs(transactions, customers, work_dir)
+        state["cache_dir"] = os.path.join(work_dir, "cache")
+        del transactions, customers
+
+        records = []
+        for stage in STAGES:
+            func = STAGE_FUNCTIONS[stage]
+            if stage not in stages:
+                func(state)
+                continue
+            seconds, rows = _time_stage(func, state, repeat)
+            peak = _peak_memory(func, state) if memory else None
+            record = dict(scale=scale, stage=stage, seconds=round(seconds, 4), rows=int(rows),
+                          peak_mb=None if peak is None else round(peak / 2 ** 20, 1), **sizes)
+            records.append(record)
+            if log is not None:
+                log("{:>7}x {:<14} {:>9.3f} s {:>10} MB {:>10} rows".format(
+                    scale, stage, seconds, "-" if peak is None else record["peak_mb"], rows))
+        return records
+    finally:
+        if temporary:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(RESULTS_DIR)).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Commit and library versions recorded with every result file."""
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(records, previous):
+    """Ratio of every time and peak memory to an earlier result file's (above 1 is slower/larger).
+    Args:
+        records (list): Records from ``benchmark_scale``.
+        previous (dict): Content of an earlier result file.
+
+    Returns:
+        DataFrame: One row per scale and stage present in both, with both values and their ratios.
+    """
+    keys = ["scale", "stage"]
+    now = pd.DataFrame(records)
+    before = pd.DataFrame(previous["results"])
+    if now.empty or before.empty:
+        return pd.DataFrame()
+    now["peak_mb"] = now["peak_mb"].astype("float64")
+    before["peak_mb"] = before["peak_mb"].astype("float64")
+    merged = now[keys + ["seconds", "peak_mb"]].merge(before[keys + ["seconds", "peak_mb"]], on=keys,
+                                                     suffixes=("", "_before"))
+    for column in ["seconds", "peak_mb"]:
+        merged[column + "_ratio"] = (merged[column] / merged[column + "_before"]).round(2)
+    return merged
+
+
+def build_parser():
+    """Argument parser of ``python -m benchmarks.run``."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", nargs="+", type=float, default=[1, 10, 100],
+                        help="Scale factors of the data set (default: 1 10 100).")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to report (default: all).")
+    parser.add_argument("--base-rows", type=int, default=BASE_SIZES["n_transactions"],
+                        help="Transactions at scale 1; customers, stores and products shrink or grow with it.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the data generator.")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage; the fastest counts.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak-memory runs.")
+    parser.add_argument("--work-dir", help="Keep the generated files and cache here instead of a temporary directory.")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<time>-<commit>.json).")
+    parser.add_argument("--compare", help="Earlier result file to compare against.")
+    return parser
+
+
+def _base_sizes(base_rows):
+    if base_rows == BASE_SIZES["n_transactions"]:
+        return None
+    ratio = base_rows / BASE_SIZES["n_transactions"]
+    sizes = scaled_sizes(ratio)
+    sizes["n_transactions"] = base_rows
+    return sizes
+
+
+def _print(line):
+    print(line, flush=True)
+
+
+def main(argv=None):
+    """Entry point of ``python -m benchmarks.run``; returns the process exit status."""
+    args = build_parser().parse_args(argv)
+    base = _base_sizes(args.base_rows)
+    records = []
+    for scale in args.scales:
+        records.extend(benchmark_scale(scale, args.stages, base, args.seed, args.repeat, not args.no_memory,
+                                       args.work_dir and os.path.join(args.work_dir, "x{:g}".format(scale)), _print))
+
+    result = {"environment": environment(), "seed": args.seed, "base_sizes": base or BASE_SIZES,
+              "repeat": args.repeat, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": records}
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, "{}-{}.json".format(time.strftime("%Y%m%d-%H%M%S"),
+                                                               result["environment"]["commit"] or "nogit"))
+    with open(output, "w") as handle:
+        json.dump(result, handle, indent=1)
+    print("Results written to {}".format(output))
+
+    if args.compare:
+        with open(args.compare) as handle:
+            print(compare(records, json.load(handle)).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Reusable building blocks for the Quantium Module 1 and Module 2 analyses."""
@@ -0,0 +1,7 @@
+"""Run the QVI pipeline: ``python -m quantium --help``."""
+import sys
+
+from quantium.cli import main
+
+
+sys.exit(main())
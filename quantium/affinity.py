@@ -0,0 +1,129 @@
+"""Association rules between customer segments, brands and basket items.
+
+Every transaction row has exactly one segment and one brand, so the
+segment -> brand rules found by apriori on a one-hot matrix follow directly
+from a segment x brand contingency table. Basket-level rules (items bought
+together in one transaction) are counted from a sparse basket x item matrix,
+whose item co-occurrence matrix holds every pair count.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from quantium.segments import SEGMENT_KEYS, group_codes
+
+
+RULE_COLUMNS = ["antecedents", "consequents", "antecedent support", "consequent support",
+                "support", "confidence", "lift", "leverage", "conviction"]
+
+
+def rules_from_counts(pair_counts, antecedent_counts, consequent_counts, n, antecedents, consequents,
+                      min_support=0.01, min_lift=1.0):
+    """Build association rules from co-occurrence counts.
+    Args:
+        pair_counts (ndarray): Antecedent x consequent co-occurrence counts.
+        antecedent_counts (ndarray): Occurrences of each antecedent.
+        consequent_counts (ndarray): Occurrences of each consequent.
+        n (int): Number of transactions (or baskets).
+        antecedents (array-like): Antecedent labels, one per row of ``pair_counts``.
+        consequents (array-like): Consequent labels, one per column of ``pair_counts``.
+        min_support (float): Minimum support of the antecedent/consequent pair.
+        min_lift (float): Minimum lift.
+
+    Returns:
+        DataFrame: Rules with the same columns as mlxtend's ``association_rules``,
+        sorted by descending lift.
+    """
+    pair_support = np.asarray(pair_counts, dtype="float64") / n
+    rows, cols = np.nonzero(pair_support >= min_support)
+    support = pair_support[rows, cols]
+    antecedent_support = np.asarray(antecedent_counts, dtype="float64")[rows] / n
+    consequent_support = np.asarray(consequent_counts, dtype="float64")[cols] / n
+    confidence = support / antecedent_support
+    lift = confidence / consequent_support
+    with np.errstate(divide="ignore"):
+        conviction = np.where(confidence < 1, (1 - consequent_support) / (1 - confidence), np.inf)
+    rules = pd.DataFrame({
+        "antecedents": np.asarray(antecedents, dtype=object)[rows],
+        "consequents": np.asarray(consequents, dtype=object)[cols],
+        "antecedent support": antecedent_support,
+        "consequent support": consequent_support,
+        "support": support,
+        "confidence": confidence,
+        "lift": lift,
+        "leverage": support - antecedent_support * consequent_support,
+        "conviction": conviction,
+    }, columns=RULE_COLUMNS)
+    rules = rules[rules["lift"] >= min_lift]
+    return rules.sort_values("lift", ascending=False).reset_index(drop=True)
+
+
+def segment_brand_rules(transactions, item="Cleaned_Brand_Names", keys=SEGMENT_KEYS, min_support=0.01, min_lift=1.0):
+    """Segment -> brand association rules from a contingency table.
+    Args:
+        transactions (DataFrame): Cleaned transactions with the segment keys and ``item``.
+        item (str): Column on the consequent side.
+        keys (list): Segment columns; segment labels are the key values joined with " - ".
+        min_support (float): Minimum support of the segment/brand pair.
+        min_lift (float): Minimum lift.
+
+    Returns:
+        DataFrame: Rules as returned by ``rules_from_counts``.
+    """
+    segment_ids, segments = group_codes(transactions, keys)
+    item_codes, items = pd.factorize(transactions[item], sort=True)
+    valid = (segment_ids >= 0) & (item_codes >= 0)
+    n_items = len(items)
+    cells = np.bincount(segment_ids[valid] * n_items + item_codes[valid], minlength=len(segments) * n_items)
+    table = cells.reshape(len(segments), n_items)
+    labels = segments.astype(str).agg(" - ".join, axis=1)
+    return rules_from_counts(table, table.sum(axis=1), table.sum(axis=0), valid.sum(),
+                             labels.values, np.asarray(items), min_support, min_lift)
+
+
+def basket_matrix(transactions, item="Cleaned_Brand_Names", basket_keys=("LYLTY_CARD_NBR", "TXN_ID")):
+    """Sparse basket x item incidence matrix.
+    Args:
+        transactions (DataFrame): Cleaned transactions.
+        item (str): Column holding the basket items.
+        basket_keys (tuple): Columns identifying one basket.
+
+    Returns:
+        tuple: (scipy CSR matrix of 0/1 values, ndarray of item labels).
+    """
+    basket_ids, _ = group_codes(transactions, list(basket_keys))
+    item_codes, items = pd.factorize(transactions[item], sort=True)
+    valid = (basket_ids >= 0) & (item_codes >= 0)
+    incidence = sparse.coo_matrix(
+        (np.ones(valid.sum(), dtype=np.int32), (basket_ids[valid], item_codes[valid])),
+        shape=(basket_ids.max() + 1, len(items)),
+    ).tocsr()
+    # Duplicate (basket, item) rows were summed; only presence matters
+    incidence.data[:] = 1
+    return incidence, np.asarray(items)
+
+
+def basket_pair_rules(transactions, item="Cleaned_Brand_Names", basket_keys=("LYLTY_CARD_NBR", "TXN_ID"),
+                      min_support=0.01, min_lift=1.0):
+    """Item -> item association rules over real baskets.
+
+    Pair counts come from the sparse product ``B.T @ B``; memory grows with
+    the number of transaction rows and the square of the number of items,
+    not with baskets x items. For itemsets larger than pairs, pass the
+    matrix from ``basket_matrix`` to mlxtend's apriori as a sparse DataFrame.
+    Args:
+        transactions (DataFrame): Cleaned transactions.
+        item (str): Column holding the basket items.
+        basket_keys (tuple): Columns identifying one basket.
+        min_support (float): Minimum support of the item pair.
+        min_lift (float): Minimum lift.
+
+    Returns:
+        DataFrame: Rules as returned by ``rules_from_counts``, in both directions.
+    """
+    incidence, items = basket_matrix(transactions, item, basket_keys)
+    co_occurrence = (incidence.T @ incidence).toarray()
+    item_counts = np.diag(co_occurrence).copy()
+    np.fill_diagonal(co_occurrence, 0)
+    return rules_from_counts(co_occurrence, item_counts, item_counts, incidence.shape[0],
+                             items, items, min_support, min_lift)
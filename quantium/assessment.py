@@ -0,0 +1,155 @@
+"""Significance tests of the trial, run for every pair, metric and month at once.
+
+The three Module 2 steps, on the output of ``quantium.uplift.uplift_table``:
+
+- Step 1 ("control_pre_vs_trial"): Welch t-test of the scaled control store's
+  pre-trial months against its trial months.
+- Step 2 ("pre_trial_similarity"): Student t-test of the trial store's pre-trial
+  months against the scaled control store's pre-trial months.
+- Step 3 ("trial_month"): t-value of each trial month's percentage difference
+  against the mean and standard deviation of the pre-trial percentage differences.
+
+Everything is computed on pair x metric x month arrays with NaN-masked
+moments, so the cost does not grow with a Python loop per store or month.
+Critical values use the degrees of freedom of the original notebook:
+two-sided with min(n_pre, n_trial) - 1 (step 1) and n_pre - 1 (step 2),
+one-sided with n_pre - 1 (step 3).
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+RESULT_COLUMNS = ["Trial_Str", "Ctrl_Str", "metric", "test", "YEARMONTH", "statistic", "df", "p_value",
+                  "critical_value", "significant"]
+
+
+def _moments(values, mask):
+    """Count, mean and sample variance over the last axis, restricted to ``mask``."""
+    masked = np.where(mask, values, np.nan)
+    n = mask.sum(axis=-1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(masked, axis=-1)
+        var = np.nanvar(masked, axis=-1, ddof=1)
+    return n, mean, var
+
+
+def welch_ttest(a, a_mask, b, b_mask):
+    """Vectorised Welch t-test over the last axis.
+
+    Returns:
+        tuple: (t statistic, Welch-Satterthwaite degrees of freedom, two-sided p-value).
+    """
+    n1, m1, v1 = _moments(a, a_mask)
+    n2, m2, v2 = _moments(b, b_mask)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        s1, s2 = v1 / n1, v2 / n2
+        statistic = (m1 - m2) / np.sqrt(s1 + s2)
+        df = (s1 + s2) ** 2 / (s1 ** 2 / (n1 - 1) + s2 ** 2 / (n2 - 1))
+    return statistic, df, 2 * stats.t.sf(np.abs(statistic), df)
+
+
+def student_ttest(a, a_mask, b, b_mask):
+    """Vectorised pooled-variance t-test over the last axis.
+
+    Returns:
+        tuple: (t statistic, degrees of freedom, two-sided p-value).
+    """
+    n1, m1, v1 = _moments(a, a_mask)
+    n2, m2, v2 = _moments(b, b_mask)
+    df = n1 + n2 - 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pooled = ((n1 - 1) * v1 + (n2 - 1) * v2) / df
+        statistic = (m1 - m2) / np.sqrt(pooled * (1 / n1 + 1 / n2))
+    return statistic, df, 2 * stats.t.sf(np.abs(statistic), df)
+
+
+def uplift_arrays(uplift):
+    """Reshape an uplift table into pair x metric x month arrays.
+    Args:
+        uplift (DataFrame): Output of ``quantium.uplift.uplift_table``.
+
+    Returns:
+        dict: "pairs" (DataFrame), "metrics" and "months" (Index), "period" (ndarray of labels
+        per month) and pair x metric x month arrays "trial", "scaled_control" and "pct_diff".
+    """
+    keys = ["Trial_Str", "Ctrl_Str", "metric"]
+    wide = uplift.set_index(keys + ["YEARMONTH"])[["trial", "scaled_control", "pct_diff"]].unstack("YEARMONTH")
+    pairs = wide.index.droplevel("metric").unique()
+    metrics = wide.index.get_level_values("metric").unique()
+    wide = wide.reindex(pd.MultiIndex.from_tuples(
+        [pair + (metric,) for pair in pairs for metric in metrics], names=keys))
+    months = wide.columns.levels[1]
+    periods = uplift.drop_duplicates("YEARMONTH").set_index("YEARMONTH")["period"].reindex(months).values
+    shape = (len(pairs), len(metrics), len(months))
+    arrays = {name: wide[name].reindex(columns=months).values.reshape(shape) for name in ["trial", "scaled_control", "pct_diff"]}
+    arrays.update({
+        "pairs": pairs.to_frame(index=False),
+        "metrics": metrics,
+        "months": months,
+        "period": periods,
+    })
+    return arrays
+
+
+def _frame(pairs, metrics, test, statistic, df, p_value, critical, yearmonths=None):
+    n_pairs, n_metrics = len(pairs), len(metrics)
+    repeat = 1 if yearmonths is None else len(yearmonths)
+    return pd.DataFrame({
+        "Trial_Str": np.repeat(pairs["Trial_Str"].values, n_metrics * repeat),
+        "Ctrl_Str": np.repeat(pairs["Ctrl_Str"].values, n_metrics * repeat),
+        "metric": np.tile(np.repeat(np.asarray(metrics), repeat), n_pairs),
+        "test": test,
+        "YEARMONTH": np.nan if yearmonths is None else np.tile(np.asarray(yearmonths), n_pairs * n_metrics),
+        "statistic": np.ravel(statistic),
+        "df": np.ravel(np.broadcast_to(df, np.shape(statistic))),
+        "p_value": np.ravel(p_value),
+        "critical_value": np.ravel(np.broadcast_to(critical, np.shape(statistic))),
+    })
+
+
+def assess_trials(uplift, alpha=0.05):
+    """Run steps 1-3 of the trial assessment for every pair, metric and trial month.
+    Args:
+        uplift (DataFrame): Output of ``quantium.uplift.uplift_table``.
+        alpha (float): Significance level.
+
+    Returns:
+        DataFrame: One row per test with Trial_Str, Ctrl_Str, metric, test, YEARMONTH
+        (trial_month rows only), statistic, df, p_value, critical_value and significant.
+    """
+    arrays = uplift_arrays(uplift)
+    pairs, metrics, months = arrays["pairs"], arrays["metrics"], arrays["months"]
+    present = np.isfinite(arrays["pct_diff"])
+    pre = present & (arrays["period"] == "pre")
+    trial = present & (arrays["period"] == "trial")
+    n_pre, n_trial = pre.sum(axis=-1), trial.sum(axis=-1)
+    scaled = arrays["scaled_control"]
+
+    # Step 1: control store stable between pre-trial and trial
+    statistic, df, p_value = welch_ttest(scaled, pre, scaled, trial)
+    critical = stats.t.ppf(1 - alpha / 2, np.minimum(n_pre, n_trial) - 1)
+    step1 = _frame(pairs, metrics, "control_pre_vs_trial", statistic, df, p_value, critical)
+    step1["significant"] = np.abs(step1["statistic"]) > step1["critical_value"]
+
+    # Step 2: trial and scaled control similar before the trial
+    statistic, df, p_value = student_ttest(arrays["trial"], pre, scaled, pre)
+    critical = stats.t.ppf(1 - alpha / 2, n_pre - 1)
+    step2 = _frame(pairs, metrics, "pre_trial_similarity", statistic, df, p_value, critical)
+    step2["significant"] = np.abs(step2["statistic"]) > step2["critical_value"]
+
+    # Step 3: each trial month's percentage difference against the pre-trial distribution
+    _, mean, var = _moments(arrays["pct_diff"], pre)
+    trial_months = np.asarray(arrays["period"] == "trial")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        statistic = (arrays["pct_diff"][..., trial_months] - mean[..., None]) / np.sqrt(var)[..., None]
+    df = np.broadcast_to((n_pre - 1)[..., None], statistic.shape)
+    p_value = stats.t.sf(statistic, df)
+    critical = stats.t.ppf(1 - alpha, df)
+    step3 = _frame(pairs, metrics, "trial_month", statistic, df, p_value, critical, months[trial_months])
+    step3["significant"] = step3["statistic"] > step3["critical_value"]
+
+    return pd.concat([step1, step2, step3], ignore_index=True)[RESULT_COLUMNS]
@@ -0,0 +1,62 @@
+"""Brand normalisation for PROD_NAME.
+
+The brand is the first word of the product name, and several brands appear
+under more than one spelling (Dorito/Doritos, GrnWves/Grain, ...). The
+spellings live in ``brand_aliases.json``, mapping each canonical brand to its
+aliases, so new aliases can be added without touching code.
+
+Only the distinct product names are parsed; the result is broadcast back to
+every row through categorical codes.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_ALIASES_PATH = os.path.join(os.path.dirname(__file__), "brand_aliases.json")
+
+
+def load_brand_aliases(path=DEFAULT_ALIASES_PATH):
+    """Read the alias table and invert it into a lookup.
+    Args:
+        path (str): JSON file mapping each canonical brand to a list of aliases.
+
+    Returns:
+        dict: Alias -> canonical brand.
+    """
+    with open(path) as handle:
+        table = json.load(handle)
+    lookup = {}
+    for brand, aliases in table.items():
+        for alias in aliases:
+            if lookup.get(alias, brand) != brand:
+                raise ValueError("Alias {} maps to both {} and {}".format(alias, lookup[alias], brand))
+            lookup[alias] = brand
+    return lookup
+
+
+def brand_of(product_name, aliases):
+    """Canonical brand of a single product name."""
+    first_word = product_name.split()[0]
+    return aliases.get(first_word, first_word)
+
+
+def clean_brand_names(product_names, aliases=None):
+    """Map every product name to its canonical brand.
+    Args:
+        product_names (Series): PROD_NAME values.
+        aliases (dict): Alias -> canonical brand, as returned by ``load_brand_aliases``.
+            None loads the default alias table.
+
+    Returns:
+        Series: Categorical canonical brand per row, aligned with ``product_names``.
+    """
+    if aliases is None:
+        aliases = load_brand_aliases()
+    name_codes, names = pd.factorize(product_names)
+    brand_codes, brands = pd.factorize(np.array([brand_of(name, aliases) for name in names], dtype=object))
+    # -1 (missing product name) stays -1, i.e. NaN in the categorical
+    row_codes = np.where(name_codes >= 0, brand_codes.take(name_codes), -1)
+    return pd.Series(pd.Categorical.from_codes(row_codes, brands), index=product_names.index, name=product_names.name)
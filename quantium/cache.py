@@ -0,0 +1,190 @@
+"""Content-addressed on-disk cache of pipeline stage results.
+
+A stage result is stored under a key hashed from the stage name, the source
+of the function computing it, and the content of its inputs and parameters.
+Rerunning a stage whose inputs are unchanged loads the stored result instead
+of recomputing it, so changing a downstream parameter (say ``corr_weight``)
+only reruns the stages that depend on it. Results are pickled; the least
+recently used entries are evicted once the cache grows past its size cap.
+
+Inputs are hashed by content on every call, so a table changed in place gets
+a new key. The key also covers the source files of the ``quantium`` package,
+so editing a function a stage calls (not only the stage function itself)
+invalidates the stored results.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+from quantium.ingest import DEFAULT_CACHE_DIR, _load_manifest, _write_manifest
+
+
+DEFAULT_PIPELINE_DIR = os.path.join(DEFAULT_CACHE_DIR, "pipeline")
+DEFAULT_MAX_BYTES = 2 << 30
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_source_digests = {}
+
+
+def _update(digest, value):
+    """Feed a canonical byte representation of ``value`` into ``digest``.
+
+    Objects such as ``StoreMonthIndex`` are hashed by what their ``_cache_state`` method returns.
+    """
+    if isinstance(value, pd.DataFrame):
+        digest.update(b"F" + repr((list(value.columns), [str(t) for t in value.dtypes])).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, (pd.Series, pd.Index)):
+        digest.update(b"S" + repr((value.name, str(value.dtype))).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value, index=isinstance(value, pd.Series)).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(b"A" + repr((value.dtype.str, value.shape)).encode("utf-8"))
+        digest.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, dict):
+        digest.update(b"D%d" % len(value))
+        for key in sorted(value, key=repr):
+            _update(digest, key)
+            _update(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"L%d" % len(value))
+        for item in value:
+            _update(digest, item)
+    elif hasattr(value, "_cache_state"):
+        digest.update(b"O" + type(value).__qualname__.encode("utf-8"))
+        _update(digest, value._cache_state())
+    else:
+        digest.update(b"V" + repr(value).encode("utf-8"))
+
+
+def fingerprint(*values):
+    """SHA-256 hex digest of the content of frames, arrays, containers and plain values."""
+    digest = hashlib.sha256()
+    _update(digest, list(values))
+    return digest.hexdigest()
+
+
+def package_digest(package_dir=PACKAGE_DIR):
+    """SHA-256 hex digest of the package's source and data files.
+
+    A file is re-read only when its size or mtime changed since the last call.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(package_dir)):
+        if not name.endswith((".py", ".json")):
+            continue
+        path = os.path.join(package_dir, name)
+        stat = os.stat(path)
+        entry = _source_digests.get(path)
+        if entry is None or entry[:2] != (stat.st_mtime_ns, stat.st_size):
+            with open(path, "rb") as handle:
+                entry = (stat.st_mtime_ns, stat.st_size, hashlib.sha256(handle.read()).hexdigest())
+            _source_digests[path] = entry
+        digest.update(name.encode("utf-8") + entry[2].encode("ascii"))
+    return digest.hexdigest()
+
+
+def _function_source(func):
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return getattr(func, "__module__", "") + "." + getattr(func, "__qualname__", repr(func))
+
+
+class PipelineCache:
+    """Run pipeline stages through a content-addressed, size-capped on-disk cache.
+    Args:
+        cache_dir (str): Directory holding the results and the manifest.
+        max_bytes (int): Size cap; least recently used results are evicted beyond it.
+        enabled (bool): False computes every stage without reading or writing the cache.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_PIPELINE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.hits = []
+        self.misses = []
+
+    def key(self, stage, func, args=(), kwargs=None):
+        """Hex key of a stage call from its name, the function and package source, and the content
+        of its arguments and keyword arguments."""
+        digest = hashlib.sha256()
+        _update(digest, [stage, _function_source(func), package_digest()])
+        _update(digest, list(args))
+        _update(digest, kwargs or {})
+        return digest.hexdigest()
+
+    def _manifest(self):
+        return _load_manifest(self.manifest_path) or {}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def run(self, stage, func, *args, **kwargs):
+        """Return ``func(*args, **kwargs)``, loading it from the cache when the inputs are unchanged.
+        Args:
+            stage (str): Stage name, part of the key and shown in ``entries``.
+            func (callable): Deterministic function computing the stage.
+            *args: Positional arguments of ``func``.
+            **kwargs: Keyword arguments of ``func``.
+
+        Returns:
+            object: The stage result.
+        """
+        if not self.enabled:
+            return func(*args, **kwargs)
+        key = self.key(stage, func, args, kwargs)
+        path = self._path(key)
+        manifest = self._manifest()
+        if key in manifest and os.path.exists(path):
+            with open(path, "rb") as handle:
+                result = pickle.load(handle)
+            manifest[key]["last_used"] = time.time()
+            _write_manifest(self.manifest_path, manifest)
+            self.hits.append(stage)
+        else:
+            result = func(*args, **kwargs)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as handle:
+                pickle.dump(result, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            manifest[key] = {"stage": stage, "size": os.path.getsize(path), "last_used": time.time()}
+            self._evict(manifest, keep=key)
+            _write_manifest(self.manifest_path, manifest)
+            self.misses.append(stage)
+        return result
+
+    def _evict(self, manifest, keep=None):
+        """Drop least recently used entries until the cache fits ``max_bytes``."""
+        total = sum(entry["size"] for entry in manifest.values())
+        for key in sorted(manifest, key=lambda k: manifest[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= manifest.pop(key)["size"]
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+
+    def entries(self):
+        """Cached results with their stage, size in bytes and last use, most recent first."""
+        manifest = self._manifest()
+        frame = pd.DataFrame.from_dict(manifest, orient="index", columns=["stage", "size", "last_used"])
+        frame.index.name = "key"
+        return frame.sort_values("last_used", ascending=False)
+
+    def clear(self):
+        """Remove every cached result."""
+        for key in self._manifest():
+            if os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
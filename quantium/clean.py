@@ -0,0 +1,193 @@
+"""Clean-and-merge stage of Module 1, in memory or streamed in chunks.
+
+``clean_transactions`` reproduces the notebook's cleaning on one frame: join the
+customer attributes, convert ``DATE``, drop salsa products and ``PROD_QTY``
+outliers, and derive ``Cleaned_Brand_Names`` and ``Pack_Size``.
+``stream_clean`` applies the same function to fixed-size chunks of the
+transaction file and appends every cleaned chunk to the output file, so peak
+memory is bounded by the chunk size rather than by the size of the extract.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from quantium.brands import load_brand_aliases
+from quantium.dates import normalise_dates
+from quantium.products import lookup_product, product_dimension, product_positions
+from quantium.schema import QVI_SCHEMA
+
+
+CUSTOMER_KEY = "LYLTY_CARD_NBR"
+MAX_PROD_QTY = 6
+
+# Column types of the cleaned output files; categoricals are written as strings
+CLEANED_SCHEMA = dict(QVI_SCHEMA, DATE="datetime64[ns]")
+
+
+def customer_index(customers):
+    """Index the customer table by loyalty card for per-chunk lookups.
+    Args:
+        customers (DataFrame): QVI_purchase_behaviour table.
+
+    Returns:
+        DataFrame: Customer attributes indexed by LYLTY_CARD_NBR.
+    """
+    index = customers.set_index(CUSTOMER_KEY)
+    if not index.index.is_unique:
+        raise ValueError("Customer table has duplicate {} values".format(CUSTOMER_KEY))
+    return index
+
+
+def clean_transactions(transactions, customers, brand_aliases=None):
+    """Join customer attributes onto transactions and apply the Module 1 cleaning.
+    Args:
+        transactions (DataFrame): Rows of QVI_transaction_data.
+        customers (DataFrame): Customer table, either raw or from ``customer_index``.
+        brand_aliases (dict): Alias -> canonical brand. None loads ``brand_aliases.json``.
+
+    Returns:
+        DataFrame: Cleaned transactions with LIFESTAGE, PREMIUM_CUSTOMER,
+        Cleaned_Brand_Names and Pack_Size columns.
+    """
+    if CUSTOMER_KEY in customers.columns:
+        customers = customer_index(customers)
+    products = product_dimension(transactions, brand_aliases)
+    positions = product_positions(transactions, products)
+    keep = ~products["Is_Salsa"].values[positions] & (transactions["PROD_QTY"].values < MAX_PROD_QTY)
+    transactions = transactions[keep]
+    positions = positions[keep]
+
+    # Same row set and column order as pd.merge(customers, transactions, how="right")
+    attributes = customers.reindex(transactions[CUSTOMER_KEY].values)
+    attributes.index = transactions.index
+    cleaned = pd.concat([transactions[[CUSTOMER_KEY]], attributes, transactions.drop(columns=CUSTOMER_KEY)], axis=1)
+    cleaned = normalise_dates(cleaned, ["DATE"])
+
+    for col in ["Cleaned_Brand_Names", "Pack_Size"]:
+        cleaned[col] = lookup_product(cleaned, products, col, positions)
+    return cleaned
+
+
+def _iter_excel_chunks(path, chunksize, columns):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows))
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header)[columns or header]
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)[columns or header]
+    finally:
+        workbook.close()
+
+
+def _iter_arrow_chunks(path, chunksize, columns):
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    for offset in range(0, table.num_rows, chunksize):
+        yield table.slice(offset, chunksize).to_pandas()
+
+
+def iter_transaction_chunks(path, chunksize=500000, columns=None):
+    """Read a transaction file as a sequence of fixed-size frames.
+    Args:
+        path (str): ``.csv``, ``.xlsx`` or an Arrow IPC file from ``quantium.ingest``.
+        chunksize (int): Number of rows per chunk.
+        columns (list): Columns to read. None reads every column.
+
+    Returns:
+        iterator: DataFrames of at most ``chunksize`` rows.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return iter(pd.read_csv(path, usecols=columns, chunksize=chunksize))
+    if extension in (".xlsx", ".xlsm"):
+        return _iter_excel_chunks(path, chunksize, columns)
+    if extension in (".arrow", ".feather"):
+        return _iter_arrow_chunks(path, chunksize, columns)
+    raise ValueError("Unsupported transaction file type: {}".format(path))
+
+
+def parquet_schema(columns, schema=None):
+    """Arrow schema for writing cleaned transactions, independent of any chunk's contents.
+    Args:
+        columns (list): Column names, in file order.
+        schema (dict): Column -> dtype ("category" or a NumPy dtype name). None uses ``CLEANED_SCHEMA``.
+
+    Returns:
+        pyarrow.Schema: One field per column; categoricals become strings.
+    """
+    import pyarrow as pa
+
+    schema = CLEANED_SCHEMA if schema is None else schema
+    unknown = [column for column in columns if column not in schema]
+    if unknown:
+        raise ValueError("No Parquet type for columns {}".format(unknown))
+    return pa.schema([(column, pa.string() if schema[column] == "category" else pa.from_numpy_dtype(
+        np.dtype(schema[column]))) for column in columns])
+
+
+class _ChunkWriter:
+    """Append DataFrames to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = os.path.splitext(path)[1].lower() == ".parquet"
+        self.writer = None
+        self.started = False
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, parquet_schema(frame.columns))
+            # A safe cast: values that do not fit the schema raise instead of wrapping
+            table = pa.Table.from_pandas(frame, preserve_index=False).cast(self.writer.schema)
+            self.writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self.started else "w", header=not self.started, index=False)
+        self.started = True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def stream_clean(transactions_path, customers, out_path, chunksize=500000, brand_aliases=None):
+    """Clean and merge the transaction file chunk by chunk, writing straight to disk.
+    Args:
+        transactions_path (str): Transaction file, see ``iter_transaction_chunks``.
+        customers (DataFrame): QVI_purchase_behaviour table.
+        out_path (str): ``.csv`` or ``.parquet`` file receiving the cleaned rows. Parquet columns
+            get the types of ``CLEANED_SCHEMA``.
+        chunksize (int): Number of transaction rows held in memory at once.
+        brand_aliases (dict): Alias -> canonical brand. None loads ``brand_aliases.json``.
+
+    Returns:
+        dict: Number of chunks, input rows and output rows.
+    """
+    index = customer_index(customers)
+    if brand_aliases is None:
+        brand_aliases = load_brand_aliases()
+    summary = {"chunks": 0, "rows_in": 0, "rows_out": 0}
+    writer = _ChunkWriter(out_path)
+    try:
+        for chunk in iter_transaction_chunks(transactions_path, chunksize):
+            cleaned = clean_transactions(chunk, index, brand_aliases)
+            writer.write(cleaned)
+            summary["chunks"] += 1
+            summary["rows_in"] += len(chunk)
+            summary["rows_out"] += len(cleaned)
+    finally:
+        writer.close()
+    return summary
@@ -0,0 +1,237 @@
+"""Command-line pipeline for the Module 1 and Module 2 analyses.
+
+Runs the named stages in order, without a notebook kernel:
+
+    ingest -> clean -> segments -> store_metrics -> controls -> assessment
+
+Every stage writes its result to ``--out-dir`` as CSV/JSON, and a stage whose
+upstream stages were not requested reads their results from there, so a
+nightly job can rerun only the stages it needs. ``summary.json`` records the
+stages run, their timings and outputs, or the error. The exit status is 0 on
+success, 1 when a stage fails and 2 for invalid arguments.
+
+    python -m quantium --transactions QVI_transaction_data.xlsx \\
+        --customers QVI_purchase_behaviour.csv --trial-stores 77 86 88
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+
+import pandas as pd
+
+from quantium.uplift import TRIAL_END, TRIAL_START
+
+
+STAGES = ["ingest", "clean", "segments", "store_metrics", "controls", "assessment"]
+DEFAULT_METRICS = ["TOT_SALES", "nCustomers"]
+
+
+class StageError(Exception):
+    """A stage cannot run, e.g. because an input is missing."""
+
+
+def _output(args, name):
+    return os.path.join(args.out_dir, name)
+
+
+def _write_csv(frame, args, name, index=False):
+    path = _output(args, name)
+    frame.to_csv(path, index=index)
+    return path
+
+
+def _write_json(value, args, name):
+    path = _output(args, name)
+    with open(path, "w") as handle:
+        json.dump(value, handle, indent=1, default=str)
+    return path
+
+
+def _require(state, key, args, filename, reader):
+    """Take an upstream result from this run, or read what an earlier run wrote."""
+    if key not in state:
+        path = _output(args, filename)
+        if not os.path.exists(path):
+            raise StageError("{} is not available: run its stage or provide {}".format(key, path))
+        state[key] = reader(path)
+    return state[key]
+
+
+def _read_clean(path):
+    from quantium.dates import normalise_dates
+
+    return normalise_dates(pd.read_csv(path), ["DATE"])
+
+
+def stage_ingest(state, args):
+    from quantium.ingest import load_purchase_behaviour, load_transactions
+
+    if not args.transactions or not args.customers:
+        raise StageError("ingest needs --transactions and --customers")
+    state["transactions"] = load_transactions(args.transactions, cache_dir=args.cache_dir, compact=True)
+    state["customers"] = load_purchase_behaviour(args.customers, cache_dir=args.cache_dir, compact=True)
+    return {"transactions": len(state["transactions"]), "customers": len(state["customers"])}
+
+
+def stage_clean(state, args):
+    from quantium.clean import clean_transactions
+
+    if "transactions" not in state:
+        stage_ingest(state, args)
+    state["clean"] = clean_transactions(state["transactions"], state["customers"])
+    return {"rows": len(state["clean"]), "path": _write_csv(state["clean"], args, "clean_transactions.csv")}
+
+
+def stage_segments(state, args):
+    from quantium.segments import segment_summary, top_n_per_segment
+
+    clean = _require(state, "clean", args, "clean_transactions.csv", _read_clean)
+    summary = segment_summary(clean)
+    top_brands = top_n_per_segment(clean, "Cleaned_Brand_Names", n=3)
+    top_packs = top_n_per_segment(clean, "Pack_Size", n=3)
+    return {
+        "segments": len(summary),
+        "paths": [
+            _write_csv(summary, args, "segment_summary.csv"),
+            _write_csv(top_brands, args, "top_brands.csv"),
+            _write_csv(top_packs, args, "top_pack_sizes.csv"),
+        ],
+    }
+
+
+def stage_store_metrics(state, args):
+    from quantium.dates import normalise_dates, yearmonth
+    from quantium.ingest import load_qvi_data
+    from quantium.store_metrics import monthly_store_metrics
+
+    if args.qvi_data:
+        transactions = load_qvi_data(args.qvi_data, cache_dir=args.cache_dir, compact=True)
+        transactions = normalise_dates(transactions, ["DATE"])
+    else:
+        transactions = _require(state, "clean", args, "clean_transactions.csv", _read_clean)
+    transactions = transactions.assign(YEARMONTH=yearmonth(transactions["DATE"]))
+    state["store_metrics"] = monthly_store_metrics(transactions).reset_index()
+    return {"store_months": len(state["store_metrics"]),
+            "path": _write_csv(state["store_metrics"], args, "store_metrics.csv")}
+
+
+def _eligible_table(state, args):
+    from quantium.eligibility import StoreMonthIndex
+
+    table = _require(state, "store_metrics", args, "store_metrics.csv", pd.read_csv)
+    index = StoreMonthIndex(table, args.trial_start, args.trial_end)
+    eligible = index.eligible_stores(max_missing=args.max_missing)
+    missing = [store for store in args.trial_stores if store not in eligible]
+    if missing:
+        raise StageError("Trial stores without enough observed months: {}".format(missing))
+    return index, eligible
+
+
+def stage_controls(state, args):
+    from quantium.control import select_controls
+
+    index, eligible = _eligible_table(state, args)
+    pretrial = index.frame("pre", stores=eligible)
+    scores, controls = select_controls(pretrial, args.trial_stores, [[metric] for metric in args.metrics],
+                                       corr_weight=args.corr_weight, n_jobs=args.n_jobs)
+    state["controls"] = {int(trial): int(control) for trial, control in controls.items()}
+    return {
+        "controls": state["controls"],
+        "paths": [
+            _write_csv(scores, args, "control_scores.csv"),
+            _write_json({str(trial): control for trial, control in state["controls"].items()}, args, "controls.json"),
+        ],
+    }
+
+
+def _read_controls(path):
+    with open(path) as handle:
+        return {int(trial): int(control) for trial, control in json.load(handle).items()}
+
+
+def stage_assessment(state, args):
+    from quantium.assessment import assess_trials
+    from quantium.uplift import uplift_table
+
+    index, eligible = _eligible_table(state, args)
+    controls = _require(state, "controls", args, "controls.json", _read_controls)
+    uplift = uplift_table(index.frame(stores=eligible), controls, args.metrics, args.trial_start, args.trial_end)
+    assessment = assess_trials(uplift, alpha=args.alpha)
+    significant = assessment[(assessment["test"] == "trial_month") & assessment["significant"]]
+    significant = significant[["Trial_Str", "metric", "YEARMONTH"]].astype({"YEARMONTH": "int64"})
+    return {
+        "significant_trial_months": significant.to_dict("records"),
+        "paths": [_write_csv(uplift, args, "uplift.csv"), _write_csv(assessment, args, "assessment.csv")],
+    }
+
+
+STAGE_FUNCTIONS = {
+    "ingest": stage_ingest,
+    "clean": stage_clean,
+    "segments": stage_segments,
+    "store_metrics": stage_store_metrics,
+    "controls": stage_controls,
+    "assessment": stage_assessment,
+}
+
+
+def build_parser():
+    """Argument parser of the ``python -m quantium`` command."""
+    parser = argparse.ArgumentParser(prog="python -m quantium", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Stages to run; they always run in pipeline order (default: all).")
+    parser.add_argument("--transactions", help="QVI_transaction_data workbook or CSV.")
+    parser.add_argument("--customers", help="QVI_purchase_behaviour CSV.")
+    parser.add_argument("--qvi-data", help="Merged QVI_data CSV for the store metrics; default: cleaned transactions.")
+    parser.add_argument("--out-dir", default="qvi_output", help="Directory of the stage outputs (default: qvi_output).")
+    parser.add_argument("--cache-dir", default=".qvi_cache", help="Columnar cache of the source files.")
+    parser.add_argument("--trial-stores", nargs="+", type=int, default=[77, 86, 88], help="Trial store numbers.")
+    parser.add_argument("--trial-start", type=int, default=TRIAL_START, help="First trial YEARMONTH.")
+    parser.add_argument("--trial-end", type=int, default=TRIAL_END, help="Last trial YEARMONTH.")
+    parser.add_argument("--metrics", nargs="+", default=DEFAULT_METRICS, help="Metrics used for selection and uplift.")
+    parser.add_argument("--max-missing", type=int, default=0, help="Months a store may miss and stay eligible.")
+    parser.add_argument("--corr-weight", type=float, default=0.5, help="Weight of correlation in the CompScore.")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level of the trial assessment.")
+    parser.add_argument("--n-jobs", type=int, default=None, help="Worker processes for control selection.")
+    return parser
+
+
+def run(args):
+    """Run the requested stages in pipeline order.
+
+    Returns:
+        dict: Summary with status, the per-stage outputs and timings, and the error if any.
+    """
+    os.makedirs(args.out_dir, exist_ok=True)
+    summary = {"status": "ok", "stages": {}}
+    state = {}
+    for stage in [name for name in STAGES if name in args.stages]:
+        started = time.time()
+        try:
+            result = STAGE_FUNCTIONS[stage](state, args)
+        except Exception as error:  # reported in the summary and through the exit status
+            summary["status"] = "failed"
+            summary["failed_stage"] = stage
+            summary["error"] = "{}: {}".format(type(error).__name__, error)
+            if not isinstance(error, StageError):
+                summary["traceback"] = traceback.format_exc()
+            break
+        result["seconds"] = round(time.time() - started, 3)
+        summary["stages"][stage] = result
+    _write_json(summary, args, "summary.json")
+    return summary
+
+
+def main(argv=None):
+    """Entry point of ``python -m quantium``; returns the process exit status."""
+    args = build_parser().parse_args(argv)
+    summary = run(args)
+    json.dump(summary, sys.stdout, indent=1, default=str)
+    sys.stdout.write("\n")
+    if summary["status"] != "ok":
+        sys.stderr.write("Stage {} failed: {}\n".format(summary["failed_stage"], summary["error"]))
+        return 1
+    return 0
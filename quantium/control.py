@@ -0,0 +1,346 @@
+"""Control-store scoring for Module 2.
+
+The pre-trial store-month metrics are pivoted once into a
+store x month x metric array. Correlations between a trial store and every
+candidate are then one batched matrix product over z-normalised monthly
+series, and magnitude distances one broadcast subtraction, instead of a
+filter-and-concat loop per candidate store.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def pivot_metrics(table, metrics, stores=None):
+    """Pivot store-month metrics into a store x month x metric array.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns.
+        metrics (list): Metric columns to include.
+        stores (list): Stores to include, in this order. None includes every store.
+
+    Returns:
+        tuple: (ndarray of shape (stores, months, metrics), Index of stores, Index of months).
+        Missing store-months are NaN.
+    """
+    metrics = list(metrics)
+    wide = table.set_index(["STORE_NBR", "YEARMONTH"])[metrics].unstack("YEARMONTH")
+    if stores is not None:
+        wide = wide.reindex(stores)
+    months = wide.columns.levels[1]
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([metrics, months]))
+    cube = wide.values.reshape(len(wide), len(metrics), len(months)).transpose(0, 2, 1)
+    return cube.astype("float64"), wide.index, pd.Index(months, name="YEARMONTH")
+
+
+def zscore_months(cube):
+    """Standardise every store's monthly series to mean 0 and unit (population) variance.
+
+    After this, the Pearson correlation of two series is the mean of their
+    elementwise product. Constant series become NaN.
+    """
+    centred = cube - cube.mean(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return centred / centred.std(axis=1, keepdims=True)
+
+
+def correlation_scores(cube, trial_positions):
+    """Pearson correlation over months between trial stores and every store.
+    Args:
+        cube (ndarray): Store x month x metric array from ``pivot_metrics``.
+        trial_positions (array-like): Positions of the trial stores along the first axis.
+
+    Returns:
+        ndarray: Trial x store x metric correlations.
+    """
+    z = zscore_months(cube)
+    return np.einsum("tmk,smk->tsk", z[np.asarray(trial_positions)], z) / cube.shape[1]
+
+
+def candidate_mask(stores, trial_stores, exclude=None):
+    """Boolean mask of the stores that may be picked as controls."""
+    excluded = set(trial_stores) | set(exclude or [])
+    return ~np.asarray(pd.Index(stores).isin(list(excluded)))
+
+
+def _prepare(table, metrics, trial_stores, exclude):
+    cube, stores, months = pivot_metrics(table, metrics)
+    trial_positions = stores.get_indexer(trial_stores)
+    if (trial_positions < 0).any():
+        raise ValueError("Trial stores missing from the metric table: {}".format(
+            [s for s, p in zip(trial_stores, trial_positions) if p < 0]))
+    candidates = candidate_mask(stores, trial_stores, exclude)
+    return cube, stores, months, trial_positions, candidates
+
+
+def correlation_table(table, metrics, trial_stores, exclude=None):
+    """Correlate every trial store's pre-trial metrics with every candidate control store.
+    Args:
+        table (DataFrame): Pre-trial store-month metrics with STORE_NBR and YEARMONTH columns.
+            Every store should have every month (see the full-observation filter).
+        metrics (list): Metric columns to correlate.
+        trial_stores (list): Trial store numbers.
+        exclude (list): Further stores that may not be controls. Trial stores are always excluded.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, Ctrl_Str) with the correlation of each metric
+        and Corr_Score, their mean (ignoring metrics without a defined correlation).
+    """
+    metrics = list(metrics)
+    cube, stores, _, trial_positions, candidates = _prepare(table, metrics, trial_stores, exclude)
+    corrs = correlation_scores(cube, trial_positions)[:, candidates, :]
+
+    n_trials, n_controls, _ = corrs.shape
+    result = pd.DataFrame({
+        "Trial_Str": np.repeat(np.asarray(trial_stores), n_controls),
+        "Ctrl_Str": np.tile(stores.values[candidates], n_trials),
+    })
+    flat = corrs.reshape(n_trials * n_controls, len(metrics))
+    for i, metric in enumerate(metrics):
+        result[metric] = flat[:, i]
+    # A constant metric has no defined correlation; average the others
+    with np.errstate(invalid="ignore"):
+        result["Corr_Score"] = np.nanmean(flat, axis=1) if np.isnan(flat).any() else flat.mean(axis=1)
+    return result
+
+
+def _abs_differences(cube, trial_positions, control_positions):
+    """Trial x control x month x metric absolute differences."""
+    return np.abs(cube[trial_positions][:, None] - cube[control_positions][None])
+
+
+def _chunks(n, chunk_size):
+    step = n if not chunk_size else chunk_size
+    for start in range(0, n, max(step, 1)):
+        yield slice(start, min(start + step, n))
+
+
+def distance_range(cube, trial_positions, control_positions, chunk_size=None):
+    """Smallest and largest absolute difference per trial and metric over all controls and months.
+    Args:
+        cube (ndarray): Store x month x metric array from ``pivot_metrics``.
+        trial_positions (ndarray): Positions of the trial stores.
+        control_positions (ndarray): Positions of the candidate control stores.
+        chunk_size (int): Number of controls differenced at a time. None does all at once.
+
+    Returns:
+        tuple: (ndarray of minima, ndarray of maxima), both trial x metric.
+    """
+    shape = (len(trial_positions), cube.shape[2])
+    low, high = np.full(shape, np.inf), np.full(shape, -np.inf)
+    for part in _chunks(len(control_positions), chunk_size):
+        diffs = _abs_differences(cube, trial_positions, control_positions[part])
+        low = np.fmin(low, np.nanmin(diffs, axis=(1, 2)))
+        high = np.fmax(high, np.nanmax(diffs, axis=(1, 2)))
+    return low, high
+
+
+def _normalise(diffs, low, high):
+    """1 - min-max scaled difference, so identical stores score 1."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 1 - (diffs - low[:, None, None, :]) / (high - low)[:, None, None, :]
+
+
+def magnitude_scores(cube, trial_positions, control_positions, chunk_size=None):
+    """Normalised magnitude distance for every (trial, control, month).
+
+    Differences are min-max normalised per trial and metric over all controls
+    and months, turned into similarities (1 = identical) and averaged over the
+    metrics. With ``chunk_size`` set, at most trials x chunk_size x months x metrics
+    differences are held in memory at once; the result itself is trials x controls x months.
+    Args:
+        cube (ndarray): Store x month x metric array from ``pivot_metrics``.
+        trial_positions (ndarray): Positions of the trial stores.
+        control_positions (ndarray): Positions of the candidate control stores.
+        chunk_size (int): Number of controls scored at a time. None scores all at once.
+
+    Returns:
+        ndarray: Trial x control x month magnitudes.
+    """
+    trial_positions = np.asarray(trial_positions)
+    control_positions = np.asarray(control_positions)
+    low, high = distance_range(cube, trial_positions, control_positions, chunk_size)
+    scores = np.empty((len(trial_positions), len(control_positions), cube.shape[1]))
+    for part in _chunks(len(control_positions), chunk_size):
+        diffs = _abs_differences(cube, trial_positions, control_positions[part])
+        scores[:, part] = _normalise(diffs, low, high).mean(axis=3)
+    return scores
+
+
+def distance_table(table, metrics, trial_stores, exclude=None):
+    """Standardised magnitude distance between every trial store and every candidate control store.
+    Args:
+        table (DataFrame): Pre-trial store-month metrics with STORE_NBR and YEARMONTH columns.
+        metrics (list): Metric columns to compare.
+        trial_stores (list): Trial store numbers.
+        exclude (list): Further stores that may not be controls. Trial stores are always excluded.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, Ctrl_Str, YEARMONTH) with the normalised similarity
+        of each metric and magnitude, their mean.
+    """
+    metrics = list(metrics)
+    cube, stores, months, trial_positions, candidates = _prepare(table, metrics, trial_stores, exclude)
+    control_positions = np.flatnonzero(candidates)
+    diffs = _abs_differences(cube, trial_positions, control_positions)
+    low, high = np.nanmin(diffs, axis=(1, 2)), np.nanmax(diffs, axis=(1, 2))
+    similarity = _normalise(diffs, low, high)
+
+    n_trials, n_controls, n_months, _ = similarity.shape
+    flat = similarity.reshape(-1, len(metrics))
+    result = pd.DataFrame(flat, columns=metrics)
+    result["YEARMONTH"] = np.tile(months.values, n_trials * n_controls)
+    result["Trial_Str"] = np.repeat(np.asarray(trial_stores), n_controls * n_months)
+    result["Ctrl_Str"] = np.tile(np.repeat(stores.values[control_positions], n_months), n_trials)
+    result["magnitude"] = flat.mean(axis=1)
+    return result
+
+
+def metric_magnitudes(cube, trial_positions, control_positions, chunk_size=None):
+    """Mean normalised magnitude over the months, per trial, control and metric.
+    Args:
+        cube (ndarray): Store x month x metric array from ``pivot_metrics``.
+        trial_positions (ndarray): Positions of the trial stores.
+        control_positions (ndarray): Positions of the candidate control stores.
+        chunk_size (int): Number of controls scored at a time. None scores all at once.
+
+    Returns:
+        ndarray: Trial x control x metric magnitudes.
+    """
+    trial_positions = np.asarray(trial_positions)
+    control_positions = np.asarray(control_positions)
+    low, high = distance_range(cube, trial_positions, control_positions, chunk_size)
+    magnitudes = np.empty((len(trial_positions), len(control_positions), cube.shape[2]))
+    for part in _chunks(len(control_positions), chunk_size):
+        diffs = _abs_differences(cube, trial_positions, control_positions[part])
+        magnitudes[:, part] = _normalise(diffs, low, high).mean(axis=2)
+    return magnitudes
+
+
+def _weighted_mean(values, weights):
+    """Weighted mean over the last axis, skipping NaN entries."""
+    finite = np.isfinite(values)
+    total = np.where(finite, values, 0) @ weights
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / (finite @ weights)
+
+
+def composite_scores(table, metrics, trial_stores, corr_weight=0.5, metric_weights=None, exclude=None,
+                     chunk_size=None):
+    """Score every candidate control for every trial store on correlation and magnitude.
+
+    Correlations and magnitudes come out of the same pivot as aligned
+    trial x control x metric arrays, so no long-format tables are merged or
+    grouped. The score is ``corr_weight`` x Corr_Score + (1 - ``corr_weight``) x magnitude,
+    each being the ``metric_weights``-weighted mean over the metrics.
+    Args:
+        table (DataFrame): Pre-trial store-month metrics with STORE_NBR and YEARMONTH columns.
+        metrics (list): Metric columns to compare.
+        trial_stores (list): Trial store numbers.
+        corr_weight (float): Weight of the correlation in the composite score.
+        metric_weights (list): One weight per metric. None weights the metrics equally.
+        exclude (list): Further stores that may not be controls. Trial stores are always excluded.
+        chunk_size (int): Number of controls differenced at a time. None does all at once.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, Ctrl_Str) with Corr_Score, magnitude and CompScore.
+    """
+    metrics = list(metrics)
+    weights = np.ones(len(metrics)) if metric_weights is None else np.asarray(metric_weights, dtype="float64")
+    if weights.shape != (len(metrics),):
+        raise ValueError("Expected one weight per metric, got {} for {} metrics".format(len(weights), len(metrics)))
+    cube, stores, _, trial_positions, candidates = _prepare(table, metrics, trial_stores, exclude)
+    control_positions = np.flatnonzero(candidates)
+
+    corrs = correlation_scores(cube, trial_positions)[:, control_positions, :]
+    magnitudes = metric_magnitudes(cube, trial_positions, control_positions, chunk_size)
+    corr_score = _weighted_mean(corrs, weights)
+    magnitude = _weighted_mean(magnitudes, weights)
+
+    n_trials, n_controls = corr_score.shape
+    return pd.DataFrame({
+        "Trial_Str": np.repeat(np.asarray(trial_stores), n_controls),
+        "Ctrl_Str": np.tile(stores.values[control_positions], n_trials),
+        "Corr_Score": corr_score.ravel(),
+        "magnitude": magnitude.ravel(),
+        "CompScore": (corr_weight * corr_score + (1 - corr_weight) * magnitude).ravel(),
+    })
+
+
+_shared_table = None
+
+
+def _init_worker(table):
+    global _shared_table
+    _shared_table = table
+
+
+def _score_trial_chunk(trial_stores, metric_sets, exclude, corr_weight, metric_weights):
+    """Score one chunk of trial stores against the shared pre-trial table."""
+    scores = None
+    for metrics, weights in zip(metric_sets, metric_weights):
+        part = composite_scores(_shared_table, metrics, trial_stores, corr_weight, weights, exclude)
+        if scores is None:
+            scores = part[["Trial_Str", "Ctrl_Str"]].copy()
+        # Same pivot, trials and candidates: rows line up across metric sets
+        scores["CompScore_" + "_".join(metrics)] = part["CompScore"].values
+    return scores
+
+
+def select_controls(table, trial_stores, metric_sets=(("TOT_SALES",), ("nCustomers",)), corr_weight=0.5,
+                    metric_weights=None, exclude=None, n_jobs=None):
+    """Rank candidate control stores for many trial stores, spread over a process pool.
+
+    Every metric set is scored with ``composite_scores``. The final CompScore is
+    the mean over the metric sets and the best-scoring candidate becomes the control.
+    Trial stores are split into one chunk per worker; the pre-trial table is sent to
+    each worker once and only read there.
+    Args:
+        table (DataFrame): Pre-trial store-month metrics with STORE_NBR and YEARMONTH columns.
+        trial_stores (list): Trial store numbers, at least one. None of them is used as a control.
+        metric_sets (list): Lists of metric columns, each scored separately.
+        corr_weight (float): Weight of the correlation in each composite score.
+        metric_weights (list): Per metric set, the weights of its metrics (or None for equal
+            weights). None weights every metric equally.
+        exclude (list): Further stores that may not be controls. Trial stores are always excluded.
+        n_jobs (int): Number of worker processes. None uses every core, 1 runs in-process.
+
+    Returns:
+        tuple: (DataFrame with one row per (Trial_Str, Ctrl_Str), a CompScore column per metric
+        set and the overall CompScore, sorted best first within each trial;
+        dict of trial store -> selected control store).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    trial_stores = list(trial_stores)
+    if not trial_stores:
+        raise ValueError("select_controls needs at least one trial store")
+    metric_sets = [list(metrics) for metrics in metric_sets]
+    if metric_weights is None:
+        metric_weights = [None] * len(metric_sets)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(trial_stores))
+    chunks = [trial_stores[i::n_jobs] for i in range(n_jobs)]
+    # Every chunk excludes all trial stores, not only its own
+    score_chunk = partial(_score_trial_chunk, metric_sets=metric_sets, exclude=trial_stores + list(exclude or []),
+                          corr_weight=corr_weight, metric_weights=metric_weights)
+
+    if n_jobs == 1:
+        _init_worker(table)
+        try:
+            parts = [score_chunk(chunk) for chunk in chunks]
+        finally:
+            _init_worker(None)
+    else:
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(table,)) as pool:
+            parts = list(pool.map(score_chunk, chunks))
+
+    scores = pd.concat(parts, ignore_index=True)
+    score_columns = [col for col in scores.columns if col.startswith("CompScore_")]
+    scores["CompScore"] = scores[score_columns].mean(axis=1)
+    order = {store: i for i, store in enumerate(trial_stores)}
+    scores["_order"] = scores["Trial_Str"].map(order)
+    scores = scores.sort_values(["_order", "CompScore"], ascending=[True, False]).drop(columns="_order")
+    scores = scores.reset_index(drop=True)
+    controls = scores.groupby("Trial_Str", sort=False)["Ctrl_Str"].first().to_dict()
+    return scores, controls
@@ -0,0 +1,173 @@
+"""Period-aware store eligibility over one shared store-month table.
+
+The table is sorted by store and month once. Each store's month coverage is
+kept as a bitmap (one bit per month of the observation window), so rules such
+as "operational for the whole window" or "at most N missing months in the
+pre-trial period" are bit counts rather than ``value_counts`` and ``isin``
+passes. Pre-trial, trial and post-trial windows are month slices: views into
+the store x month x metric array, or row-position arrays into the shared
+table, instead of filtered copies.
+"""
+import numpy as np
+import pandas as pd
+
+from quantium.control import pivot_metrics
+from quantium.uplift import TRIAL_END, TRIAL_START, label_period
+
+
+PERIODS = ["pre", "trial", "post"]
+
+# Number of set bits in every byte value
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+class StoreMonthIndex:
+    """Month coverage, eligibility rules and period windows of a store-month table.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns. It is
+            used as is when already sorted by store and month, and sorted once otherwise.
+        trial_start (int): First trial month.
+        trial_end (int): Last trial month.
+        months (list): YEARMONTH values of the observation window. None uses every month
+            in the table.
+    """
+
+    def __init__(self, table, trial_start=TRIAL_START, trial_end=TRIAL_END, months=None):
+        keys = table[["STORE_NBR", "YEARMONTH"]]
+        order = np.lexsort((keys["YEARMONTH"].values, keys["STORE_NBR"].values))
+        if not (order == np.arange(len(order))).all():
+            table = table.take(order).reset_index(drop=True)
+        self.table = table
+
+        store_codes, stores = pd.factorize(table["STORE_NBR"].values, sort=True)
+        self.stores = pd.Index(stores, name="STORE_NBR")
+        if months is None:
+            months = np.unique(table["YEARMONTH"].values)
+        self.months = pd.Index(np.sort(np.asarray(months)), name="YEARMONTH")
+        self.periods = label_period(self.months.values, trial_start, trial_end)
+        self.store_codes = store_codes
+        self.month_positions = self.months.get_indexer(table["YEARMONTH"].values)
+        # Rows of store i are offsets[i]:offsets[i + 1]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(store_codes, minlength=len(self.stores)))])
+
+        coverage = np.zeros((len(self.stores), len(self.months)), dtype=bool)
+        inside = self.month_positions >= 0
+        coverage[store_codes[inside], self.month_positions[inside]] = True
+        self.bitmap = np.packbits(coverage, axis=1)
+        self._cubes = {}
+
+    def coverage(self):
+        """Store x month boolean array of observed store-months, unpacked from the bitmap."""
+        return np.unpackbits(self.bitmap, axis=1, count=len(self.months)).astype(bool)
+
+    def window(self, period=None):
+        """Month positions of a period as a slice; None is the whole observation window."""
+        if period is None:
+            return slice(0, len(self.months))
+        if period not in PERIODS:
+            raise ValueError("period must be one of {} or None, got {!r}".format(PERIODS, period))
+        positions = np.flatnonzero(self.periods == period)
+        if len(positions) == 0:
+            return slice(0, 0)
+        return slice(positions[0], positions[-1] + 1)
+
+    def _window_bits(self, periods):
+        mask = np.zeros(len(self.months), dtype=bool)
+        for period in periods or [None]:
+            mask[self.window(period)] = True
+        return np.packbits(mask)
+
+    def missing_months(self, periods=None):
+        """Number of months each store is missing within the given periods.
+        Args:
+            periods (list): Any of "pre", "trial" and "post". None is the whole observation window.
+
+        Returns:
+            Series: Missing month count per store.
+        """
+        missing = self._window_bits(periods) & ~self.bitmap
+        return pd.Series(_POPCOUNT[missing].sum(axis=1), index=self.stores, name="missing_months")
+
+    def eligible_stores(self, max_missing=0, periods=None):
+        """Stores missing at most ``max_missing`` months within the given periods.
+
+        ``max_missing=0`` over the whole window is the "operational for the entire
+        observation period" rule of Module 2.
+        Args:
+            max_missing (int): Largest number of missing months allowed.
+            periods (list): Any of "pre", "trial" and "post". None is the whole observation window.
+
+        Returns:
+            Index: Eligible store numbers, sorted.
+        """
+        missing = self.missing_months(periods)
+        return self.stores[missing.values <= max_missing]
+
+    def observation_windows(self, max_missing=0):
+        """Eligible stores with their metric tables over the whole window and the pre-trial months.
+        Args:
+            max_missing (int): Largest number of missing months allowed over the whole window.
+
+        Returns:
+            tuple: (Index of eligible stores, DataFrame of their rows over the observation window,
+            DataFrame of their pre-trial rows).
+        """
+        eligible = self.eligible_stores(max_missing=max_missing)
+        return eligible, self.frame(stores=eligible), self.frame("pre", stores=eligible)
+
+    def _cache_state(self):
+        # What quantium.cache hashes for an index: its table and windows, not the cube cache
+        return [self.table, self.months, self.periods]
+
+    def rows(self, period=None, stores=None):
+        """Positions in ``table`` of the store-months of a period, for some or all stores.
+        Args:
+            period (str): "pre", "trial", "post" or None for the whole observation window.
+            stores (list): Store numbers. None includes every store.
+
+        Returns:
+            ndarray: Row positions, ordered by store and month.
+        """
+        window = self.window(period)
+        if stores is None:
+            candidates = np.arange(len(self.table))
+        else:
+            codes = np.sort(self.stores.get_indexer(stores))
+            # Each store's rows are one contiguous block, so only those blocks are checked
+            blocks = [np.arange(self.offsets[code], self.offsets[code + 1]) for code in codes[codes >= 0]]
+            candidates = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int64)
+        positions = self.month_positions[candidates]
+        return candidates[(positions >= window.start) & (positions < window.stop)]
+
+    def frame(self, period=None, stores=None):
+        """Rows of ``table`` for a period and stores; the shared table itself when that is every row."""
+        rows = self.rows(period, stores)
+        if len(rows) == len(self.table):
+            return self.table
+        return self.table.take(rows)
+
+    def cube(self, metrics):
+        """Store x month x metric array over the observation window, built once per metric list."""
+        key = tuple(metrics)
+        if key not in self._cubes:
+            cube, _, months = pivot_metrics(self.table, list(metrics), stores=self.stores)
+            positions = self.months.get_indexer(months)
+            full = np.full((len(self.stores), len(self.months), len(key)), np.nan)
+            full[:, positions[positions >= 0]] = cube[:, positions >= 0]
+            self._cubes[key] = full
+        return self._cubes[key]
+
+    def values(self, metrics, period=None, stores=None):
+        """Metric values of a period as a view into ``cube`` (a copy only when selecting stores).
+        Args:
+            metrics (list): Metric columns.
+            period (str): "pre", "trial", "post" or None for the whole observation window.
+            stores (list): Store numbers. None keeps every store and returns a view.
+
+        Returns:
+            ndarray: Store x month x metric values of the period.
+        """
+        values = self.cube(metrics)[:, self.window(period)]
+        if stores is not None:
+            values = values[self.stores.get_indexer(stores)]
+        return values
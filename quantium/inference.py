@@ -0,0 +1,274 @@
+"""Resampling-based inference for trial uplift.
+
+An alternative to the t critical values of ``quantium.assessment`` that does not
+lean on seven pre-trial months being normally distributed. The effect of a
+trial/control pair on a metric is the mean percentage difference over the trial
+months minus the mean over the pre-trial months.
+
+- ``resample_uplift``: bootstrap confidence interval of the effect and a
+  permutation p-value from shuffling the pre/trial labels of the months. When
+  the months allow few enough label splits (120 for 7 pre-trial and 3 trial
+  months), every split is enumerated and the p-value is exact.
+- ``placebo_test``: the same effect for every eligible store paired with the
+  control store, and the trial store's rank among these placebo effects.
+
+Every pair and metric gets its own random stream spawned from one seed, so
+results are reproducible whatever the number of worker processes.
+"""
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from scipy import special, stats
+
+from quantium.assessment import uplift_arrays
+from quantium.control import pivot_metrics
+from quantium.uplift import TRIAL_END, TRIAL_START, _pairs, label_period
+
+
+PAIR_KEYS = ["Trial_Str", "Ctrl_Str", "metric"]
+
+
+def _effect(pct_diff, pre, trial):
+    """Mean trial minus mean pre-trial percentage difference over the last axis."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pre_mean = np.nansum(np.where(pre, pct_diff, 0), axis=-1) / pre.sum(axis=-1)
+        trial_mean = np.nansum(np.where(trial, pct_diff, 0), axis=-1) / trial.sum(axis=-1)
+    return trial_mean - pre_mean
+
+
+def _exceeds(resampled, observed, alternative, tol=0.0):
+    """Whether resampled effects are at least as extreme as the observed one, up to ``tol``."""
+    if alternative == "greater":
+        return resampled >= observed - tol
+    if alternative == "less":
+        return resampled <= observed + tol
+    return np.abs(resampled) >= np.abs(observed) - tol
+
+
+def _split_effects(pooled, trial_positions):
+    """Effect of every pre/trial split given as rows of trial month positions into ``pooled``."""
+    trial_sum = pooled[trial_positions].sum(axis=1)
+    n_trial = trial_positions.shape[1]
+    return trial_sum / n_trial - (pooled.sum() - trial_sum) / (len(pooled) - n_trial)
+
+
+def _resample_pair(pre, trial, seed, n_resamples, confidence, alternative, batch_size, early_stop, stop_confidence,
+                   alpha):
+    """Bootstrap interval and permutation p-value for one pair and metric."""
+    rng = np.random.default_rng(seed)
+    observed = trial.mean() - pre.mean()
+    if len(pre) < 2 or len(trial) < 1:
+        return observed, np.nan, np.nan, np.nan, 0
+
+    # Bootstrap: resample months with replacement within each period
+    boot = np.empty(n_resamples)
+    for start in range(0, n_resamples, batch_size):
+        size = min(batch_size, n_resamples - start)
+        boot_pre = pre[rng.integers(0, len(pre), (size, len(pre)))].mean(axis=1)
+        boot_trial = trial[rng.integers(0, len(trial), (size, len(trial)))].mean(axis=1)
+        boot[start:start + size] = boot_trial - boot_pre
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(boot, [tail, 1 - tail])
+
+    # Permutation: shuffle the period labels of the pooled months
+    pooled = np.concatenate([trial, pre])
+    n_trial = len(trial)
+    # Effects equal up to rounding count as ties
+    tol = 1e-12 * max(np.abs(pooled).max(), 1.0)
+    if special.comb(len(pooled), n_trial, exact=True) <= n_resamples:
+        # Few enough splits to enumerate every one: exact p-value, no Monte Carlo noise
+        splits = np.array(list(combinations(range(len(pooled)), n_trial)))
+        hits = int(_exceeds(_split_effects(pooled, splits), observed, alternative, tol).sum())
+        return observed, low, high, hits / len(splits), len(splits)
+
+    z = stats.norm.ppf(1 - (1 - stop_confidence) / 2)
+    hits = done = 0
+    while done < n_resamples:
+        size = min(batch_size, n_resamples - done)
+        shuffled = pooled[np.argsort(rng.random((size, len(pooled))), axis=1)]
+        effects = shuffled[:, :n_trial].mean(axis=1) - shuffled[:, n_trial:].mean(axis=1)
+        hits += int(_exceeds(effects, observed, alternative, tol).sum())
+        done += size
+        if early_stop:
+            p_value = (hits + 1) / (done + 1)
+            margin = z * np.sqrt(p_value * (1 - p_value) / done)
+            if p_value - margin > alpha or p_value + margin < alpha:
+                break
+    return observed, low, high, (hits + 1) / (done + 1), done
+
+
+def _resample_chunk(rows, options):
+    return [_resample_pair(pre, trial, seed, **options) for pre, trial, seed in rows]
+
+
+def resample_uplift(uplift, n_resamples=9999, confidence=0.95, alternative="greater", alpha=0.05, batch_size=1000,
+                    early_stop=True, stop_confidence=0.999, seed=None, n_jobs=None):
+    """Bootstrap confidence intervals and permutation p-values of every pair's trial effect.
+
+    Pairs and metrics are spread over a process pool; within each, resamples are drawn
+    ``batch_size`` at a time as index arrays. A pair whose months have at most
+    ``n_resamples`` distinct pre/trial splits gets the exact p-value over all of them.
+    Otherwise permutations are drawn at random and, with ``early_stop``, stop once the
+    p-value's normal-approximation interval at ``stop_confidence`` lies entirely above
+    or below ``alpha``.
+    Args:
+        uplift (DataFrame): Output of ``quantium.uplift.uplift_table``.
+        n_resamples (int): Bootstrap resamples, and the maximum number of permutations or
+            enumerated splits.
+        confidence (float): Coverage of the bootstrap percentile interval.
+        alternative (str): "greater" (trial above control), "less" or "two-sided".
+        alpha (float): Significance level used by the early-stopping rule and the
+            significant column.
+        batch_size (int): Resamples drawn per batch.
+        early_stop (bool): Stop permuting a pair once its p-value is clearly decided.
+        stop_confidence (float): Confidence of the early-stopping decision.
+        seed (int): Seed of the random streams. None draws fresh entropy.
+        n_jobs (int): Number of worker processes. None uses every core, 1 runs in-process.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, Ctrl_Str, metric) with effect, ci_low, ci_high,
+        p_value, n_permutations (the number of splits when exact) and significant.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if alternative not in ("greater", "less", "two-sided"):
+        raise ValueError("alternative must be 'greater', 'less' or 'two-sided', got {!r}".format(alternative))
+    arrays = uplift_arrays(uplift)
+    present = np.isfinite(arrays["pct_diff"])
+    pre = present & (arrays["period"] == "pre")
+    trial = present & (arrays["period"] == "trial")
+    n_pairs, n_metrics, _ = arrays["pct_diff"].shape
+
+    seeds = np.random.SeedSequence(seed).spawn(n_pairs * n_metrics)
+    rows = []
+    for i in range(n_pairs):
+        for k in range(n_metrics):
+            values = arrays["pct_diff"][i, k]
+            rows.append((values[pre[i, k]], values[trial[i, k]], seeds[i * n_metrics + k]))
+    options = {
+        "n_resamples": n_resamples,
+        "confidence": confidence,
+        "alternative": alternative,
+        "batch_size": batch_size,
+        "early_stop": early_stop,
+        "stop_confidence": stop_confidence,
+        "alpha": alpha,
+    }
+
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(rows)))
+    chunks = [rows[i::n_jobs] for i in range(n_jobs)]
+    if n_jobs == 1:
+        parts = [_resample_chunk(chunk, options) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            parts = list(pool.map(_resample_chunk, chunks, [options] * n_jobs))
+    # Undo the round-robin split
+    results = [None] * len(rows)
+    for j, part in enumerate(parts):
+        results[j::n_jobs] = part
+
+    result = pd.DataFrame(results, columns=["effect", "ci_low", "ci_high", "p_value", "n_permutations"])
+    keys = pd.DataFrame({
+        "Trial_Str": np.repeat(arrays["pairs"]["Trial_Str"].values, n_metrics),
+        "Ctrl_Str": np.repeat(arrays["pairs"]["Ctrl_Str"].values, n_metrics),
+        "metric": np.tile(np.asarray(arrays["metrics"]), n_pairs),
+    })
+    result = pd.concat([keys, result], axis=1)
+    result["significant"] = result["p_value"] < alpha
+    return result
+
+
+def placebo_effects(table, trial_control, metrics, candidates=None, trial_start=TRIAL_START, trial_end=TRIAL_END):
+    """Trial effect of every candidate store when paired with each pair's control store.
+
+    Each candidate is treated as if it were the trial store: the control store is
+    scaled to the candidate's pre-trial totals and the effect is computed as for the
+    real pair, for all pairs, candidates and metrics in one broadcast.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns.
+        trial_control (dict): Trial store -> control store, or a list of (trial, control) pairs.
+        metrics (list): Metric columns to test.
+        candidates (list): Placebo stores. None uses every store in ``table`` that is
+            neither a trial nor a control store of any pair.
+        trial_start (int): First trial month.
+        trial_end (int): Last trial month.
+
+    Returns:
+        tuple: (DataFrame with one row per (Trial_Str, Ctrl_Str, metric) and the actual
+        effect; DataFrame with one row per (Trial_Str, Ctrl_Str, metric, Placebo_Str)
+        and the placebo effect).
+    """
+    metrics = list(metrics)
+    pairs = _pairs(trial_control)
+    if candidates is None:
+        used = set(pairs["Trial_Str"]) | set(pairs["Ctrl_Str"])
+        candidates = [store for store in table["STORE_NBR"].unique() if store not in used]
+    candidates = np.asarray(sorted(candidates))
+
+    stores = np.concatenate([pairs["Trial_Str"].values, candidates])
+    cube, _, months = pivot_metrics(table, metrics, stores=stores)
+    control_cube, _, _ = pivot_metrics(table, metrics, stores=pairs["Ctrl_Str"].values)
+    periods = label_period(months.values, trial_start, trial_end)
+    pre, trial = periods == "pre", periods == "trial"
+
+    n_pairs = len(pairs)
+    # pair x store x month x metric, store 0 of each pair being the real trial store
+    placebo_cube = np.broadcast_to(cube[None, n_pairs:], (n_pairs,) + cube[n_pairs:].shape)
+    treated = np.concatenate([cube[:n_pairs, None], placebo_cube], axis=1)
+    control = control_cube[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        factors = np.nansum(treated[:, :, pre], axis=2) / np.nansum(control[:, :, pre], axis=2)
+        scaled = control * factors[:, :, None, :]
+        pct_diff = (treated - scaled) / ((treated + scaled) / 2)
+    pct_diff = np.moveaxis(pct_diff, 2, 3)  # pair x store x metric x month
+    present = np.isfinite(pct_diff)
+    effects = _effect(pct_diff, present & pre, present & trial)
+
+    actual = pd.DataFrame({
+        "Trial_Str": np.repeat(pairs["Trial_Str"].values, len(metrics)),
+        "Ctrl_Str": np.repeat(pairs["Ctrl_Str"].values, len(metrics)),
+        "metric": np.tile(metrics, n_pairs),
+        "effect": effects[:, 0].ravel(),
+    })
+    n_candidates = len(candidates)
+    placebos = pd.DataFrame({
+        "Trial_Str": np.repeat(pairs["Trial_Str"].values, n_candidates * len(metrics)),
+        "Ctrl_Str": np.repeat(pairs["Ctrl_Str"].values, n_candidates * len(metrics)),
+        "metric": np.tile(np.repeat(metrics, n_candidates), n_pairs),
+        "Placebo_Str": np.tile(candidates, n_pairs * len(metrics)),
+        "effect": np.moveaxis(effects[:, 1:], 1, 2).ravel(),
+    })
+    return actual, placebos
+
+
+def placebo_test(table, trial_control, metrics, candidates=None, alternative="greater", alpha=0.05,
+                 trial_start=TRIAL_START, trial_end=TRIAL_END):
+    """Rank every trial store's effect among the placebo effects of the eligible stores.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns, usually
+            restricted to the eligible stores.
+        trial_control (dict): Trial store -> control store, or a list of (trial, control) pairs.
+        metrics (list): Metric columns to test.
+        candidates (list): Placebo stores; see ``placebo_effects``.
+        alternative (str): "greater", "less" or "two-sided".
+        alpha (float): Significance level of the significant column.
+        trial_start (int): First trial month.
+        trial_end (int): Last trial month.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, Ctrl_Str, metric) with effect, n_placebos,
+        placebo_p_value = (1 + placebos at least as extreme) / (1 + n_placebos) and significant.
+    """
+    if alternative not in ("greater", "less", "two-sided"):
+        raise ValueError("alternative must be 'greater', 'less' or 'two-sided', got {!r}".format(alternative))
+    actual, placebos = placebo_effects(table, trial_control, metrics, candidates, trial_start, trial_end)
+    placebos = placebos.dropna(subset=["effect"]).merge(actual.rename(columns={"effect": "observed"}), on=PAIR_KEYS)
+    placebos["hit"] = _exceeds(placebos["effect"].values, placebos["observed"].values, alternative)
+    counts = placebos.groupby(PAIR_KEYS, sort=False).agg(n_placebos=("hit", "size"), hits=("hit", "sum")).reset_index()
+    result = actual.merge(counts, on=PAIR_KEYS, how="left")
+    result["n_placebos"] = result["n_placebos"].fillna(0).astype(int)
+    result["placebo_p_value"] = (result["hits"].fillna(0) + 1) / (result["n_placebos"] + 1)
+    result["significant"] = result["placebo_p_value"] < alpha
+    return result.drop(columns="hits")
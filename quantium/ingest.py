@@ -0,0 +1,178 @@
+"""Load the QVI source files through a columnar on-disk cache.
+
+Parsing ``QVI_transaction_data.xlsx`` is the slowest step of Module 1. The first
+read of a source file converts it into an uncompressed Arrow IPC (Feather v2)
+file inside ``cache_dir``; later reads memory-map that file and only
+materialise the requested columns. A cache entry is reused while the source's
+size and mtime are unchanged, and is rebuilt when the source's content hash
+differs from the one recorded at conversion time.
+
+pyarrow is optional. Without it every call falls back to parsing the source.
+"""
+import hashlib
+import json
+import os
+import warnings
+
+import pandas as pd
+
+from quantium.schema import apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+    feather = None
+
+
+DEFAULT_CACHE_DIR = ".qvi_cache"
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Calculate the SHA-256 hex digest of a file, reading it in chunks.
+    Args:
+        path (str): File to hash.
+        chunk_size (int): Number of bytes read per iteration.
+
+    Returns:
+        str: Hex digest of the file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_source(path, columns=None):
+    """Parse a QVI source file directly, without going through the cache.
+    Args:
+        path (str): ``.xlsx``/``.xls`` workbook or ``.csv`` file.
+        columns (list): Columns to keep. None keeps every column.
+
+    Returns:
+        DataFrame: Parsed source table.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xls"):
+        return pd.read_excel(path, usecols=columns)
+    if extension == ".csv":
+        return pd.read_csv(path, usecols=columns)
+    raise ValueError("Unsupported source file type: {}".format(path))
+
+
+def _cache_paths(path, cache_dir):
+    source = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    tag = hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cache_dir, "{}-{}.json".format(stem, tag)), stem, tag
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(manifest_path, manifest):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as handle:
+        json.dump(manifest, handle, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+
+def build_cache(path, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    """Make sure an up-to-date columnar copy of a source file exists.
+    Args:
+        path (str): Source workbook or CSV.
+        cache_dir (str): Directory holding the Arrow files and their manifests.
+        refresh (bool): Rebuild the cache even if the source looks unchanged.
+
+    Returns:
+        str: Path of the Arrow IPC file mirroring the source.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required to build the columnar cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path, stem, tag = _cache_paths(path, cache_dir)
+    manifest = _load_manifest(manifest_path)
+    stat = os.stat(path)
+
+    cache_path = None if manifest is None else os.path.join(cache_dir, manifest["cache_file"])
+
+    if cache_path is not None and not refresh and os.path.exists(cache_path):
+        if manifest["mtime_ns"] == stat.st_mtime_ns and manifest["size"] == stat.st_size:
+            return cache_path
+        # Touched but possibly unchanged: only the content hash decides.
+        digest = file_digest(path)
+        if digest == manifest["sha256"]:
+            manifest["mtime_ns"] = stat.st_mtime_ns
+            _write_manifest(manifest_path, manifest)
+            return cache_path
+    else:
+        digest = file_digest(path)
+
+    cache_file = "{}-{}-{}.arrow".format(stem, tag, digest[:16])
+    cache_path = os.path.join(cache_dir, cache_file)
+    table = pa.Table.from_pandas(read_source(path), preserve_index=False)
+    tmp_path = cache_path + ".tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, cache_path)
+
+    if manifest is not None and manifest["cache_file"] != cache_file:
+        stale_path = os.path.join(cache_dir, manifest["cache_file"])
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    _write_manifest(manifest_path, {
+        "source": os.path.abspath(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest,
+        "cache_file": cache_file,
+    })
+    return cache_path
+
+
+def cached_read(path, columns=None, cache_dir=DEFAULT_CACHE_DIR, refresh=False):
+    """Read a source file through the columnar cache.
+    Args:
+        path (str): Source workbook or CSV.
+        columns (list): Columns to load. None loads every column.
+        cache_dir (str): Directory holding the Arrow files and their manifests.
+        refresh (bool): Rebuild the cache even if the source looks unchanged.
+
+    Returns:
+        DataFrame: Requested columns of the source table.
+    """
+    if pa is None:
+        warnings.warn("pyarrow is not installed; reading {} without the columnar cache".format(path))
+        return read_source(path, columns)
+    cache_path = build_cache(path, cache_dir, refresh)
+    table = feather.read_table(cache_path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def _load(path, columns, cache_dir, compact):
+    frame = cached_read(path, columns, cache_dir)
+    if compact:
+        frame = apply_schema(frame)
+    return frame
+
+
+def load_transactions(path="QVI_transaction_data.xlsx", columns=None, cache_dir=DEFAULT_CACHE_DIR, compact=False):
+    """Load the transaction table used by Module 1; ``compact`` applies ``quantium.schema.QVI_SCHEMA``."""
+    return _load(path, columns, cache_dir, compact)
+
+
+def load_purchase_behaviour(path="QVI_purchase_behaviour.csv", columns=None, cache_dir=DEFAULT_CACHE_DIR,
+                            compact=False):
+    """Load the customer purchase-behaviour table used by Module 1; ``compact`` applies ``QVI_SCHEMA``."""
+    return _load(path, columns, cache_dir, compact)
+
+
+def load_qvi_data(path="QVI_data.csv", columns=None, cache_dir=DEFAULT_CACHE_DIR, compact=False):
+    """Load the merged QVI transaction table used by Module 2; ``compact`` applies ``QVI_SCHEMA``."""
+    return _load(path, columns, cache_dir, compact)
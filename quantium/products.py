@@ -0,0 +1,133 @@
+"""Product dimension built from the distinct products of a transaction table.
+
+There are ~114 distinct products but millions of transaction rows, so every
+regex over PROD_NAME is run once per product here, and transactions pick the
+parsed attributes up with an integer gather on PROD_NBR.
+"""
+import numpy as np
+import pandas as pd
+
+from quantium.brands import brand_of, load_brand_aliases
+
+
+PRODUCT_KEY = "PROD_NBR"
+
+
+def parse_product_names(names, aliases=None):
+    """Parse product names into brand, pack size, salsa flag and words.
+    Args:
+        names (Series): Distinct PROD_NAME values.
+        aliases (dict): Alias -> canonical brand. None loads the default alias table.
+
+    Returns:
+        DataFrame: One row per name with First_Word, Cleaned_Brand_Names,
+        Pack_Size, Is_Salsa and Tokens columns.
+    """
+    if aliases is None:
+        aliases = load_brand_aliases()
+    names = pd.Series(names).reset_index(drop=True)
+    words = names.str.split()
+    parsed = pd.DataFrame({"PROD_NAME": names})
+    parsed["First_Word"] = words.str[0]
+    parsed["Cleaned_Brand_Names"] = pd.Categorical([brand_of(name, aliases) for name in names])
+    parsed["Pack_Size"] = names.str.extract(r"([0-9]+)[gG]", expand=False).astype("float")
+    parsed["Is_Salsa"] = names.str.contains(r"[Ss]alsa")
+    # Same word split as the Module 1 word count: drop pack sizes and punctuation
+    parsed["Tokens"] = names.str.replace(r"([0-9]+[gG])", "", regex=True).str.replace(r"[^\w]", " ", regex=True).str.split()
+    return parsed
+
+
+def product_dimension(transactions, aliases=None):
+    """Build the product dimension of a transaction table.
+    Args:
+        transactions (DataFrame): Table with PROD_NBR and PROD_NAME columns.
+        aliases (dict): Alias -> canonical brand. None loads the default alias table.
+
+    Returns:
+        DataFrame: One row per PROD_NBR, with the attributes from ``parse_product_names``.
+        The first name seen is used if a product number appears with several names.
+    """
+    products = transactions[[PRODUCT_KEY, "PROD_NAME"]].drop_duplicates(PRODUCT_KEY)
+    parsed = parse_product_names(products["PROD_NAME"], aliases)
+    parsed.insert(0, PRODUCT_KEY, products[PRODUCT_KEY].values)
+    return parsed.sort_values(PRODUCT_KEY).reset_index(drop=True)
+
+
+def product_positions(transactions, products):
+    """Row position in ``products`` of every transaction's product.
+    Args:
+        transactions (DataFrame): Table with a PROD_NBR column.
+        products (DataFrame): Product dimension from ``product_dimension``.
+
+    Returns:
+        ndarray: Integer positions aligned with ``transactions``.
+    """
+    positions = pd.Index(products[PRODUCT_KEY]).get_indexer(transactions[PRODUCT_KEY])
+    if (positions < 0).any():
+        missing = np.unique(transactions[PRODUCT_KEY].values[positions < 0])
+        raise ValueError("Products missing from the dimension table: {}".format(list(missing[:10])))
+    return positions
+
+
+def lookup_product(transactions, products, column, positions=None):
+    """Broadcast one product attribute to every transaction.
+    Args:
+        transactions (DataFrame): Table with a PROD_NBR column.
+        products (DataFrame): Product dimension from ``product_dimension``.
+        column (str): Product attribute to broadcast, e.g. "Pack_Size".
+        positions (ndarray): Precomputed ``product_positions``, to reuse across lookups.
+
+    Returns:
+        Series: Attribute values aligned with ``transactions``.
+    """
+    if positions is None:
+        positions = product_positions(transactions, products)
+    values = products[column].take(positions)
+    values.index = transactions.index
+    return values
+
+
+def attach_products(transactions, products, columns):
+    """Add product attributes to a transaction table.
+    Args:
+        transactions (DataFrame): Table with a PROD_NBR column.
+        products (DataFrame): Product dimension from ``product_dimension``.
+        columns (list): Product attributes to add.
+
+    Returns:
+        DataFrame: Copy of ``transactions`` with the attribute columns added.
+    """
+    positions = product_positions(transactions, products)
+    transactions = transactions.copy(deep=False)
+    for col in columns:
+        transactions[col] = lookup_product(transactions, products, col, positions)
+    return transactions
+
+
+def token_frequencies(transactions, products=None, weight=None):
+    """Count the words of PROD_NAME over a transaction table.
+
+    Words are counted once per distinct product and multiplied by that
+    product's row count (or summed weight), instead of splitting every row.
+    Args:
+        transactions (DataFrame): Table with PROD_NBR and PROD_NAME columns.
+        products (DataFrame): Product dimension from ``product_dimension``. None builds it.
+        weight (str): Column to weight each row by, e.g. "PROD_QTY" or "TOT_SALES".
+            None counts rows.
+
+    Returns:
+        Series: Frequency per word, sorted in descending order.
+    """
+    if products is None:
+        products = product_dimension(transactions)
+    positions = product_positions(transactions, products)
+    weights = None if weight is None else transactions[weight].values
+    per_product = np.bincount(positions, weights=weights, minlength=len(products))
+    tokens = products["Tokens"].explode()
+    tokens = tokens[tokens.notna()]
+    counts = pd.Series(per_product[tokens.index.values], index=tokens.values)
+    if weight is None:
+        counts = counts.astype("int64")
+    counts = counts.groupby(level=0).sum().sort_values(ascending=False)
+    counts.name = weight
+    return counts
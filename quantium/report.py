@@ -0,0 +1,174 @@
+"""Headless batch rendering of the Module 1 and Module 2 charts.
+
+Charts are described as specs (kind, file name, the table to draw and
+drawing options) built from precomputed result tables, then rendered with
+the non-interactive Agg backend across worker processes. Each worker draws
+all its charts on one reused Figure. A chart whose spec hashes to the value
+recorded at its last render, and whose file still exists, is skipped.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from quantium.cache import fingerprint
+from quantium.ingest import _load_manifest, _write_manifest
+from quantium.segments import SEGMENT_KEYS
+
+
+REPORT_MANIFEST = ".report_manifest.json"
+PREMIUM_ORDER = ["Budget", "Mainstream", "Premium"]
+METRIC_TITLES = {"TOT_SALES": "Total Sales", "nCustomers": "Number of Customers"}
+
+
+def chart_spec(kind, filename, data, figsize=(13, 5), margins=None, **options):
+    """Describe one chart.
+    Args:
+        kind (str): Key of ``RENDERERS``.
+        filename (str): Output file name, relative to the report directory.
+        data (DataFrame): Table drawn by the renderer.
+        figsize (tuple): Figure width and height in inches.
+        margins (dict): Fixed ``subplots_adjust`` margins. None crops to the drawn content
+            instead, which costs a second draw of the figure.
+        **options: Renderer options such as title and axis labels.
+
+    Returns:
+        dict: Chart spec.
+    """
+    return {"kind": kind, "filename": filename, "data": data, "figsize": tuple(figsize), "margins": margins,
+            "options": options}
+
+
+def lifestage_spec(segment_metrics, column, filename, xlabel, title):
+    """Stacked LIFESTAGE x PREMIUM_CUSTOMER bar chart of one ``segment_summary`` column."""
+    data = segment_metrics.reset_index()[SEGMENT_KEYS + [column]].rename(columns={column: "value"})
+    margins = {"left": 0.16, "right": 0.88, "bottom": 0.12, "top": 0.92}
+    return chart_spec("stacked_lifestage", filename, data, margins=margins, xlabel=xlabel, title=title)
+
+
+def trial_control_specs(uplift, metric, filename="TS {} and CS {} - {}.png"):
+    """One trial-period chart per trial/control pair: trial and control store values with the
+    control's 5%/95% thresholds (mean control value -/+ twice the pre-trial standard deviation
+    of the percentage difference, as a fraction of it).
+    Args:
+        uplift (DataFrame): Output of ``quantium.uplift.uplift_table``.
+        metric (str): Metric to chart.
+        filename (str): File name pattern, formatted with the trial store, control store and metric.
+
+    Returns:
+        list: Chart specs.
+    """
+    specs = []
+    margins = {"left": 0.1, "right": 0.68, "bottom": 0.2, "top": 0.9}
+    rows = uplift[uplift["metric"] == metric]
+    for (trial, control), pair in rows.groupby(["Trial_Str", "Ctrl_Str"], sort=False):
+        std = pair.loc[pair["period"] == "pre", "pct_diff"].std()
+        data = pair.loc[pair["period"] == "trial", ["YEARMONTH", "trial", "control"]].reset_index(drop=True)
+        title = "Trial Store {} and Control Store {} - {}".format(trial, control, METRIC_TITLES.get(metric, metric))
+        specs.append(chart_spec("trial_vs_control", filename.format(trial, control, metric), data, figsize=(8.5, 4.8),
+                                margins=margins, std=float(std), metric=metric, title=title))
+    return specs
+
+
+def _draw_stacked_lifestage(ax, data, xlabel, title):
+    wide = data.pivot_table(index="LIFESTAGE", columns="PREMIUM_CUSTOMER", values="value", aggfunc="sum", observed=True)
+    wide = wide.reindex(columns=[c for c in PREMIUM_ORDER if c in wide.columns] or wide.columns)
+    total = wide.values.sum()
+    positions = np.arange(len(wide))
+    left = np.zeros(len(wide))
+    for column in wide.columns:
+        values = wide[column].fillna(0).values
+        ax.barh(positions, values, left=left, edgecolor="grey", height=1, label=column)
+        for i, value in enumerate(values):
+            ax.text(left[i] + value / 2, i, "{:.1%}".format(value / total), va="center", ha="center", size=8)
+        left += values
+    ax.set_yticks(positions)
+    ax.set_yticklabels(wide.index)
+    ax.set_ylabel("LIFESTAGE")
+    ax.set_xlabel(xlabel)
+    ax.legend(loc="center left", bbox_to_anchor=(1.0, 0.5))
+    ax.set_title(title)
+
+
+def _draw_trial_vs_control(ax, data, std, metric, title):
+    frame = data.set_index("YEARMONTH").rename(columns={"trial": "trial_" + metric, "control": "control_" + metric})
+    frame.plot.bar(ax=ax)
+    mean = data["control"].mean()
+    ax.axhline(y=mean + mean * std * 2, linewidth=1, color="b", label="95% threshold")
+    ax.axhline(y=mean - mean * std * 2, linewidth=1, color="r", label="5% threshold")
+    ax.legend(loc="center left", bbox_to_anchor=(1.0, 0.5))
+    ax.set_title(title)
+
+
+RENDERERS = {
+    "stacked_lifestage": _draw_stacked_lifestage,
+    "trial_vs_control": _draw_trial_vs_control,
+}
+
+
+def spec_hash(spec):
+    """Hash of everything that determines a chart's pixels."""
+    return fingerprint(spec["kind"], spec["figsize"], spec["margins"], spec["options"], spec["data"])
+
+
+def _render_chunk(specs, out_dir, dpi):
+    """Render specs on one reused Agg figure; runs inside a worker process."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    for spec in specs:
+        figure.clear()
+        figure.set_size_inches(spec["figsize"])
+        RENDERERS[spec["kind"]](figure.add_subplot(), spec["data"], **spec["options"])
+        path = os.path.join(out_dir, spec["filename"])
+        if spec["margins"] is None:
+            figure.savefig(path, bbox_inches="tight", dpi=dpi)
+        else:
+            figure.subplots_adjust(**spec["margins"])
+            figure.savefig(path, dpi=dpi)
+    return [spec["filename"] for spec in specs]
+
+
+def render_report(specs, out_dir=".", n_jobs=None, force=False, dpi=100):
+    """Render chart specs to PNG files, skipping charts whose inputs did not change.
+    Args:
+        specs (list): Chart specs from ``chart_spec`` and the spec builders.
+        out_dir (str): Report directory; holds the files and the hash manifest.
+        n_jobs (int): Number of worker processes. None uses every core, 1 renders in-process.
+        force (bool): Render every chart even if it looks unchanged.
+        dpi (int): Resolution of the PNG files.
+
+    Returns:
+        DataFrame: One row per spec with filename, hash and status ("rendered" or "skipped").
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, REPORT_MANIFEST)
+    manifest = _load_manifest(manifest_path) or {}
+    hashes = [spec_hash(spec) for spec in specs]
+    todo = [spec for spec, digest in zip(specs, hashes)
+            if force or manifest.get(spec["filename"]) != digest
+            or not os.path.exists(os.path.join(out_dir, spec["filename"]))]
+
+    if todo:
+        n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(todo)))
+        chunks = [todo[i::n_jobs] for i in range(n_jobs)]
+        if n_jobs == 1:
+            for chunk in chunks:
+                _render_chunk(chunk, out_dir, dpi)
+        else:
+            with ProcessPoolExecutor(n_jobs) as pool:
+                list(pool.map(_render_chunk, chunks, [out_dir] * n_jobs, [dpi] * n_jobs))
+
+    rendered = {spec["filename"] for spec in todo}
+    for spec, digest in zip(specs, hashes):
+        manifest[spec["filename"]] = digest
+    _write_manifest(manifest_path, manifest)
+    return pd.DataFrame({
+        "filename": [spec["filename"] for spec in specs],
+        "hash": hashes,
+        "status": ["rendered" if spec["filename"] in rendered else "skipped" for spec in specs],
+    })
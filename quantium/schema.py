@@ -0,0 +1,94 @@
+"""Compact column types for the QVI tables.
+
+Loaded tables hold every string as a Python object and every number as a
+64-bit value. The QVI schema below stores the low-cardinality strings as
+categoricals, integers in the smallest type that holds them, and sales as
+float32 when no value moves by a cent. ``Segment`` is built from the codes of
+``LIFESTAGE`` and ``PREMIUM_CUSTOMER`` instead of concatenating two strings per row.
+"""
+import numpy as np
+import pandas as pd
+
+
+QVI_SCHEMA = {
+    "STORE_NBR": "int16",
+    "LYLTY_CARD_NBR": "int32",
+    "TXN_ID": "int32",
+    "PROD_NBR": "int16",
+    "PROD_QTY": "int16",
+    "PACK_SIZE": "int16",
+    "Pack_Size": "int16",
+    "YEARMONTH": "int32",
+    "TOT_SALES": "float32",
+    "LIFESTAGE": "category",
+    "PREMIUM_CUSTOMER": "category",
+    "PROD_NAME": "category",
+    "BRAND": "category",
+    "Cleaned_Brand_Names": "category",
+    "Segment": "category",
+}
+
+SEGMENT_SEPARATOR = " - "
+
+
+def _fits(values, dtype):
+    """Whether every value survives conversion to ``dtype``."""
+    if len(values) == 0:
+        return True
+    if np.issubdtype(dtype, np.integer):
+        if not pd.api.types.is_integer_dtype(values):
+            return False
+        info = np.iinfo(dtype)
+        return info.min <= values.min() and values.max() <= info.max
+    if not pd.api.types.is_float_dtype(values):
+        return False
+    # Sales are in cents: float32 is safe while no value moves by half a cent
+    with np.errstate(invalid="ignore"):
+        moved = np.abs(values.astype(dtype).astype("float64") - values)
+    return not (moved >= 0.005).any()
+
+
+def apply_schema(frame, schema=None):
+    """Cast the columns of a QVI table to compact types where that loses nothing.
+
+    Columns missing from the frame are skipped. An integer or float target is only
+    applied when every value fits; otherwise the column keeps its type.
+    Args:
+        frame (DataFrame): Table to convert.
+        schema (dict): Column -> dtype ("category" or a NumPy dtype name). None uses ``QVI_SCHEMA``.
+
+    Returns:
+        DataFrame: The table with converted columns.
+    """
+    schema = QVI_SCHEMA if schema is None else schema
+    casts = {}
+    for column, dtype in schema.items():
+        if column not in frame.columns or frame[column].dtype == dtype:
+            continue
+        if dtype == "category":
+            casts[column] = "category"
+        elif _fits(frame[column].values, np.dtype(dtype)):
+            casts[column] = dtype
+    return frame.astype(casts) if casts else frame
+
+
+def segment_column(lifestage, premium, separator=SEGMENT_SEPARATOR):
+    """Categorical "LIFESTAGE - PREMIUM_CUSTOMER" segment as the product of its two parents.
+
+    The categories are every (lifestage, premium) combination; each row's code is
+    computed from the parents' codes, so no per-row string is built.
+    Args:
+        lifestage (Series): LIFESTAGE column.
+        premium (Series): PREMIUM_CUSTOMER column.
+        separator (str): Text between the two parents in the category labels.
+
+    Returns:
+        Series: Categorical segment per row; missing when either parent is missing.
+    """
+    lifestage = lifestage.astype("category")
+    premium = premium.astype("category")
+    outer, inner = lifestage.cat.codes.values, premium.cat.codes.values
+    n_inner = len(premium.cat.categories)
+    codes = np.where((outer < 0) | (inner < 0), -1, outer.astype(np.int64) * n_inner + inner)
+    categories = [str(a) + separator + str(b) for a in lifestage.cat.categories for b in premium.cat.categories]
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=lifestage.index, name="Segment")
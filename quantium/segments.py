@@ -0,0 +1,138 @@
+"""Customer-segment analysis of the cleaned Module 1 transactions.
+
+Segments are LIFESTAGE x PREMIUM_CUSTOMER. The grouping keys are factorised
+once into a single integer group id, and every metric is then a ``bincount``
+over that id instead of a separate ``groupby`` per metric.
+"""
+import numpy as np
+import pandas as pd
+
+
+SEGMENT_KEYS = ["LIFESTAGE", "PREMIUM_CUSTOMER"]
+
+
+def group_codes(frame, keys):
+    """Factorise grouping keys into one integer group id per row.
+    Args:
+        frame (DataFrame): Table holding the key columns.
+        keys (list): Grouping columns.
+
+    Returns:
+        tuple: (ndarray of group ids, -1 where any key is missing;
+        DataFrame of the observed key combinations, one row per group id, sorted by key).
+    """
+    codes = []
+    levels = []
+    for key in keys:
+        key_codes, key_levels = pd.factorize(frame[key], sort=True)
+        codes.append(key_codes)
+        levels.append(key_levels)
+    missing = np.zeros(len(frame), dtype=bool)
+    for key_codes in codes:
+        missing |= key_codes < 0
+    shape = tuple(max(len(level), 1) for level in levels)
+    flat = np.ravel_multi_index([np.where(missing, 0, c) for c in codes], shape)
+    observed, group_ids = np.unique(flat[~missing], return_inverse=True)
+    groups = np.full(len(frame), -1, dtype=np.int64)
+    groups[~missing] = group_ids.ravel()
+    key_positions = np.unravel_index(observed, shape)
+    key_table = pd.DataFrame({key: np.asarray(level).take(pos) for key, level, pos in zip(keys, levels, key_positions)})
+    return groups, key_table
+
+
+def segment_summary(transactions, extra_keys=None):
+    """Calculate every segment metric in a single pass over the transactions.
+    Args:
+        transactions (DataFrame): Cleaned transactions with LIFESTAGE, PREMIUM_CUSTOMER,
+            LYLTY_CARD_NBR, PROD_QTY and TOT_SALES columns.
+        extra_keys (list): Additional grouping columns, e.g. ["STORE_NBR"] or ["YEARMONTH"].
+
+    Returns:
+        DataFrame: One row per segment (and extra key) with columns
+        Total_Sales, Avg_Sales_Per_Txn, nTransactions, nCustomers, Txn_Per_Customer,
+        Qty_Per_Customer and Avg_Unit_Price.
+    """
+    keys = SEGMENT_KEYS + list(extra_keys or [])
+    groups, summary = group_codes(transactions, keys)
+    valid = groups >= 0
+    groups = groups[valid]
+    n_groups = len(summary)
+
+    sales = transactions["TOT_SALES"].values[valid].astype("float64")
+    qty = transactions["PROD_QTY"].values[valid].astype("float64")
+    n_txn = np.bincount(groups, minlength=n_groups)
+    total_sales = np.bincount(groups, weights=sales, minlength=n_groups)
+    total_qty = np.bincount(groups, weights=qty, minlength=n_groups)
+    unit_price = np.bincount(groups, weights=sales / qty, minlength=n_groups)
+
+    # Distinct customers: count unique (group, customer) pairs per group
+    cust_codes, cust_levels = pd.factorize(transactions["LYLTY_CARD_NBR"].values[valid])
+    pairs = np.unique(groups * (len(cust_levels) + 1) + (cust_codes + 1))
+    n_cust = np.bincount(pairs // (len(cust_levels) + 1), minlength=n_groups)
+
+    summary["Total_Sales"] = total_sales
+    summary["Avg_Sales_Per_Txn"] = total_sales / n_txn
+    summary["nTransactions"] = n_txn
+    summary["nCustomers"] = n_cust
+    summary["Txn_Per_Customer"] = n_txn / n_cust
+    summary["Qty_Per_Customer"] = total_qty / n_cust
+    summary["Avg_Unit_Price"] = unit_price / n_txn
+    return summary
+
+
+def top_n_per_segment(transactions, column, n=3, weight=None, keys=SEGMENT_KEYS):
+    """Rank the most purchased values of a column within every segment.
+
+    All segments are ranked from one grouped count instead of filtering the
+    table once per segment.
+    Args:
+        transactions (DataFrame): Table holding the segment keys and ``column``.
+        column (str): Column to rank, e.g. "Cleaned_Brand_Names" or "Pack_Size".
+        n (int): Number of values kept per segment.
+        weight (str): Column to weight each row by, e.g. "PROD_QTY" or "TOT_SALES".
+            None counts rows.
+        keys (list): Segment columns.
+
+    Returns:
+        DataFrame: Segment keys, ``column``, "Weight" and "Rank" (1 = most purchased),
+        sorted by segment and rank.
+    """
+    keys = list(keys)
+    groups, ranked = group_codes(transactions, keys + [column])
+    valid = groups >= 0
+    weights = None if weight is None else transactions[weight].values[valid]
+    ranked["Weight"] = np.bincount(groups[valid], weights=weights, minlength=len(ranked))
+
+    segment_ids, _ = group_codes(ranked, keys)
+    # Stable sort: by segment, then by descending weight, ties keep key order
+    order = np.lexsort((-ranked["Weight"].values, segment_ids))
+    ranked = ranked.iloc[order].reset_index(drop=True)
+    ranked["Rank"] = ranked.groupby(keys, sort=False).cumcount() + 1
+    return ranked[ranked["Rank"] <= n].reset_index(drop=True)
+
+
+def plot_top_n(ranked, column, keys=SEGMENT_KEYS, ncols=3, panel_size=(5, 1.5)):
+    """Draw the output of ``top_n_per_segment`` as one horizontal bar chart per segment.
+    Args:
+        ranked (DataFrame): Output of ``top_n_per_segment``.
+        column (str): Ranked column.
+        keys (list): Segment columns.
+        ncols (int): Number of panels per figure row.
+        panel_size (tuple): Width and height of a single panel in inches.
+
+    Returns:
+        Figure: Figure holding one panel per segment.
+    """
+    import matplotlib.pyplot as plt
+
+    segments = list(ranked.groupby(list(keys), sort=False))
+    nrows = -(-len(segments) // ncols)
+    fig, axes = plt.subplots(nrows, ncols, figsize=(panel_size[0] * ncols, panel_size[1] * nrows), squeeze=False)
+    for ax, (segment, rows) in zip(axes.ravel(), segments):
+        rows[::-1].plot.barh(x=column, y="Weight", ax=ax, legend=False)
+        ax.set_title(" - ".join(str(part) for part in np.atleast_1d(segment)), fontsize=8)
+        ax.set_ylabel("")
+    for ax in axes.ravel()[len(segments):]:
+        ax.set_visible(False)
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,77 @@
+"""Top-k nearest-neighbour index over the stores' pre-trial metric series.
+
+Every store's monthly series is z-normalised per metric and flattened into
+one vector, scaled so that the dot product of two vectors is their Pearson
+correlation averaged over the metrics. Building the index is one pivot;
+each query is one matrix-vector product followed by a partial selection
+(``argpartition``) instead of a full sort.
+"""
+import numpy as np
+import pandas as pd
+
+from quantium.control import pivot_metrics, zscore_months
+
+
+class StoreSimilarityIndex:
+    """Answer "k most similar stores to trial X" queries over pre-trial metrics.
+    Args:
+        table (DataFrame): Pre-trial store-month metrics with STORE_NBR and YEARMONTH columns.
+            Every store should have every month.
+        metrics (list): Metric columns describing a store.
+    """
+
+    def __init__(self, table, metrics):
+        self.metrics = list(metrics)
+        cube, self.stores, self.months = pivot_metrics(table, self.metrics)
+        z = zscore_months(cube)
+        # A constant series has no defined correlation; it contributes 0
+        z[~np.isfinite(z)] = 0
+        n_stores, n_months, n_metrics = z.shape
+        self.vectors = z.transpose(0, 2, 1).reshape(n_stores, n_metrics * n_months) / np.sqrt(n_months * n_metrics)
+
+    def positions(self, stores):
+        """Positions of store numbers in the index."""
+        positions = self.stores.get_indexer(stores)
+        if (positions < 0).any():
+            raise KeyError("Stores not in the index: {}".format([s for s, p in zip(stores, positions) if p < 0]))
+        return positions
+
+    def similarity(self, trial_stores):
+        """Mean correlation of every trial store with every indexed store.
+        Args:
+            trial_stores (list): Trial store numbers.
+
+        Returns:
+            ndarray: Trial x store similarity matrix.
+        """
+        return self.vectors[self.positions(trial_stores)] @ self.vectors.T
+
+    def query(self, trial_stores, k=5, exclude=None):
+        """Find the k most similar candidate stores for each trial store.
+        Args:
+            trial_stores (list): Trial store numbers. None of them is returned as a candidate.
+            k (int): Number of neighbours per trial store.
+            exclude (list): Further stores that may not be returned.
+
+        Returns:
+            DataFrame: Trial_Str, Ctrl_Str, Corr_Score and Rank (1 = most similar),
+            k rows per trial store.
+        """
+        trial_stores = list(trial_stores)
+        scores = self.similarity(trial_stores)
+        excluded = self.stores.isin(trial_stores + list(exclude or []))
+        scores[:, excluded] = -np.inf
+        k = min(k, int((~excluded).sum()))
+        if k <= 0:
+            return pd.DataFrame(columns=["Trial_Str", "Ctrl_Str", "Corr_Score", "Rank"])
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        return pd.DataFrame({
+            "Trial_Str": np.repeat(trial_stores, k),
+            "Ctrl_Str": self.stores.values[top.ravel()],
+            "Corr_Score": np.take_along_axis(top_scores, order, axis=1).ravel(),
+            "Rank": np.tile(np.arange(1, k + 1), len(trial_stores)),
+        })
@@ -0,0 +1,139 @@
+"""Monthly store metrics for Module 2, computed in one pass and updated incrementally.
+
+Every metric is built from additive per store-month components (sales,
+quantity, transaction count) plus the set of distinct customers of each
+store-month. The persisted store is partitioned by month; a new batch of
+transactions is merged into the partitions of the months it touches, and the
+other partitions are neither read nor rewritten.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from quantium.segments import group_codes
+
+
+STORE_MONTH_KEYS = ["STORE_NBR", "YEARMONTH"]
+METRIC_COLUMNS = ["TOT_SALES", "nCustomers", "nTxnPerCust", "nChipsPerTxn", "avgPricePerUnit"]
+
+
+def metric_components(transactions):
+    """Additive components of the store-month metrics.
+    Args:
+        transactions (DataFrame): Transactions with STORE_NBR, YEARMONTH, LYLTY_CARD_NBR,
+            PROD_QTY and TOT_SALES columns.
+
+    Returns:
+        tuple: (DataFrame indexed by STORE_NBR/YEARMONTH with TOT_SALES, PROD_QTY and nTxn;
+        DataFrame of the distinct STORE_NBR/YEARMONTH/LYLTY_CARD_NBR combinations).
+    """
+    groups, keys = group_codes(transactions, STORE_MONTH_KEYS)
+    valid = groups >= 0
+    groups = groups[valid]
+    n_groups = len(keys)
+    components = keys.copy()
+    components["TOT_SALES"] = np.bincount(groups, weights=transactions["TOT_SALES"].values[valid], minlength=n_groups)
+    components["PROD_QTY"] = np.bincount(groups, weights=transactions["PROD_QTY"].values[valid], minlength=n_groups)
+    components["nTxn"] = np.bincount(groups, minlength=n_groups)
+    customers = transactions.loc[valid, STORE_MONTH_KEYS + ["LYLTY_CARD_NBR"]].drop_duplicates()
+    return components.set_index(STORE_MONTH_KEYS), customers.reset_index(drop=True)
+
+
+def metrics_from_components(components, customers):
+    """Turn store-month components into the five Module 2 metrics.
+    Args:
+        components (DataFrame): First output of ``metric_components``.
+        customers (DataFrame): Second output of ``metric_components``.
+
+    Returns:
+        DataFrame: TOT_SALES, nCustomers, nTxnPerCust, nChipsPerTxn and avgPricePerUnit
+        indexed by STORE_NBR/YEARMONTH.
+    """
+    num_cust = customers.groupby(STORE_MONTH_KEYS).size().reindex(components.index)
+    metrics = pd.DataFrame(index=components.index)
+    metrics["TOT_SALES"] = components["TOT_SALES"]
+    metrics["nCustomers"] = num_cust
+    metrics["nTxnPerCust"] = components["nTxn"] / num_cust
+    metrics["nChipsPerTxn"] = components["PROD_QTY"] / num_cust
+    metrics["avgPricePerUnit"] = components["TOT_SALES"] / components["PROD_QTY"]
+    return metrics
+
+
+def monthly_store_metrics(transactions):
+    """Calculate each store's monthly metrics in a single grouped pass.
+    Args:
+        transactions (DataFrame): Transactions with STORE_NBR, YEARMONTH, LYLTY_CARD_NBR,
+            PROD_QTY and TOT_SALES columns.
+
+    Returns:
+        DataFrame: TOT_SALES, nCustomers, nTxnPerCust, nChipsPerTxn and avgPricePerUnit
+        indexed by STORE_NBR/YEARMONTH.
+    """
+    return metrics_from_components(*metric_components(transactions))
+
+
+def _partition_paths(store_dir, month):
+    directory = os.path.join(store_dir, str(int(month)))
+    return {name: os.path.join(directory, name + ".pkl") for name in ["components", "customers", "metrics"]}
+
+
+def _stored_months(store_dir):
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(int(name) for name in os.listdir(store_dir)
+                  if name.isdigit() and os.path.exists(_partition_paths(store_dir, name)["metrics"]))
+
+
+def load_metrics_store(store_dir):
+    """Read the persisted store-month metrics.
+    Args:
+        store_dir (str): Directory written by ``update_metrics_store``.
+
+    Returns:
+        DataFrame: Store-month metrics, or None if the store is empty.
+    """
+    months = _stored_months(store_dir)
+    if not months:
+        return None
+    return pd.concat([pd.read_pickle(_partition_paths(store_dir, month)["metrics"]) for month in months]).sort_index()
+
+
+def update_metrics_store(transactions, store_dir):
+    """Fold a batch of new transactions into the persisted store-month metrics.
+
+    The store keeps one partition per YEARMONTH with its components, customer
+    sets and metrics. Only the partitions of the months in the batch are read,
+    merged with the batch and rewritten, so the cost of an update does not grow
+    with the stored history. Each batch must only hold transactions that were
+    not folded in before.
+    Args:
+        transactions (DataFrame): New transactions, see ``metric_components``.
+        store_dir (str): Directory holding one partition per month.
+
+    Returns:
+        DataFrame: Metrics of every store-month in the months the batch touched. Use
+        ``load_metrics_store`` for the whole history.
+    """
+    new_components, new_customers = metric_components(transactions)
+    batch_customers = dict(tuple(new_customers.groupby("YEARMONTH", sort=False)))
+    updated = []
+    for month, components in new_components.groupby(level="YEARMONTH", sort=True):
+        paths = _partition_paths(store_dir, month)
+        customers = batch_customers[month]
+        if os.path.exists(paths["metrics"]):
+            components = pd.read_pickle(paths["components"]).add(components, fill_value=0)
+            components["nTxn"] = components["nTxn"].astype("int64")
+            customers = pd.concat([pd.read_pickle(paths["customers"]), customers]).drop_duplicates()
+        customers = customers.reset_index(drop=True)
+        metrics = metrics_from_components(components, customers)
+
+        os.makedirs(os.path.dirname(paths["metrics"]), exist_ok=True)
+        components.to_pickle(paths["components"])
+        customers.to_pickle(paths["customers"])
+        # Written last: a partition counts as stored once its metrics exist
+        metrics.to_pickle(paths["metrics"])
+        updated.append(metrics)
+    if not updated:
+        return metrics_from_components(new_components, new_customers)
+    return pd.concat(updated).sort_index()
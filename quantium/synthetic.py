@@ -0,0 +1,278 @@
+"""Synthetic-control mode: weight many control stores at once.
+
+Instead of one control store scaled by a sum ratio, each trial store's
+pre-trial series is reproduced by a weighted mix of every candidate store,
+and the same weights give the counterfactual for the trial months. By default
+the weights are non-negative and sum to one, as in Abadie's synthetic
+control; with a few pre-trial months and hundreds of candidates, merely
+non-negative weights fit any trial store exactly and overfit. The fits of all
+trial stores share one candidate Gram matrix and are solved on it together
+with an active-set method, which can start from previous weights.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from quantium.control import candidate_mask, pivot_metrics
+from quantium.uplift import TRIAL_END, TRIAL_START, label_period
+
+
+def _solve_passive(gram, rhs, passive, columns, simplex=False):
+    """Least-squares weights of the given problems, each restricted to its passive set.
+
+    The passive sets differ in size, so each problem's sub-system is padded to
+    the largest one with identity rows and all of them are solved in one
+    stacked pseudo-inverse. With ``simplex`` the weights are also constrained
+    to sum to one, through a bordered (KKT) system whose last unknown is the
+    multiplier of that constraint.
+
+    Returns:
+        tuple: (weights of shape (candidates, len(columns)), multipliers of shape (len(columns),)).
+    """
+    passive = passive[:, columns]
+    counts = passive.sum(axis=0)
+    size = max(counts.max(initial=0), 1)
+    # Passive candidates first, in order, then padding
+    order = np.argsort(~passive, axis=0, kind="stable")[:size].T
+    valid = np.arange(size) < counts[:, None]
+    index = np.where(valid, order, 0)
+    system = np.zeros((len(columns), size + simplex, size + simplex))
+    system[:, :size, :size] = gram[index[:, :, None], index[:, None, :]] * (valid[:, :, None] & valid[:, None, :])
+    diagonal = np.arange(size)
+    system[:, diagonal, diagonal] += ~valid
+    target = np.zeros((len(columns), size + simplex))
+    target[:, :size] = np.where(valid, rhs[index, columns[:, None]], 0)
+    if simplex:
+        system[:, :size, size] = valid
+        system[:, size, :size] = valid
+        target[:, size] = 1
+    solution = (np.linalg.pinv(system) @ target[:, :, None])[:, :, 0]
+    weights = np.zeros(passive.shape)
+    problem = np.broadcast_to(np.arange(len(columns))[:, None], index.shape)
+    weights[index[valid], problem[valid]] = solution[:, :size][valid]
+    return weights, solution[:, size] if simplex else np.zeros(len(columns))
+
+
+def _simplex_start(gram, rhs, init):
+    """Feasible simplex weights: ``init`` rescaled to sum to one, else the single best candidate."""
+    weights = np.zeros_like(rhs)
+    # ||a_j - y||^2 up to a constant
+    best = np.argmin(np.diag(gram)[:, None] - 2 * rhs, axis=0)
+    weights[best, np.arange(rhs.shape[1])] = 1
+    if init is not None:
+        init = np.maximum(np.asarray(init, dtype="float64"), 0)
+        total = init.sum(axis=0)
+        started = total > 0
+        weights[:, started] = init[:, started] / total[started]
+    return weights
+
+
+def batched_nnls(gram, rhs, init=None, max_iter=None, tol=1e-10, simplex=False):
+    """Solve min ||A w - y||^2 subject to w >= 0 for many right-hand sides sharing A.
+
+    The Lawson-Hanson active-set method runs on the normal equations (Bro and
+    de Jong), so only the shared Gram matrix is needed, and it runs for all
+    problems together: every iteration solves the passive-set systems of all
+    unfinished problems in one stacked call. The optimum of a problem has at
+    most rank(A) positive weights (the number of months), so a problem needs
+    about that many iterations however many candidates there are. Warm-start
+    weights give the starting active set. With ``simplex`` the weights must
+    also sum to one, so every fit is a convex combination of the candidates; the
+    method then starts from a feasible point and keeps it feasible. A warning is
+    raised when a problem stops at ``max_iter`` before it is optimal.
+    Args:
+        gram (ndarray): A^T A, shape (candidates, candidates).
+        rhs (ndarray): A^T Y, shape (candidates, problems).
+        init (ndarray): Starting weights of shape (candidates, problems). None starts at 0, or
+            with ``simplex`` at the single candidate closest to the target.
+        max_iter (int): Maximum number of iterations per problem. None allows 3 x candidates.
+        tol (float): Stop once no zero weight has a dual value (the decrease of the objective
+            per unit of weight) above ``tol`` times the largest absolute entry of ``rhs``.
+        simplex (bool): Also constrain every problem's weights to sum to one.
+
+    Returns:
+        tuple: (ndarray of non-negative weights of shape (candidates, problems), ndarray of
+        iterations run per problem).
+    """
+    gram = np.asarray(gram, dtype="float64")
+    rhs = np.asarray(rhs, dtype="float64")
+    # Rescaling both sides leaves the weights unchanged and keeps the bordered systems well scaled
+    scale = max(np.trace(gram) / max(len(gram), 1), np.finfo(float).tiny)
+    gram, rhs = gram / scale, rhs / scale
+    n_problems = rhs.shape[1]
+    max_iter = 3 * len(gram) if max_iter is None else max_iter
+    tol = tol * max(np.abs(rhs).max(initial=0), np.finfo(float).tiny)
+    if simplex:
+        weights = _simplex_start(gram, rhs, init)
+    else:
+        weights = np.zeros_like(rhs) if init is None else np.maximum(np.asarray(init, dtype="float64"), 0)
+    passive = weights > 0
+    iterations = np.zeros(n_problems, dtype=int)
+    converged = np.zeros(n_problems, dtype=bool)
+    running = np.ones(n_problems, dtype=bool)
+    while running.any():
+        columns = np.flatnonzero(running)
+        trial, multiplier = _solve_passive(gram, rhs, passive, columns, simplex)
+        # Step back towards the last feasible point until every passive weight is positive
+        while True:
+            blocked = (passive[:, columns] & (trial <= 0)).any(axis=0) & (iterations[columns] < max_iter)
+            if not blocked.any():
+                break
+            cols = columns[blocked]
+            last, step_to, kept = weights[:, cols], trial[:, blocked], passive[:, cols]
+            blocking = kept & (step_to <= 0)
+            gap = last - step_to
+            ratios = np.where(blocking, np.divide(last, gap, out=np.zeros_like(gap), where=gap > 0), np.inf)
+            last = last + ratios.min(axis=0) * (step_to - last)
+            last[np.argmin(ratios, axis=0), np.arange(len(cols))] = 0
+            kept &= last > 0
+            last[~kept] = 0
+            weights[:, cols], passive[:, cols] = last, kept
+            iterations[cols] += 1
+            trial[:, blocked], multiplier[blocked] = _solve_passive(gram, rhs, passive, cols, simplex)
+        # Problems stopped at max_iter while stepping back keep their last feasible weights
+        feasible = ~(passive[:, columns] & (trial <= 0)).any(axis=0)
+        weights[:, columns[feasible]] = trial[:, feasible]
+
+        # Dual: how much each zero weight could still lower the objective (net of the sum constraint)
+        dual = rhs[:, columns] - gram @ weights[:, columns] - multiplier
+        dual[passive[:, columns]] = -np.inf
+        best = dual.max(axis=0)
+        done = feasible & (best <= tol)
+        converged[columns[done]] = True
+        stop = done | (iterations[columns] >= max_iter)
+        running[columns[stop]] = False
+        grow = ~stop
+        passive[np.argmax(dual[:, grow], axis=0), columns[grow]] = True
+        iterations[columns[grow]] += 1
+    if not converged.all():
+        warnings.warn("batched_nnls stopped at max_iter={} before converging for {} of {} problems".format(
+            max_iter, (~converged).sum(), n_problems), RuntimeWarning)
+    return weights, iterations
+
+
+def _init_matrix(init, trial_stores, candidates, metric):
+    """Starting weights for one metric from a previous weights table, or None."""
+    if init is None:
+        return None
+    if "metric" in init.columns:
+        init = init[init["metric"] == metric]
+    matrix = init.pivot_table(index="Ctrl_Str", columns="Trial_Str", values="weight", aggfunc="sum")
+    return matrix.reindex(index=candidates, columns=trial_stores).fillna(0).values
+
+
+def fit_synthetic_controls(table, trial_stores, metrics, exclude=None, trial_start=TRIAL_START, ridge=0.0, init=None,
+                           batch_size=None, max_iter=None, tol=1e-10, simplex=True):
+    """Fit weights over the candidate pool to every trial store's pre-trial series.
+
+    Candidates are the stores observed in every month that are neither trial stores
+    nor excluded. Each metric is fitted separately; its Gram matrix is built once and
+    the trial stores are solved ``batch_size`` at a time. Every metric after the first
+    starts from the previous metric's weights unless ``init`` gives weights for it.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns, covering
+            the pre-trial months and, for the counterfactual, the trial months.
+        trial_stores (list): Trial store numbers.
+        metrics (list): Metric columns to fit.
+        exclude (list): Stores that may not receive weight.
+        trial_start (int): First trial month; earlier months are fitted.
+        ridge (float): L2 penalty on the weights, which spreads weight over similar stores.
+            It is relative to the mean squared pre-trial norm of the candidate series, so
+            it does not depend on the metric's units.
+        init (DataFrame): Warm-start weights with Trial_Str, Ctrl_Str, weight and optionally
+            metric columns, e.g. the result of a previous fit.
+        batch_size (int): Trial stores solved together. None solves all of them at once.
+        max_iter (int): Maximum solver iterations per trial store, see ``batched_nnls``.
+        tol (float): Solver tolerance, see ``batched_nnls``.
+        simplex (bool): Constrain each trial store's weights to sum to one. False only
+            requires them to be non-negative.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, metric, Ctrl_Str) with a positive weight, plus
+        pre-trial fit rmse and iterations per (Trial_Str, metric).
+    """
+    metrics = list(metrics)
+    trial_stores = list(trial_stores)
+    cube, stores, months = pivot_metrics(table, metrics)
+    trial_positions = stores.get_indexer(trial_stores)
+    if (trial_positions < 0).any():
+        raise ValueError("Trial stores missing from the metric table: {}".format(
+            [s for s, p in zip(trial_stores, trial_positions) if p < 0]))
+    pre = np.asarray(months < trial_start)
+    batch_size = batch_size or len(trial_stores)
+
+    parts = []
+    previous = None
+    for k, metric in enumerate(metrics):
+        series = cube[:, :, k]
+        pool = candidate_mask(stores, trial_stores, exclude) & np.isfinite(series).all(axis=1)
+        candidates = stores[pool]
+        design = series[pool][:, pre].T  # pre-trial months x candidates
+        targets = series[trial_positions][:, pre].T  # pre-trial months x trial stores
+        gram = design.T @ design
+        gram += ridge * np.trace(gram) / max(len(candidates), 1) * np.eye(len(candidates))
+
+        start = _init_matrix(init, trial_stores, candidates, metric)
+        if start is None and previous is not None:
+            start = previous.reindex(index=candidates, fill_value=0).values
+        weights = np.zeros((len(candidates), len(trial_stores)))
+        iterations = np.zeros(len(trial_stores), dtype=int)
+        for lo in range(0, len(trial_stores), batch_size):
+            columns = slice(lo, lo + batch_size)
+            # A trial store with missing pre-trial months cannot be fitted on the shared Gram matrix
+            fitted = np.isfinite(targets[:, columns]).all(axis=0)
+            rhs = design.T @ np.nan_to_num(targets[:, columns])
+            weights[:, columns], iterations[columns] = batched_nnls(
+                gram, rhs, None if start is None else start[:, columns], max_iter, tol, simplex)
+            weights[:, columns][:, ~fitted] = np.nan
+        previous = pd.DataFrame(np.nan_to_num(weights), index=candidates, columns=trial_stores)
+
+        with np.errstate(invalid="ignore"):
+            rmse = np.sqrt(np.mean((design @ weights - targets) ** 2, axis=0))
+        rows, cols = np.nonzero(weights > 0)
+        parts.append(pd.DataFrame({
+            "Trial_Str": np.asarray(trial_stores)[cols],
+            "metric": metric,
+            "Ctrl_Str": candidates.values[rows],
+            "weight": weights[rows, cols],
+            "rmse": rmse[cols],
+            "iterations": iterations[cols],
+        }))
+    result = pd.concat(parts, ignore_index=True)
+    return result.sort_values(["Trial_Str", "metric", "weight"], ascending=[True, True, False]).reset_index(drop=True)
+
+
+def synthetic_counterfactual(table, weights, trial_start=TRIAL_START, trial_end=TRIAL_END):
+    """Trial store series against the weighted synthetic control for every month.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns.
+        weights (DataFrame): Output of ``fit_synthetic_controls``.
+        trial_start (int): First trial month.
+        trial_end (int): Last trial month.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, YEARMONTH, metric) with the period label, trial
+        value, synthetic control value and pct_diff = (trial - synthetic) / mean(trial, synthetic),
+        as in ``quantium.uplift.uplift_table``.
+    """
+    parts = []
+    for metric, group in weights.groupby("metric", sort=False):
+        trial_stores = group["Trial_Str"].unique()
+        controls = group["Ctrl_Str"].unique()
+        matrix = group.pivot_table(index="Ctrl_Str", columns="Trial_Str", values="weight", aggfunc="sum")
+        matrix = matrix.reindex(index=controls, columns=trial_stores).fillna(0).values
+        trial_cube, _, months = pivot_metrics(table, [metric], stores=trial_stores)
+        control_cube, _, _ = pivot_metrics(table, [metric], stores=controls)
+        synthetic = matrix.T @ control_cube[:, :, 0]  # trial stores x months
+        parts.append(pd.DataFrame({
+            "Trial_Str": np.repeat(trial_stores, len(months)),
+            "YEARMONTH": np.tile(months.values, len(trial_stores)),
+            "metric": metric,
+            "trial": trial_cube[:, :, 0].ravel(),
+            "synthetic": synthetic.ravel(),
+        }))
+    result = pd.concat(parts, ignore_index=True)
+    result.insert(2, "period", label_period(result["YEARMONTH"].values, trial_start, trial_end))
+    result["pct_diff"] = (result["trial"] - result["synthetic"]) / ((result["trial"] + result["synthetic"]) / 2)
+    return result.dropna(subset=["trial", "synthetic"]).reset_index(drop=True)
@@ -0,0 +1,103 @@
+"""Scaled-control uplift for any set of trial/control store pairs.
+
+Each control store is scaled by the ratio of the trial store's to the
+control store's pre-trial total of a metric, then compared with the trial
+store month by month. Trial and control series are aligned on
+(pair, YEARMONTH) through a shared pivot, never by row order.
+"""
+import numpy as np
+import pandas as pd
+
+from quantium.control import pivot_metrics
+
+
+TRIAL_START = 201902
+TRIAL_END = 201904
+
+
+def label_period(yearmonths, trial_start=TRIAL_START, trial_end=TRIAL_END):
+    """Label YEARMONTH values as "pre", "trial" or "post".
+    Args:
+        yearmonths (array-like): YEARMONTH integers.
+        trial_start (int): First trial month.
+        trial_end (int): Last trial month.
+
+    Returns:
+        ndarray: Period label per value.
+    """
+    yearmonths = np.asarray(yearmonths)
+    return np.select([yearmonths < trial_start, yearmonths > trial_end], ["pre", "post"], "trial")
+
+
+def _pairs(trial_control):
+    if isinstance(trial_control, dict):
+        trial_control = list(trial_control.items())
+    return pd.DataFrame(list(trial_control), columns=["Trial_Str", "Ctrl_Str"])
+
+
+def _pair_cubes(table, pairs, metrics):
+    trial_cube, _, months = pivot_metrics(table, metrics, stores=pairs["Trial_Str"].values)
+    control_cube, _, _ = pivot_metrics(table, metrics, stores=pairs["Ctrl_Str"].values)
+    return trial_cube, control_cube, months
+
+
+def _factors(trial_cube, control_cube, months, trial_start):
+    """Pair x metric ratio of the trial to the control store's pre-trial totals."""
+    pre = np.asarray(months < trial_start)
+    return np.nansum(trial_cube[:, pre], axis=1) / np.nansum(control_cube[:, pre], axis=1)
+
+
+def scaling_factors(table, trial_control, metrics, trial_start=TRIAL_START):
+    """Pre-trial scaling factor of every control store, per metric.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns.
+        trial_control (dict): Trial store -> control store, or a list of (trial, control) pairs.
+        metrics (list): Metric columns to scale.
+        trial_start (int): First trial month; earlier months are pre-trial.
+
+    Returns:
+        DataFrame: One row per pair with the trial/control ratio of pre-trial totals per metric.
+    """
+    metrics = list(metrics)
+    pairs = _pairs(trial_control)
+    trial_cube, control_cube, months = _pair_cubes(table, pairs, metrics)
+    factors = _factors(trial_cube, control_cube, months, trial_start)
+    return pd.concat([pairs, pd.DataFrame(factors, columns=metrics)], axis=1)
+
+
+def uplift_table(table, trial_control, metrics, trial_start=TRIAL_START, trial_end=TRIAL_END):
+    """Scaled control series and percentage differences for every trial/control pair and metric.
+    Args:
+        table (DataFrame): Store-month metrics with STORE_NBR and YEARMONTH columns.
+        trial_control (dict): Trial store -> control store, or a list of (trial, control) pairs.
+        metrics (list): Metric columns to compare.
+        trial_start (int): First trial month.
+        trial_end (int): Last trial month.
+
+    Returns:
+        DataFrame: One row per (Trial_Str, Ctrl_Str, YEARMONTH, metric) with the period label,
+        trial value, control value, scaling_factor, scaled_control and
+        pct_diff = (trial - scaled_control) / mean(trial, scaled_control).
+    """
+    metrics = list(metrics)
+    pairs = _pairs(trial_control)
+    trial_cube, control_cube, months = _pair_cubes(table, pairs, metrics)
+    factors = _factors(trial_cube, control_cube, months, trial_start)
+    scaled = control_cube * factors[:, None, :]
+
+    n_pairs, n_months, n_metrics = trial_cube.shape
+    month_values = np.tile(np.repeat(months.values, n_metrics), n_pairs)
+    result = pd.DataFrame({
+        "Trial_Str": np.repeat(pairs["Trial_Str"].values, n_months * n_metrics),
+        "Ctrl_Str": np.repeat(pairs["Ctrl_Str"].values, n_months * n_metrics),
+        "YEARMONTH": month_values,
+        "period": label_period(month_values, trial_start, trial_end),
+        "metric": np.tile(metrics, n_pairs * n_months),
+        "trial": trial_cube.ravel(),
+        "control": control_cube.ravel(),
+        "scaling_factor": np.broadcast_to(factors[:, None, :], trial_cube.shape).ravel(),
+        "scaled_control": scaled.ravel(),
+    })
+    result["pct_diff"] = (result["trial"] - result["scaled_control"]) / ((result["trial"] + result["scaled_control"]) / 2)
+    # Months missing for either store are dropped rather than compared
+    return result.dropna(subset=["trial", "control"]).reset_index(drop=True)
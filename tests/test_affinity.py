@@ -0,0 +1,54 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.datagen import generate_qvi
+from quantium.affinity import basket_pair_rules, segment_brand_rules
+from quantium.clean import clean_transactions
+
+
+@pytest.fixture(scope="module")
+def clean():
+    transactions, customers = generate_qvi(n_transactions=4000, n_customers=600, n_stores=8, n_products=40, seed=5)
+    return clean_transactions(transactions, customers)
+
+
+def _expected(pairs, antecedent_counts, consequent_counts, n, min_support=0.01):
+    rules = []
+    for (antecedent, consequent), count in pairs.items():
+        support = count / n
+        confidence = count / antecedent_counts[antecedent]
+        lift = confidence / (consequent_counts[consequent] / n)
+        if support >= min_support and lift >= 1:
+            rules.append((antecedent, consequent, support, confidence, lift))
+    return pd.DataFrame(rules, columns=["antecedents", "consequents", "support", "confidence", "lift"])
+
+
+def _check(rules, expected):
+    assert len(rules) > 0
+    assert rules["lift"].is_monotonic_decreasing
+    merged = rules.merge(expected, on=["antecedents", "consequents"], suffixes=("", "_expected"))
+    assert len(merged) == len(rules) == len(expected)
+    for column in ["support", "confidence", "lift"]:
+        np.testing.assert_allclose(merged[column], merged[column + "_expected"])
+
+
+def test_segment_brand_rules_match_a_row_count(clean):
+    segment = clean["LIFESTAGE"] + " - " + clean["PREMIUM_CUSTOMER"]
+    brand = clean["Cleaned_Brand_Names"].astype(str)
+    pairs = pd.Series(1, index=clean.index).groupby([segment, brand]).sum()
+    expected = _expected(pairs.to_dict(), segment.value_counts(), brand.value_counts(), len(clean))
+    _check(segment_brand_rules(clean), expected)
+
+
+def test_basket_pair_rules_match_counting_every_basket(clean):
+    baskets = clean.groupby(["LYLTY_CARD_NBR", "TXN_ID"])["Cleaned_Brand_Names"].agg(lambda s: set(s.astype(str)))
+    item_counts = pd.Series([item for basket in baskets for item in basket]).value_counts()
+    pairs = {}
+    for basket in baskets:
+        for pair in itertools.permutations(sorted(basket), 2):
+            pairs[pair] = pairs.get(pair, 0) + 1
+    expected = _expected(pairs, item_counts, item_counts, len(baskets))
+    _check(basket_pair_rules(clean), expected)
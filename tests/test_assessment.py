@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from quantium.assessment import assess_trials, student_ttest, welch_ttest
+from quantium.uplift import uplift_table
+
+
+@pytest.fixture
+def samples():
+    rng = np.random.default_rng(0)
+    values = rng.normal(100, 10, size=(4, 3, 12))
+    first = np.zeros(12, dtype=bool)
+    first[:7] = True
+    return values, np.broadcast_to(first, values.shape), np.broadcast_to(~first, values.shape)
+
+
+def test_welch_ttest_matches_scipy(samples):
+    values, a_mask, b_mask = samples
+    statistic, df, p_value = welch_ttest(values, a_mask, values, b_mask)
+    expected = stats.ttest_ind(values[..., :7], values[..., 7:], axis=-1, equal_var=False)
+    np.testing.assert_allclose(statistic, expected.statistic)
+    np.testing.assert_allclose(p_value, expected.pvalue)
+    np.testing.assert_allclose(df, expected.df)
+
+
+def test_student_ttest_matches_scipy(samples):
+    values, a_mask, b_mask = samples
+    statistic, df, p_value = student_ttest(values, a_mask, values, b_mask)
+    expected = stats.ttest_ind(values[..., :7], values[..., 7:], axis=-1)
+    np.testing.assert_allclose(statistic, expected.statistic)
+    np.testing.assert_allclose(p_value, expected.pvalue)
+    assert (df == 10).all()
+
+
+def test_ttest_ignores_masked_values(samples):
+    values, a_mask, b_mask = samples
+    values = values.copy()
+    a_mask = a_mask.copy()
+    values[..., 0] = np.nan
+    a_mask[..., 0] = False
+    statistic, _, _ = welch_ttest(values, a_mask, values, b_mask)
+    expected = stats.ttest_ind(values[..., 1:7], values[..., 7:], axis=-1, equal_var=False)
+    np.testing.assert_allclose(statistic, expected.statistic)
+
+
+def test_assess_trials_flags_an_uplift():
+    months = [201807 + i for i in range(6)] + [201901 + i for i in range(6)]
+    rng = np.random.default_rng(1)
+    rows = []
+    for store in [1, 2]:
+        for i, month in enumerate(months):
+            value = 100 + rng.normal(0, 1)
+            if store == 1 and 201902 <= month <= 201904:
+                value *= 1.5
+            rows.append({"STORE_NBR": store, "YEARMONTH": month, "TOT_SALES": value})
+    table = pd.DataFrame(rows)
+    assessment = assess_trials(uplift_table(table, {1: 2}, ["TOT_SALES"]))
+    trial_months = assessment[assessment["test"] == "trial_month"]
+    assert trial_months["significant"].all()
+    assert set(trial_months["YEARMONTH"]) == {201902, 201903, 201904}
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from quantium import cache
+from quantium.cache import PipelineCache, fingerprint, package_digest
+
+
+def make_table():
+    return pd.DataFrame({"a": [1, 2, 3]})
+
+
+def total(table):
+    return int(table["a"].sum())
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    return PipelineCache(cache_dir=str(tmp_path / "pipeline"))
+
+
+def test_unchanged_inputs_hit_the_cache(pipeline):
+    table = pipeline.run("make", make_table)
+    assert pipeline.run("total", total, table) == 6
+    assert pipeline.run("total", total, make_table()) == 6
+    assert pipeline.misses == ["make", "total"]
+    assert pipeline.hits == ["total"]
+
+
+def test_inputs_changed_in_place_get_a_new_key(pipeline):
+    table = pipeline.run("make", make_table)
+    assert pipeline.run("total", total, table) == 6
+    table.loc[0, "a"] = 100
+    assert pipeline.run("total", total, table) == 105
+    assert pipeline.hits == []
+
+
+def test_parameters_are_part_of_the_key(pipeline):
+    table = make_table()
+    assert pipeline.key("s", total, (table,), {"x": 1}) != pipeline.key("s", total, (table,), {"x": 2})
+    assert pipeline.key("s", total, (table,)) != pipeline.key("other", total, (table,))
+
+
+def test_package_source_is_part_of_the_key(pipeline, monkeypatch):
+    before = pipeline.key("total", total, (make_table(),))
+    monkeypatch.setattr(cache, "package_digest", lambda: "edited")
+    assert pipeline.key("total", total, (make_table(),)) != before
+
+
+def test_package_digest_follows_file_edits(tmp_path):
+    module = tmp_path / "module.py"
+    module.write_text("def f():\n    return 1\n")
+    before = package_digest(str(tmp_path))
+    assert package_digest(str(tmp_path)) == before
+    module.write_text("def f():\n    return 22\n")
+    assert package_digest(str(tmp_path)) != before
+
+
+def test_fingerprint_follows_content():
+    assert fingerprint(make_table()) == fingerprint(make_table())
+    assert fingerprint(make_table()) != fingerprint(make_table().astype("float64"))
+    assert fingerprint({"b": 1, "a": [1, 2]}) == fingerprint({"a": [1, 2], "b": 1})
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.datagen import generate_qvi
+from quantium.clean import clean_transactions, stream_clean
+
+
+@pytest.fixture
+def qvi(tmp_path):
+    transactions, customers = generate_qvi(n_transactions=3000, n_customers=400, n_stores=6, n_products=30, seed=4)
+    path = str(tmp_path / "transactions.csv")
+    transactions.to_csv(path, index=False)
+    return transactions, customers, path
+
+
+def _compare(streamed, expected):
+    expected = expected.reset_index(drop=True)
+    assert streamed.columns.tolist() == expected.columns.tolist()
+    for column in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[column]):
+            np.testing.assert_allclose(streamed[column].astype("float64"), expected[column].astype("float64"),
+                                       rtol=1e-6, err_msg=column)
+        else:
+            assert streamed[column].isna().tolist() == expected[column].isna().tolist(), column
+            present = expected[column].notna()
+            assert streamed[column][present].astype(str).tolist() == expected[column][present].astype(str).tolist()
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_stream_clean_matches_clean_transactions(qvi, tmp_path, suffix):
+    transactions, customers, path = qvi
+    out_path = str(tmp_path / ("clean" + suffix))
+    summary = stream_clean(path, customers, out_path, chunksize=700)
+    expected = clean_transactions(transactions, customers)
+    assert summary == {"chunks": 5, "rows_in": 3000, "rows_out": len(expected)}
+    streamed = pd.read_parquet(out_path) if suffix == ".parquet" else pd.read_csv(out_path, parse_dates=["DATE"])
+    _compare(streamed, expected)
+
+
+def test_stream_clean_parquet_types_do_not_depend_on_the_first_chunk(qvi, tmp_path):
+    transactions, customers, path = qvi
+    # The first chunk's customers are unknown, so its LIFESTAGE and PREMIUM_CUSTOMER are all missing
+    unknown = customers["LYLTY_CARD_NBR"].isin(transactions["LYLTY_CARD_NBR"].head(700))
+    out_path = str(tmp_path / "clean.parquet")
+    stream_clean(path, customers[~unknown], out_path, chunksize=700)
+    streamed = pd.read_parquet(out_path)
+    expected = clean_transactions(transactions, customers[~unknown])
+    _compare(streamed, expected)
+    assert streamed["LIFESTAGE"].notna().any() and streamed["STORE_NBR"].dtype == "int16"
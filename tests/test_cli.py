@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.datagen import generate_qvi
+from quantium.cli import main
+
+
+@pytest.fixture
+def sources(tmp_path):
+    transactions, customers = generate_qvi(n_transactions=6000, n_customers=800, n_stores=8, n_products=30, seed=7)
+    paths = {"transactions": str(tmp_path / "transactions.csv"), "customers": str(tmp_path / "customers.csv")}
+    transactions.to_csv(paths["transactions"], index=False)
+    customers.to_csv(paths["customers"], index=False)
+    return paths
+
+
+def _summary(out_dir):
+    with open(os.path.join(out_dir, "summary.json")) as handle:
+        return json.load(handle)
+
+
+def test_full_run_exits_0(sources, tmp_path, capsys):
+    out_dir = str(tmp_path / "out")
+    status = main(["--transactions", sources["transactions"], "--customers", sources["customers"],
+                   "--out-dir", out_dir, "--cache-dir", str(tmp_path / "cache"), "--trial-stores", "1", "2",
+                   "--n-jobs", "1"])
+    assert status == 0
+    summary = _summary(out_dir)
+    assert summary["status"] == "ok"
+    assert list(summary["stages"]) == ["ingest", "clean", "segments", "store_metrics", "controls", "assessment"]
+    assert set(summary["stages"]["controls"]["controls"]) == {"1", "2"}
+    assert json.loads(capsys.readouterr().out) == summary
+
+
+def test_later_stages_reuse_earlier_outputs(sources, tmp_path):
+    out_dir = str(tmp_path / "out")
+    common = ["--out-dir", out_dir, "--cache-dir", str(tmp_path / "cache"), "--trial-stores", "1", "2", "--n-jobs", "1"]
+    assert main(["--stages", "clean", "--transactions", sources["transactions"],
+                 "--customers", sources["customers"]] + common) == 0
+    assert main(["--stages", "store_metrics", "controls"] + common) == 0
+    assert list(_summary(out_dir)["stages"]) == ["store_metrics", "controls"]
+
+
+def test_failed_stage_exits_1(tmp_path, capsys):
+    out_dir = str(tmp_path / "out")
+    assert main(["--stages", "segments", "--out-dir", out_dir]) == 1
+    summary = _summary(out_dir)
+    assert summary["status"] == "failed" and summary["failed_stage"] == "segments"
+    assert "StageError" in summary["error"] and "traceback" not in summary
+    assert "Stage segments failed" in capsys.readouterr().err
+
+
+def test_missing_inputs_exit_1(tmp_path):
+    assert main(["--stages", "ingest", "--out-dir", str(tmp_path / "out")]) == 1
+
+
+@pytest.mark.parametrize("argv", [["--stages", "plots"], ["--trial-stores", "x"], ["--unknown"]])
+def test_invalid_arguments_exit_2(argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(argv)
+    assert exit_info.value.code == 2
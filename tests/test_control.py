@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantium import control
+from quantium.control import select_controls
+
+
+@pytest.fixture
+def pretrial():
+    rng = np.random.default_rng(0)
+    months = [201807, 201808, 201809, 201810, 201811, 201812, 201901]
+    base = rng.uniform(100, 200, size=(6, 1))
+    sales = base + rng.normal(0, 5, size=(6, len(months)))
+    sales[1] = sales[0] * 1.01
+    return pd.DataFrame({
+        "STORE_NBR": np.repeat(np.arange(1, 7), len(months)),
+        "YEARMONTH": np.tile(months, 6),
+        "TOT_SALES": sales.ravel(),
+        "nCustomers": (sales / 4).ravel(),
+    })
+
+
+def test_select_controls_in_process_releases_the_table(pretrial):
+    scores, controls = select_controls(pretrial, [1], n_jobs=1)
+    assert controls == {1: 2}
+    assert set(scores["Ctrl_Str"]) == {2, 3, 4, 5, 6}
+    assert control._shared_table is None
+
+
+def test_select_controls_without_trial_stores(pretrial):
+    with pytest.raises(ValueError, match="at least one trial store"):
+        select_controls(pretrial, [], n_jobs=1)
+
+
+def test_select_controls_excludes_every_trial_store_and_the_exclude_list(pretrial):
+    scores, controls = select_controls(pretrial, [1, 3], exclude=[2], n_jobs=1)
+    assert set(scores["Ctrl_Str"]) == {4, 5, 6}
+    assert set(controls) == {1, 3} and set(controls.values()) <= {4, 5, 6}
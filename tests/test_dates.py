@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantium.dates import detect_date_kind, excel_serial_to_datetime, normalise_dates, yearmonth
+
+
+def test_excel_serials_match_the_per_row_timedelta():
+    serials = pd.Series([43282, 43459, 43646, np.nan])
+    expected = [pd.Timestamp("1899-12-30") + pd.Timedelta(days=d) for d in serials[:3]]
+    converted = excel_serial_to_datetime(serials)
+    assert converted[:3].tolist() == expected
+    assert pd.isna(converted[3])
+
+
+@pytest.mark.parametrize("values, kind", [
+    (pd.Series(pd.to_datetime(["2018-07-01"])), "datetime"),
+    (pd.Series([43282, 43283]), "excel_serial"),
+    (pd.Series(["2018-07-01", None, "2019-06-30 10:15"]), "iso"),
+    (pd.Series(["01/07/2018", "2018-07-02"]), None),
+    (pd.Series(["Kettle", "Smiths"]), None),
+    (pd.Series([True, False]), None),
+])
+def test_detect_date_kind(values, kind):
+    assert detect_date_kind(values) == kind
+
+
+def test_normalise_dates_converts_serials_and_iso_strings():
+    frame = pd.DataFrame({"DATE": [43282, 43283], "day": ["2018-07-01", "2018-07-02"], "STORE_NBR": [1, 2]})
+    converted = normalise_dates(frame)
+    assert converted["DATE"].tolist() == converted["day"].tolist()
+    # Numbers are only read as serial days in columns named like a date
+    assert converted["STORE_NBR"].tolist() == [1, 2]
+    assert frame["DATE"].tolist() == [43282, 43283]
+
+
+def test_normalise_dates_rejects_non_iso_strings_in_named_columns():
+    frame = pd.DataFrame({"DATE": ["01/07/2018", "02/07/2018"]})
+    with pytest.raises(ValueError, match="DATE"):
+        normalise_dates(frame, ["DATE"])
+    # Without explicit columns a non-date string column is left alone
+    assert normalise_dates(frame)["DATE"].tolist() == ["01/07/2018", "02/07/2018"]
+
+
+def test_yearmonth():
+    assert yearmonth(pd.Series(pd.to_datetime(["2019-02-14", "2018-12-31"]))).tolist() == [201902, 201812]
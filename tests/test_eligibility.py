@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantium.cache import PipelineCache
+from quantium.eligibility import StoreMonthIndex
+
+
+MONTHS = [201807, 201808, 201809, 201810, 201811, 201812, 201901, 201902, 201903, 201904, 201905, 201906]
+
+
+@pytest.fixture
+def table():
+    # Store 1 sees every month, store 2 misses a pre-trial month, store 3 a trial and a post-trial month
+    missing = {2: [201810], 3: [201903, 201906]}
+    rows = [(store, month) for store in [3, 1, 2] for month in MONTHS if month not in missing.get(store, [])]
+    frame = pd.DataFrame(rows, columns=["STORE_NBR", "YEARMONTH"])
+    frame["TOT_SALES"] = np.arange(len(frame), dtype="float64")
+    return frame
+
+
+@pytest.fixture
+def index(table):
+    return StoreMonthIndex(table, trial_start=201902, trial_end=201904)
+
+
+def test_bitmap_coverage_matches_the_table(table, index):
+    expected = pd.crosstab(table["STORE_NBR"], table["YEARMONTH"]).reindex(columns=MONTHS, fill_value=0) > 0
+    np.testing.assert_array_equal(index.coverage(), expected.values)
+    assert index.bitmap.shape == (3, 2)
+
+
+def test_missing_months_per_period(index):
+    assert index.missing_months().tolist() == [0, 1, 2]
+    assert index.missing_months(["pre"]).tolist() == [0, 1, 0]
+    assert index.missing_months(["trial", "post"]).tolist() == [0, 0, 2]
+
+
+def test_eligible_stores(index):
+    assert index.eligible_stores().tolist() == [1]
+    assert index.eligible_stores(max_missing=1).tolist() == [1, 2]
+    assert index.eligible_stores(periods=["pre"]).tolist() == [1, 3]
+
+
+def test_frame_selects_period_rows_of_stores(table, index):
+    frame = index.frame("trial", stores=[3, 2])
+    expected = table[table["STORE_NBR"].isin([2, 3]) & table["YEARMONTH"].between(201902, 201904)]
+    pd.testing.assert_frame_equal(
+        frame.reset_index(drop=True),
+        expected.sort_values(["STORE_NBR", "YEARMONTH"]).reset_index(drop=True))
+
+
+def test_observation_windows(index):
+    eligible, full, pretrial = index.observation_windows(max_missing=1)
+    assert eligible.tolist() == [1, 2]
+    assert set(full["STORE_NBR"]) == {1, 2} and len(full) == 12 + 11
+    assert pretrial["YEARMONTH"].max() == 201901 and len(pretrial) == 7 + 6
+
+
+def test_observation_windows_cache_key_follows_the_table(table, tmp_path):
+    pipeline = PipelineCache(cache_dir=str(tmp_path))
+    func = StoreMonthIndex.observation_windows
+    index = StoreMonthIndex(table)
+    same = pipeline.key("windows", func, (index,))
+    index.cube(["TOT_SALES"])
+    assert pipeline.key("windows", func, (index,)) == same
+    assert pipeline.key("windows", func, (StoreMonthIndex(table.copy()),)) == same
+    changed = table.assign(TOT_SALES=table["TOT_SALES"] + 1)
+    assert pipeline.key("windows", func, (StoreMonthIndex(changed),)) != same
+    assert pipeline.key("windows", func, (StoreMonthIndex(table, trial_start=201903),)) != same
@@ -0,0 +1,73 @@
+import os
+
+import pandas as pd
+import pytest
+
+from quantium import ingest
+from quantium.ingest import build_cache, cached_read
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "customers.csv"
+    pd.DataFrame({"LYLTY_CARD_NBR": [1000, 1002], "LIFESTAGE": ["RETIREES", "NEW FAMILIES"]}).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Source paths parsed by the cache, in order."""
+    calls = []
+    read_source = ingest.read_source
+
+    def counting(path, columns=None):
+        calls.append(path)
+        return read_source(path, columns)
+    monkeypatch.setattr(ingest, "read_source", counting)
+    return calls
+
+
+def test_unchanged_source_is_parsed_once(source, tmp_path, parses):
+    cache_dir = str(tmp_path / "cache")
+    first = cached_read(source, cache_dir=cache_dir)
+    second = cached_read(source, columns=["LIFESTAGE"], cache_dir=cache_dir)
+    assert parses == [source]
+    assert first["LYLTY_CARD_NBR"].tolist() == [1000, 1002]
+    assert second.columns.tolist() == ["LIFESTAGE"]
+
+
+def test_touched_source_with_same_content_is_not_reparsed(source, tmp_path, parses):
+    cache_dir = str(tmp_path / "cache")
+    cache_path = build_cache(source, cache_dir)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert build_cache(source, cache_dir) == cache_path
+    assert parses == [source]
+    # The new mtime is recorded, so the next call does not hash the file again
+    manifest_path = ingest._cache_paths(source, cache_dir)[0]
+    assert ingest._load_manifest(manifest_path)["mtime_ns"] == os.stat(source).st_mtime_ns
+
+
+def test_changed_source_rebuilds_and_removes_the_stale_copy(source, tmp_path, parses):
+    cache_dir = str(tmp_path / "cache")
+    old_path = build_cache(source, cache_dir)
+    pd.DataFrame({"LYLTY_CARD_NBR": [7], "LIFESTAGE": ["RETIREES"]}).to_csv(source, index=False)
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cached_read(source, cache_dir=cache_dir)["LYLTY_CARD_NBR"].tolist() == [7]
+    assert parses == [source, source]
+    assert not os.path.exists(old_path)
+    assert len([name for name in os.listdir(cache_dir) if name.endswith(".arrow")]) == 1
+
+
+def test_refresh_rebuilds_an_unchanged_source(source, tmp_path, parses):
+    cache_dir = str(tmp_path / "cache")
+    build_cache(source, cache_dir)
+    build_cache(source, cache_dir, refresh=True)
+    assert parses == [source, source]
+
+
+def test_compact_load_applies_the_schema(source, tmp_path):
+    frame = ingest.load_purchase_behaviour(source, cache_dir=str(tmp_path / "cache"), compact=True)
+    assert frame["LYLTY_CARD_NBR"].dtype == "int32"
+    assert frame["LIFESTAGE"].dtype == "category"
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantium.brands import brand_of, load_brand_aliases
+from quantium.products import attach_products, product_dimension, product_positions
+
+
+@pytest.fixture
+def transactions():
+    names = {1: "Natural Chip Compny SeaSalt175g", 2: "Old El Paso Salsa Dip Tomato Mild 300g",
+             3: "Smiths Crinkle Cut Chips Barbecue 170g", 4: "Dorito Corn Chp Supreme 380g"}
+    numbers = np.array([3, 1, 3, 4, 2, 3, 1])
+    return pd.DataFrame({"PROD_NBR": numbers, "PROD_NAME": [names[n] for n in numbers], "PROD_QTY": 2})
+
+
+def test_product_dimension_has_one_row_per_product(transactions):
+    products = product_dimension(transactions)
+    assert products["PROD_NBR"].tolist() == [1, 2, 3, 4]
+    assert products["Pack_Size"].tolist() == [175, 300, 170, 380]
+    assert products["Is_Salsa"].tolist() == [False, True, False, False]
+
+
+def test_attached_attributes_match_parsing_every_row(transactions):
+    aliases = load_brand_aliases()
+    attached = attach_products(transactions, product_dimension(transactions, aliases),
+                               ["Cleaned_Brand_Names", "Pack_Size"])
+    expected_sizes = transactions["PROD_NAME"].str.extract(r"([0-9]+)[gG]", expand=False).astype(float)
+    assert attached["Pack_Size"].tolist() == expected_sizes.tolist()
+    assert attached["Cleaned_Brand_Names"].astype(str).tolist() == [
+        brand_of(name, aliases) for name in transactions["PROD_NAME"]]
+    assert "Pack_Size" not in transactions.columns
+
+
+def test_unknown_products_are_rejected(transactions):
+    products = product_dimension(transactions[transactions["PROD_NBR"] != 4])
+    with pytest.raises(ValueError, match="4"):
+        product_positions(transactions, products)
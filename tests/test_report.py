@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+import pytest
+
+from quantium.report import chart_spec, render_report
+
+
+@pytest.fixture
+def specs():
+    data = pd.DataFrame({"YEARMONTH": [201902, 201903, 201904], "trial": [10.0, 12.0, 11.0],
+                         "control": [9.0, 9.5, 10.0]})
+    margins = {"left": 0.1, "right": 0.68, "bottom": 0.2, "top": 0.9}
+    return [chart_spec("trial_vs_control", "pair {}.png".format(i), data * (i + 1), figsize=(4, 3), margins=margins,
+                       std=0.05, metric="TOT_SALES", title="Pair {}".format(i)) for i in range(2)]
+
+
+def test_unchanged_charts_are_skipped(specs, tmp_path):
+    out_dir = str(tmp_path)
+    first = render_report(specs, out_dir, n_jobs=1)
+    assert first["status"].tolist() == ["rendered", "rendered"]
+    assert all(os.path.exists(os.path.join(out_dir, spec["filename"])) for spec in specs)
+    second = render_report(specs, out_dir, n_jobs=1)
+    assert second["status"].tolist() == ["skipped", "skipped"]
+    assert second["hash"].tolist() == first["hash"].tolist()
+
+
+def test_changed_or_missing_charts_are_rendered_again(specs, tmp_path):
+    out_dir = str(tmp_path)
+    render_report(specs, out_dir, n_jobs=1)
+    specs[0]["data"].loc[0, "trial"] += 1
+    os.remove(os.path.join(out_dir, specs[1]["filename"]))
+    assert render_report(specs, out_dir, n_jobs=1)["status"].tolist() == ["rendered", "rendered"]
+    specs[1]["options"]["title"] = "Renamed"
+    assert render_report(specs, out_dir, n_jobs=1)["status"].tolist() == ["skipped", "rendered"]
+
+
+def test_force_renders_everything(specs, tmp_path):
+    render_report(specs, str(tmp_path), n_jobs=1)
+    assert render_report(specs, str(tmp_path), n_jobs=1, force=True)["status"].tolist() == ["rendered", "rendered"]
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from quantium.schema import apply_schema, segment_column
+
+
+def test_integers_are_downcast_only_when_they_fit():
+    frame = pd.DataFrame({"STORE_NBR": [1, 32767], "PROD_NBR": [1, 32768], "LYLTY_CARD_NBR": [-2 ** 31, 2 ** 31 - 1]})
+    compact = apply_schema(frame)
+    assert compact["STORE_NBR"].dtype == "int16"
+    assert compact["PROD_NBR"].dtype == "int64"
+    assert compact["LYLTY_CARD_NBR"].dtype == "int32"
+    assert compact["LYLTY_CARD_NBR"].tolist() == frame["LYLTY_CARD_NBR"].tolist()
+
+
+def test_non_integer_values_keep_their_type():
+    frame = pd.DataFrame({"PROD_QTY": [1.0, 2.5], "Pack_Size": [175.0, np.nan]})
+    compact = apply_schema(frame)
+    assert compact.dtypes.tolist() == frame.dtypes.tolist()
+
+
+def test_sales_become_float32_only_when_no_value_moves_by_a_cent():
+    cents = pd.DataFrame({"TOT_SALES": [2.1, 7.4, 43.2, 9999.9]})
+    assert apply_schema(cents)["TOT_SALES"].dtype == "float32"
+    large = pd.DataFrame({"TOT_SALES": [2.1, 123456789.01]})
+    assert apply_schema(large)["TOT_SALES"].dtype == "float64"
+
+
+def test_strings_become_categories_and_other_columns_are_untouched():
+    frame = pd.DataFrame({"LIFESTAGE": ["RETIREES", "NEW FAMILIES"], "other": [1, 2]})
+    compact = apply_schema(frame)
+    assert compact["LIFESTAGE"].dtype == "category"
+    assert compact["other"].dtype == "int64"
+    assert apply_schema(compact) is compact
+
+
+def test_segment_column_combines_the_parents_codes():
+    lifestage = pd.Series(["RETIREES", "NEW FAMILIES", None, "RETIREES"])
+    premium = pd.Series(["Budget", "Premium", "Budget", "Premium"])
+    segment = segment_column(lifestage, premium)
+    assert segment.astype(object).where(segment.notna(), None).tolist() == [
+        "RETIREES - Budget", "NEW FAMILIES - Premium", None, "RETIREES - Premium"]
+    assert len(segment.cat.categories) == 4
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantium.control import composite_scores
+from quantium.similarity import StoreSimilarityIndex
+
+
+METRICS = ["TOT_SALES", "nCustomers"]
+
+
+@pytest.fixture
+def pretrial():
+    rng = np.random.default_rng(2)
+    months = [201807, 201808, 201809, 201810, 201811, 201812, 201901]
+    sales = rng.uniform(100, 1000, size=(30, len(months)))
+    return pd.DataFrame({
+        "STORE_NBR": np.repeat(np.arange(1, 31), len(months)),
+        "YEARMONTH": np.tile(months, 30),
+        "TOT_SALES": sales.ravel(),
+        "nCustomers": (sales / 5 + rng.normal(0, 10, size=sales.shape)).ravel(),
+    })
+
+
+def test_query_matches_the_top_correlations_of_composite_scores(pretrial):
+    trials = [3, 17, 25]
+    top = StoreSimilarityIndex(pretrial, METRICS).query(trials, k=4, exclude=[1])
+    # With corr_weight=1 the composite score is the correlation averaged over the metrics
+    scores = composite_scores(pretrial, METRICS, trials, corr_weight=1.0, exclude=[1])
+    expected = (scores.sort_values(["Trial_Str", "CompScore"], ascending=[True, False])
+                .groupby("Trial_Str").head(4).reset_index(drop=True))
+    assert top["Ctrl_Str"].tolist() == expected["Ctrl_Str"].tolist()
+    np.testing.assert_allclose(top["Corr_Score"], expected["CompScore"])
+    assert top["Rank"].tolist() == [1, 2, 3, 4] * 3
+
+
+def test_query_never_returns_trial_or_excluded_stores(pretrial):
+    top = StoreSimilarityIndex(pretrial, METRICS).query([1, 2], k=100, exclude=[3])
+    assert len(top) == 2 * 27
+    assert not top["Ctrl_Str"].isin([1, 2, 3]).any()
+
+
+def test_query_rejects_unknown_stores(pretrial):
+    with pytest.raises(KeyError, match="99"):
+        StoreSimilarityIndex(pretrial, METRICS).query([99])
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantium.store_metrics import load_metrics_store, monthly_store_metrics, update_metrics_store
+
+
+@pytest.fixture
+def transactions():
+    rng = np.random.default_rng(0)
+    n = 2000
+    return pd.DataFrame({
+        "STORE_NBR": rng.integers(1, 6, n),
+        "YEARMONTH": rng.choice([201807, 201808, 201809], n),
+        "LYLTY_CARD_NBR": rng.integers(1000, 1100, n),
+        "PROD_QTY": rng.integers(1, 4, n),
+        "TOT_SALES": rng.uniform(2, 20, n).round(2),
+    })
+
+
+def test_monthly_store_metrics_matches_groupby(transactions):
+    metrics = monthly_store_metrics(transactions)
+    grouped = transactions.groupby(["STORE_NBR", "YEARMONTH"])
+    expected = pd.DataFrame({
+        "TOT_SALES": grouped["TOT_SALES"].sum(),
+        "nCustomers": grouped["LYLTY_CARD_NBR"].nunique(),
+    })
+    expected["nTxnPerCust"] = grouped.size() / expected["nCustomers"]
+    expected["nChipsPerTxn"] = grouped["PROD_QTY"].sum() / expected["nCustomers"]
+    expected["avgPricePerUnit"] = expected["TOT_SALES"] / grouped["PROD_QTY"].sum()
+    pd.testing.assert_frame_equal(metrics.sort_index(), expected, check_dtype=False)
+
+
+def test_update_metrics_store_matches_a_full_recompute(transactions, tmp_path):
+    store_dir = str(tmp_path / "metrics")
+    first = transactions[transactions["YEARMONTH"] < 201809]
+    second = transactions[transactions["YEARMONTH"] >= 201808].sample(frac=0.5, random_state=0)
+    first = first.drop(second.index, errors="ignore")
+    update_metrics_store(first, store_dir)
+    untouched = tmp_path / "metrics" / "201807" / "customers.pkl"
+    before = untouched.stat().st_mtime_ns
+
+    updated = update_metrics_store(second, store_dir)
+    assert set(updated.index.get_level_values("YEARMONTH")) == {201808, 201809}
+    assert untouched.stat().st_mtime_ns == before
+    expected = monthly_store_metrics(pd.concat([first, second]))
+    pd.testing.assert_frame_equal(load_metrics_store(store_dir), expected.sort_index(), check_dtype=False)
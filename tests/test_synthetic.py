@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import nnls
+
+from quantium.synthetic import batched_nnls, fit_synthetic_controls
+
+
+@pytest.fixture
+def wide_problem():
+    """Few months, hundreds of unscaled candidate stores, like the pre-trial fit."""
+    rng = np.random.default_rng(0)
+    design = rng.uniform(1000, 20000, size=(7, 300))
+    targets = rng.normal(5000, 8000, size=(7, 6))
+    # Targets inside the candidates' cone are fitted exactly
+    targets[:, :2] = design[:, :4] @ rng.uniform(0, 1, size=(4, 2))
+    return design, targets
+
+
+def test_batched_nnls_matches_scipy(wide_problem):
+    design, targets = wide_problem
+    weights, iterations = batched_nnls(design.T @ design, design.T @ targets)
+    assert (weights >= 0).all()
+    assert (iterations < 3 * design.shape[1]).all()
+    for j in range(targets.shape[1]):
+        expected, residual = nnls(design, targets[:, j])
+        fitted = np.linalg.norm(design @ weights[:, j] - targets[:, j])
+        assert fitted == pytest.approx(residual, rel=1e-8, abs=1e-6)
+        if residual > 0:
+            np.testing.assert_allclose(weights[:, j], expected, rtol=1e-6, atol=1e-9)
+
+
+def test_batched_nnls_ridge_matches_scipy(wide_problem):
+    design, targets = wide_problem
+    ridge = 1e6
+    weights, _ = batched_nnls(design.T @ design + ridge * np.eye(design.shape[1]), design.T @ targets)
+    augmented = np.vstack([design, np.sqrt(ridge) * np.eye(design.shape[1])])
+    for j in range(targets.shape[1]):
+        expected, _ = nnls(augmented, np.concatenate([targets[:, j], np.zeros(design.shape[1])]))
+        np.testing.assert_allclose(weights[:, j], expected, rtol=1e-6, atol=1e-9)
+
+
+def test_batched_nnls_warm_start(wide_problem):
+    design, targets = wide_problem
+    gram, rhs = design.T @ design, design.T @ targets
+    cold, cold_iterations = batched_nnls(gram, rhs)
+    warm, warm_iterations = batched_nnls(gram, rhs, init=cold)
+    np.testing.assert_allclose(warm, cold, rtol=1e-6, atol=1e-9)
+    assert (warm_iterations <= cold_iterations).all()
+
+
+def test_batched_nnls_warns_at_max_iter(wide_problem):
+    design, targets = wide_problem
+    with pytest.warns(RuntimeWarning, match="max_iter"):
+        batched_nnls(design.T @ design, design.T @ targets, max_iter=1)
+
+
+def test_batched_nnls_simplex_matches_a_penalised_scipy_fit(wide_problem):
+    design, targets = wide_problem
+    weights, _ = batched_nnls(design.T @ design, design.T @ targets, simplex=True)
+    np.testing.assert_allclose(weights.sum(axis=0), 1)
+    assert (weights >= 0).all()
+    # A heavily weighted row of ones imposes sum(w) = 1 on scipy's nnls
+    scale = np.sqrt(np.trace(design.T @ design) / design.shape[1])
+    augmented = np.vstack([design / scale, 1e4 * np.ones((1, design.shape[1]))])
+    for j in range(targets.shape[1]):
+        expected, _ = nnls(augmented, np.concatenate([targets[:, j] / scale, [1e4]]))
+        fitted = np.linalg.norm(design @ weights[:, j] - targets[:, j])
+        assert fitted <= np.linalg.norm(design @ expected - targets[:, j]) * (1 + 1e-6) + 1e-6
+
+
+def test_batched_nnls_simplex_warm_start(wide_problem):
+    design, targets = wide_problem
+    gram, rhs = design.T @ design, design.T @ targets
+    cold, cold_iterations = batched_nnls(gram, rhs, simplex=True)
+    warm, warm_iterations = batched_nnls(gram, rhs, init=cold, simplex=True)
+    np.testing.assert_allclose(warm, cold, rtol=1e-6, atol=1e-9)
+    assert (warm_iterations <= cold_iterations).all()
+
+
+@pytest.fixture
+def mixed_table():
+    rng = np.random.default_rng(1)
+    months = [201807 + i for i in range(6)] + [201901 + i for i in range(6)]
+    sales = rng.uniform(100, 1000, size=(40, len(months)))
+    sales[0] = 0.3 * sales[5] + 0.7 * sales[9]
+    return pd.DataFrame({
+        "STORE_NBR": np.repeat(np.arange(1, 41), len(months)),
+        "YEARMONTH": np.tile(months, 40),
+        "TOT_SALES": sales.ravel(),
+    })
+
+
+def test_fit_synthetic_controls_reproduces_a_mix(mixed_table):
+    weights = fit_synthetic_controls(mixed_table, [1], ["TOT_SALES"])
+    assert weights["rmse"].max() < 1e-6
+    assert (weights["weight"] > 0).all()
+    assert weights["weight"].sum() == pytest.approx(1)
+    assert weights["iterations"].max() < 3 * 39
+
+
+def test_fit_synthetic_controls_ridge_is_unit_free(mixed_table):
+    scaled = mixed_table.assign(TOT_SALES=mixed_table["TOT_SALES"] * 1000)
+    weights = fit_synthetic_controls(mixed_table, [1, 2], ["TOT_SALES"], ridge=0.1)
+    scaled_weights = fit_synthetic_controls(scaled, [1, 2], ["TOT_SALES"], ridge=0.1)
+    np.testing.assert_allclose(scaled_weights["weight"], weights["weight"], rtol=1e-6)
+    # The ridge spreads weight beyond the two stores of the exact mix
+    assert (weights["Trial_Str"] == 1).sum() > 2
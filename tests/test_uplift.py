@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantium.uplift import label_period, scaling_factors, uplift_table
+
+
+MONTHS = [201811, 201812, 201901, 201902, 201903, 201904, 201905]
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(6)
+    frame = pd.DataFrame({
+        "STORE_NBR": np.repeat([1, 2, 3], len(MONTHS)),
+        "YEARMONTH": np.tile(MONTHS, 3),
+        "TOT_SALES": rng.uniform(100, 500, 3 * len(MONTHS)),
+        "nCustomers": rng.integers(20, 60, 3 * len(MONTHS)).astype(float),
+    })
+    # Shuffled rows: alignment must not depend on row order
+    return frame.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def _value(table, store, month, metric):
+    return table.loc[(table["STORE_NBR"] == store) & (table["YEARMONTH"] == month), metric].item()
+
+
+def test_label_period():
+    assert label_period(MONTHS).tolist() == ["pre", "pre", "pre", "trial", "trial", "trial", "post"]
+
+
+def test_scaling_factors_are_ratios_of_pre_trial_totals(table):
+    factors = scaling_factors(table, {1: 2, 3: 2}, ["TOT_SALES", "nCustomers"])
+    pre = table[table["YEARMONTH"] < 201902].groupby("STORE_NBR")[["TOT_SALES", "nCustomers"]].sum()
+    expected = pre.loc[[1, 3]].values / pre.loc[[2, 2]].values
+    np.testing.assert_allclose(factors[["TOT_SALES", "nCustomers"]].values, expected)
+    assert factors[["Trial_Str", "Ctrl_Str"]].values.tolist() == [[1, 2], [3, 2]]
+
+
+def test_uplift_table_scales_the_control_month_by_month(table):
+    uplift = uplift_table(table, [(1, 2), (1, 3)], ["TOT_SALES", "nCustomers"])
+    assert len(uplift) == 2 * len(MONTHS) * 2
+    factors = scaling_factors(table, [(1, 2), (1, 3)], ["TOT_SALES", "nCustomers"]).set_index("Ctrl_Str")
+    for row in uplift.sample(10, random_state=1).itertuples():
+        trial = _value(table, row.Trial_Str, row.YEARMONTH, row.metric)
+        scaled = _value(table, row.Ctrl_Str, row.YEARMONTH, row.metric) * factors.loc[row.Ctrl_Str, row.metric]
+        assert row.trial == pytest.approx(trial)
+        assert row.scaled_control == pytest.approx(scaled)
+        assert row.pct_diff == pytest.approx((trial - scaled) / ((trial + scaled) / 2))
+        assert row.period == label_period([row.YEARMONTH])[0]
+
+
+def test_uplift_table_drops_months_missing_for_either_store(table):
+    table = table[~((table["STORE_NBR"] == 2) & (table["YEARMONTH"] == 201903))]
+    uplift = uplift_table(table, {1: 2}, ["TOT_SALES"])
+    assert uplift["YEARMONTH"].tolist() == [m for m in MONTHS if m != 201903]